@@ -1,6 +1,6 @@
 from django.contrib import admin
 
-from .models import ChannelModel, ThreadChannelModel, MessageModel, ThreadMessageModel
+from .models import ChannelModel, ThreadChannelModel, MessageModel, ThreadMessageModel, ReactionModel, OutgoingEmailModel
 # Register your models here.
 
 class ChannelAdmin(admin.ModelAdmin):
@@ -25,4 +25,8 @@ class ChannelAdmin(admin.ModelAdmin):
     field = ("id", "content", "sender")
     list_display = ("id", "content", "sender")
 
-admin.site.register(ThreadMessageModel)
\ No newline at end of file
+admin.site.register(ThreadMessageModel)
+
+admin.site.register(ReactionModel)
+
+admin.site.register(OutgoingEmailModel)
\ No newline at end of file
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class DabubbleConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'DABubble'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,67 @@
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.utils.functional import classproperty
+from rest_framework import exceptions
+from rest_framework.views import APIView
+
+
+class AsyncAPIView(APIView):
+    """
+    `APIView` that is dispatched on the event loop when the project is served over ASGI.
+
+    Async handlers are awaited directly and use Django's async ORM. Sync handlers (the write
+    paths) run in a worker thread, the same way Django runs a plain `APIView` under ASGI.
+    Authenticators providing `aauthenticate` (`CachedTokenAuthentication`) are awaited. So a
+    request with a cached token only leaves the event loop for the queries of its handler,
+    instead of holding a worker thread for the whole request.
+
+    Under WSGI (and in the test client) Django runs the view with `async_to_sync`, so the
+    views behave the same there.
+    """
+
+    @classproperty
+    def view_is_async(cls):
+        return True
+
+    async def dispatch(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+
+        try:
+            await self.aperform_authentication(request)
+            self.initial(request, *args, **kwargs)
+            if request.method.lower() in self.http_method_names:
+                handler = getattr(self, request.method.lower(), self.http_method_not_allowed)
+            else:
+                handler = self.http_method_not_allowed
+            if iscoroutinefunction(handler):
+                response = await handler(request, *args, **kwargs)
+            else:
+                response = await sync_to_async(handler)(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def aperform_authentication(self, request):
+        """
+        Async counterpart of DRF's `Request._authenticate`. It sets `request.user` and
+        `request.auth` up front, so that `initial` does not authenticate again.
+        """
+        for authenticator in request.authenticators:
+            try:
+                if hasattr(authenticator, 'aauthenticate'):
+                    user_auth = await authenticator.aauthenticate(request)
+                else:
+                    user_auth = await sync_to_async(authenticator.authenticate)(request)
+            except exceptions.APIException:
+                request._not_authenticated()
+                raise
+            if user_auth is not None:
+                request._authenticator = authenticator
+                request.user, request.auth = user_auth
+                return
+        request._not_authenticated()
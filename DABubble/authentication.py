@@ -0,0 +1,85 @@
+import copy
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication, get_authorization_header
+
+from .cache import LRUCache
+
+TOKEN_CACHE_SETTINGS = getattr(settings, 'TOKEN_AUTH_CACHE', {})
+
+token_cache = LRUCache(
+    max_size=TOKEN_CACHE_SETTINGS.get('MAX_SIZE', 10000),
+    ttl=TOKEN_CACHE_SETTINGS.get('TTL', 60),
+)
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """
+    Drop-in replacement for `TokenAuthentication` that caches the token lookup in process.
+
+    A valid token is resolved from the database once and then served from `token_cache`
+    (bounded by `TOKEN_AUTH_CACHE['MAX_SIZE']`, entries expire after `TOKEN_AUTH_CACHE['TTL']`
+    seconds). Deleting a token (logout) or saving or deleting its user removes the cached entry
+    right away (see `DABubble.signals`); other processes pick the change up within the TTL.
+    Invalid tokens are not cached and fail exactly like with `TokenAuthentication`.
+
+    `aauthenticate` is the variant used by `DABubble.asynchronous.AsyncAPIView`: a cached token
+    is resolved on the event loop, only a miss runs the database lookup in a worker thread.
+    """
+
+    def authenticate_credentials(self, key):
+        cached = token_cache.get(key)
+        if cached is None:
+            cached = self.load_credentials(key)
+        user, token = cached
+        return copy.copy(user), token
+
+    def load_credentials(self, key):
+        generation = token_cache.generation
+        cached = super().authenticate_credentials(key)
+        token_cache.set(key, cached, generation)
+        return cached
+
+    async def aauthenticate(self, request):
+        auth = get_authorization_header(request).split()
+        if not auth or auth[0].lower() != self.keyword.lower().encode():
+            return None
+        try:
+            key = auth[1].decode() if len(auth) == 2 else None
+        except UnicodeError:
+            key = None
+        if key is None:
+            # Malformed header: `authenticate` raises the usual error without a query.
+            return self.authenticate(request)
+
+        cached = token_cache.get(key)
+        if cached is None:
+            cached = await sync_to_async(self.load_credentials)(key)
+        user, token = cached
+        return copy.copy(user), token
+
+
+class QueryTokenAuthentication(CachedTokenAuthentication):
+    """
+    Authenticates with the DRF token passed as `?token=<key>`, like websocket connections
+    (see `DABubble.middleware.TokenAuthMiddleware`).
+
+    Only meant for URLs the browser requests itself, such as attachments in `<img src>` or
+    download links, which cannot carry an `Authorization` header. Requests without the query
+    parameter are left to the other authentication classes.
+    """
+
+    def authenticate(self, request):
+        key = request.query_params.get('token')
+        if not key:
+            return None
+        return self.authenticate_credentials(key)
+
+
+def forget_token(key):
+    token_cache.delete(key)
+
+
+def forget_user_tokens(user_id):
+    token_cache.delete_where(lambda cached: cached[0].pk == user_id)
@@ -0,0 +1,153 @@
+import hashlib
+import logging
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+from django.db import IntegrityError, transaction
+from django.db.models import F, ProtectedError
+
+from .models import BlobModel
+from .previews import EXTENSION, describe_attachment
+
+logger = logging.getLogger(__name__)
+
+CHUNK_SIZE = 64 * 1024
+# Blobs created inside `atomic_attachment`, whose files are deleted if its transaction rolls back.
+_created_blobs = ContextVar('created_blobs', default=None)
+
+
+class HashingUploadMixin:
+    """
+    Computes the SHA-256 of an uploaded file while Django streams it in and sets it as
+    `sha256` on the resulting `UploadedFile`, so storing it needs no second pass.
+    """
+
+    def new_file(self, *args, **kwargs):
+        # Set before the parent call: the memory handler raises StopFutureHandlers there.
+        self.sha256 = hashlib.sha256()
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.sha256.update(raw_data)
+        return super().receive_data_chunk(raw_data, start)
+
+    def file_complete(self, file_size):
+        file = super().file_complete(file_size)
+        if file is not None:
+            file.sha256 = self.sha256.hexdigest()
+        return file
+
+
+class HashingMemoryFileUploadHandler(HashingUploadMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(HashingUploadMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def file_digest(file):
+    """
+    Returns the SHA-256 of `file`, taken from the upload handlers if they computed it.
+    """
+    digest = getattr(file, 'sha256', None)
+    if digest:
+        return digest
+    sha256 = hashlib.sha256()
+    for chunk in file.chunks(CHUNK_SIZE):
+        sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def acquire_blob(file, filename):
+    """
+    Returns the blob holding the content of `file` and counts one more reference to it.
+
+    The content is written to the storage only if no blob has it yet, so posting a known
+    file costs two queries and no disk write. A new blob records the MIME type, the image
+    dimensions and a preview (see `describe_attachment`) once for all messages using it.
+    `filename` supplies the extension of a new blob (`ulpoads/<sha[:2]>/<sha256><ext>`)
+    and the type of files that are not images.
+    """
+    digest = file_digest(file)
+    while True:
+        if BlobModel.objects.filter(sha256=digest).update(refcount=F('refcount') + 1):
+            return BlobModel.objects.get(sha256=digest)
+        blob = BlobModel(sha256=digest, size=file.size, refcount=1)
+        blob.content_type, blob.width, blob.height, preview = describe_attachment(file, filename)
+        blob.file.save(filename, file, save=False)
+        if preview is not None:
+            blob.preview.save(f'{digest}.{EXTENSION}', ContentFile(preview), save=False)
+        try:
+            with transaction.atomic():
+                blob.save()
+            created = _created_blobs.get()
+            if created is not None:
+                created.append(blob)
+            return blob
+        except IntegrityError:
+            # Another request stored the same content meanwhile; reference its blob instead.
+            delete_blob_files(blob.file.name, blob.preview.name)
+
+
+@contextmanager
+def atomic_attachment():
+    """
+    `transaction.atomic()` for saving a message together with its attachment.
+
+    `acquire_blob` writes the file of a new blob to the storage before its row is inserted.
+    If the block fails, the rows roll back and the files of the blobs created in it are
+    deleted too; left behind, they would push the next upload of the same content to a
+    suffixed name outside the content-addressed layout.
+    """
+    created = []
+    token = _created_blobs.set(created)
+    try:
+        with transaction.atomic():
+            yield
+    except BaseException:
+        for blob in created:
+            delete_blob_files(blob.file.name, blob.preview.name)
+        raise
+    finally:
+        _created_blobs.reset(token)
+
+
+def release_blob(blob_id):
+    """
+    Drops one reference to the blob `blob_id`. Dropping the last one deletes the blob and,
+    once the transaction commits, its file and preview.
+    """
+    if blob_id is None:
+        return
+    BlobModel.objects.filter(id=blob_id, refcount__gt=0).update(refcount=F('refcount') - 1)
+    names = BlobModel.objects.filter(id=blob_id, refcount=0).values_list('file', 'preview').first()
+    if names is None:
+        return
+    try:
+        deleted, _ = BlobModel.objects.filter(id=blob_id, refcount=0).delete()
+    except ProtectedError:
+        # The count is off and a row still uses the blob; `dedupe_attachments` recounts it.
+        logger.error('Blob %s has no counted references but is still in use.', blob_id)
+        return
+    if deleted:
+        transaction.on_commit(lambda: delete_blob_files(*names))
+
+
+def delete_blob_files(*names):
+    for name in names:
+        if name:
+            default_storage.delete(name)
+
+
+def attach_file(file):
+    """
+    Returns the message fields that attach the uploaded `file`: its blob, the blob's
+    storage name as `messageData` and the original file name.
+    """
+    blob = acquire_blob(file, file.name)
+    return {'blob': blob, 'messageData': blob.file.name, 'messageDataName': os.path.basename(file.name)}
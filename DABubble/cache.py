@@ -0,0 +1,97 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """
+    Thread-safe in-process cache with a bounded number of entries and an optional TTL.
+
+    The least recently used entry is evicted once `max_size` is exceeded, and entries older
+    than `ttl` seconds are treated as missing. `hits` and `misses` count the lookups.
+
+    `generation` changes on every invalidation. A caller that loads a value from the database
+    passes the generation read before loading to `set`, so a value loaded before a concurrent
+    invalidation is not stored.
+
+    An entry can also carry the `version` of the data it was built from. `get` with a different
+    `version` treats the entry as missing, so callers can validate entries against a version
+    stored in the database and stay correct across processes.
+    """
+
+    def __init__(self, max_size, ttl=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.generation = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None, version=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (
+                (self.ttl is not None and entry[1] < time.monotonic()) or entry[2] != version
+            ):
+                del self._entries[key]
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def peek(self, key, version=None):
+        """
+        Returns the entry `key` if it is current for `version`, without counting a lookup or
+        refreshing its position.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None or entry[2] != version:
+                return None
+            if self.ttl is not None and entry[1] < time.monotonic():
+                return None
+            return entry[0]
+
+    def set(self, key, value, generation=None, version=None):
+        expires = time.monotonic() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            if generation is not None and generation != self.generation:
+                return
+            self._entries[key] = (value, expires, version)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self.generation += 1
+            self._entries.pop(key, None)
+
+    def delete_where(self, predicate):
+        """
+        Removes every entry whose value matches `predicate`.
+        """
+        with self._lock:
+            self.generation += 1
+            for key in [key for key, entry in self._entries.items() if predicate(entry[0])]:
+                del self._entries[key]
+
+    def clear(self):
+        with self._lock:
+            self.generation += 1
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def __len__(self):
+        return len(self._entries)
+
+    def stats(self):
+        return {'size': len(self._entries), 'hits': self.hits, 'misses': self.misses}
@@ -0,0 +1,111 @@
+import hashlib
+from functools import wraps
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.db.models import F, Max, Subquery
+from django.db.models.functions import Coalesce
+from django.utils.cache import get_conditional_response, patch_cache_control, quote_etag
+from django.views.decorators.http import condition
+
+from .models import ChangeModel, ResourceVersionModel
+
+USERS = 'users'
+CHANNELS = 'channels'
+
+
+def bump_version(name):
+    """
+    Increments the version counter `name`, creating it on first use.
+    """
+    if not ResourceVersionModel.objects.filter(name=name).update(version=F('version') + 1):
+        ResourceVersionModel.objects.get_or_create(name=name, defaults={'version': 1})
+
+
+def get_version(name):
+    return ResourceVersionModel.objects.filter(name=name).values_list('version', flat=True).first() or 0
+
+
+def users_version():
+    """
+    Returns the users version counter as an aggregate expression, so that it is read in the
+    same query as a change log version. Message and channel payloads embed users (reactors,
+    creators), so their versions include it.
+
+    The uncorrelated subquery does not depend on the aggregated rows, and the `Coalesce`
+    returns it even when no row matches.
+    """
+    version = Subquery(ResourceVersionModel.objects.filter(name=USERS).values('version')[:1])
+    return Coalesce(Max(version), version, 0)
+
+
+def make_etag(request, *parts):
+    """
+    Builds an ETag from the version `parts`, the caller and the full path of the request.
+
+    The caller and the query string are part of the tag because they select the representation
+    (pagination cursor, reaction format, own reactions, ...).
+    """
+    key = ':'.join(str(part) for part in (*parts, request.user.pk, request.get_full_path()))
+    return hashlib.md5(key.encode()).hexdigest()
+
+
+def channel_messages_etag(request, channel_id=None, **kwargs):
+    """
+    ETag of the messages of a channel: the newest change log entry of the channel and the
+    users version counter.
+    """
+    versions = ChangeModel.objects.filter(channel_id=channel_id).aggregate(version=Max('id'), users=users_version())
+    return make_etag(request, 'messages', channel_id, versions['version'] or 0, versions['users'])
+
+
+def channel_list_etag(request, **kwargs):
+    """
+    ETag of the channel list: the channel version counter, the newest change log entry, which
+    covers the last activity of every channel, and the users version counter.
+    """
+    versions = ChangeModel.objects.aggregate(version=Max('id'), users=users_version())
+    return make_etag(request, 'channels', get_version(CHANNELS), versions['version'] or 0, versions['users'])
+
+
+def users_etag(request, **kwargs):
+    """
+    ETag of the user list: the user version counter.
+    """
+    return make_etag(request, 'users', get_version(USERS))
+
+
+def conditional(etag_func):
+    """
+    Decorates an `APIView` method so that it answers 304 when the client's `If-None-Match`
+    still matches `etag_func`, without running the view or its serializers.
+
+    The responses are marked `private, no-cache` so that browsers keep them but revalidate
+    them on every request.
+
+    Async methods (`DABubble.asynchronous.AsyncAPIView`) are supported as well; the ETag is
+    computed with a single hop to a worker thread.
+    """
+    def decorator(method):
+        if iscoroutinefunction(method):
+            @wraps(method)
+            async def async_wrapper(self, request, *args, **kwargs):
+                etag = quote_etag(await sync_to_async(etag_func)(request, **kwargs))
+                response = get_conditional_response(request, etag=etag)
+                if response is None:
+                    response = await method(self, request, *args, **kwargs)
+                if request.method in ('GET', 'HEAD'):
+                    response.headers.setdefault('ETag', etag)
+                patch_cache_control(response, private=True, no_cache=True)
+                return response
+            return async_wrapper
+
+        @wraps(method)
+        def wrapper(self, request, *args, **kwargs):
+            view = condition(etag_func=lambda request, *args, **kwargs: etag_func(request, **kwargs))(
+                lambda request, *args, **kwargs: method(self, request, *args, **kwargs)
+            )
+            response = view(request, *args, **kwargs)
+            patch_cache_control(response, private=True, no_cache=True)
+            return response
+        return wrapper
+    return decorator
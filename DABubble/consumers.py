@@ -0,0 +1,90 @@
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from django.db.models import Q
+
+from .events import channel_group, thread_group
+from .models import ChannelModel, ThreadChannelModel
+
+
+class ChatConsumer(AsyncJsonWebsocketConsumer):
+    """
+    ChatConsumer pushes chat events to the authenticated user over a websocket.
+
+    Behavior:
+    - Rejects the connection if the user is not authenticated (see `TokenAuthMiddleware`).
+    - On connect, subscribes to every channel in which the user is a member and every thread
+      in which the user is a thread member.
+    - Accepts `{"action": "subscribe" | "unsubscribe", "channel": id}` or `{..., "thread": id}`
+      to follow channels or threads joined after connecting. Subscribing requires channel
+      membership (for a thread: membership of the thread or of its main channel). Other
+      messages, including JSON that is not an object, get `{"error": "Unknown action."}`.
+    - Forwards the events published by `DABubble.events` as
+      `{"event": name, "channel": id, "thread": id or null, "data": {...}}` where name is one of
+      `message.created`, `message.edited`, `reaction.updated` and `thread.opened`.
+    """
+
+    async def connect(self):
+        self.user = self.scope.get('user')
+        if self.user is None or not self.user.is_authenticated:
+            await self.close(code=4401)
+            return
+
+        self.subscriptions = set()
+        channel_ids, thread_ids = await self.get_memberships()
+        for channel_id in channel_ids:
+            await self.subscribe(channel_group(channel_id))
+        for thread_channel_id in thread_ids:
+            await self.subscribe(thread_group(thread_channel_id))
+        await self.accept()
+
+    async def disconnect(self, code):
+        for group in getattr(self, 'subscriptions', ()):
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        action = content.get('action') if isinstance(content, dict) else None
+        if action not in ('subscribe', 'unsubscribe'):
+            await self.send_json({'error': 'Unknown action.'})
+            return
+
+        target_id = content.get('thread', content.get('channel'))
+        if not isinstance(target_id, int):
+            await self.send_json({'error': 'A channel or thread id is required.'})
+            return
+
+        if 'thread' in content:
+            group, allowed = thread_group(content['thread']), await self.can_follow_thread(content['thread'])
+        else:
+            group, allowed = channel_group(content['channel']), await self.can_follow_channel(content['channel'])
+
+        if action == 'unsubscribe':
+            self.subscriptions.discard(group)
+            await self.channel_layer.group_discard(group, self.channel_name)
+        elif allowed:
+            await self.subscribe(group)
+        else:
+            await self.send_json({'error': 'Not a member.'})
+
+    async def chat_event(self, event):
+        await self.send_json(event['event'])
+
+    async def subscribe(self, group):
+        self.subscriptions.add(group)
+        await self.channel_layer.group_add(group, self.channel_name)
+
+    @database_sync_to_async
+    def get_memberships(self):
+        channel_ids = list(ChannelModel.objects.filter(channelMembers=self.user).values_list('id', flat=True))
+        thread_ids = list(ThreadChannelModel.objects.filter(threadMember=self.user).values_list('id', flat=True))
+        return channel_ids, thread_ids
+
+    @database_sync_to_async
+    def can_follow_channel(self, channel_id):
+        return ChannelModel.objects.filter(id=channel_id, channelMembers=self.user).exists()
+
+    @database_sync_to_async
+    def can_follow_thread(self, thread_channel_id):
+        return ThreadChannelModel.objects.filter(
+            Q(threadMember=self.user) | Q(mainChannel__channelMembers=self.user),
+            id=thread_channel_id,
+        ).exists()
@@ -0,0 +1,46 @@
+from django.contrib.auth.models import User
+from django.db.models import Value
+from django.db.models.functions import Concat, Lower
+
+USER_FIELDS = ('id', 'first_name', 'last_name', 'email', 'username')
+# Prefix matches are ranked by the field they matched, in this order. Each field has an
+# expression index on its lower-cased value (migration 0027).
+SEARCH_FIELDS = ('username', 'first_name', 'last_name', 'email')
+DEFAULT_SEARCH_LIMIT = 10
+MAX_SEARCH_LIMIT = 50
+# Sorts after every character, so `prefix <= value < prefix + PREFIX_END` is a prefix match.
+PREFIX_END = '\U0010ffff'
+
+
+def search_users(text, limit=DEFAULT_SEARCH_LIMIT):
+    """
+    Returns `(users, has_more)`: up to `limit` users whose username, first name, last name or
+    email starts with `text`, ignoring case. Username matches come first, then first name,
+    last name and email matches, each sorted by the matched field.
+
+    Every field is looked up as a range scan on its lower-cased index, at most `limit + 1`
+    rows each, and the later fields are only queried while the result is not full. An
+    autocomplete request therefore costs one to four short index scans however many users
+    exist or match.
+    """
+    prefix = Lower(Value(text))
+    found = {}
+    for field in SEARCH_FIELDS:
+        matches = User.objects.alias(key=Lower(field)).filter(
+            key__gte=prefix, key__lt=Concat(prefix, Value(PREFIX_END)),
+        ).order_by('key', 'id').values(*USER_FIELDS)[:limit + 1]
+        for user in matches:
+            found.setdefault(user['id'], user)
+        if len(found) > limit:
+            break
+    users = list(found.values())
+    return users[:limit], len(users) > limit
+
+
+def user_page(after, limit):
+    """
+    Returns `(users, has_more)` for the page of users right after the user id `after`, in id
+    order (keyset pagination on the primary key).
+    """
+    users = list(User.objects.filter(id__gt=after).order_by('id').values(*USER_FIELDS)[:limit + 1])
+    return users[:limit], len(users) > limit
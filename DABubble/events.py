@@ -0,0 +1,97 @@
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+
+from .models import LEGACY_EMOJI_CODES, ChangeModel
+
+
+def channel_group(channel_id):
+    return f'channel_{channel_id}'
+
+
+def thread_group(thread_channel_id):
+    return f'thread_{thread_channel_id}'
+
+
+def record_change(channel_id, kind, object_id):
+    """
+    Appends an entry to the change log read by the sync endpoint (`DABubble.views.chat.sync_view`).
+
+    The autoincrement id of the entry is the checkpoint clients pass back as `since`.
+    Returns the new entry.
+    """
+    return ChangeModel.objects.create(channel_id=channel_id, kind=kind, object_id=object_id)
+
+
+def publish(group, event, channel_id, thread_channel_id, data):
+    """
+    Sends `event` to every websocket subscribed to `group` once the current transaction commits.
+
+    Clients receive `{"event": event, "channel": id, "thread": id or null, "data": data}`
+    (see `DABubble.consumers.ChatConsumer`).
+    """
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+    message = {
+        'type': 'chat.event',
+        'event': {'event': event, 'channel': channel_id, 'thread': thread_channel_id, 'data': data},
+    }
+    transaction.on_commit(lambda: async_to_sync(channel_layer.group_send)(group, message))
+
+
+def message_created(message, data):
+    change = record_change(message.channel_id, ChangeModel.MESSAGE, message.id)
+    publish(channel_group(message.channel_id), 'message.created', message.channel_id, None, data)
+    return change
+
+
+def message_edited(message, data):
+    change = record_change(message.channel_id, ChangeModel.MESSAGE, message.id)
+    publish(channel_group(message.channel_id), 'message.edited', message.channel_id, None, data)
+    return change
+
+
+def thread_message_created(thread_message, channel_id, data):
+    record_change(channel_id, ChangeModel.THREAD_MESSAGE, thread_message.id)
+    thread_channel_id = thread_message.thread_channel_id
+    publish(thread_group(thread_channel_id), 'message.created', channel_id, thread_channel_id, data)
+
+
+def thread_message_edited(thread_message, channel_id, data):
+    record_change(channel_id, ChangeModel.THREAD_MESSAGE, thread_message.id)
+    thread_channel_id = thread_message.thread_channel_id
+    publish(thread_group(thread_channel_id), 'message.edited', channel_id, thread_channel_id, data)
+
+
+def thread_opened(thread_channel, data):
+    channel_id = thread_channel.mainChannel_id
+    record_change(channel_id, ChangeModel.THREAD, thread_channel.id)
+    publish(channel_group(channel_id), 'thread.opened', channel_id, thread_channel.id, data)
+
+
+def reaction_changed(channel_id, thread_channel_id, data):
+    """
+    Records the change of the reacted message and publishes a `reaction.updated` event.
+    Returns the change log entry.
+
+    `data` holds the message id and either the new state of one emoji (single reaction
+    endpoints) or the full `emoji_<code>` user lists (legacy emoji endpoints).
+    """
+    if thread_channel_id:
+        change = record_change(channel_id, ChangeModel.THREAD_MESSAGE, data['message'])
+        group = thread_group(thread_channel_id)
+    else:
+        change = record_change(channel_id, ChangeModel.MESSAGE, data['message'])
+        group = channel_group(channel_id)
+    publish(group, 'reaction.updated', channel_id, thread_channel_id, data)
+    return change
+
+
+def legacy_reactions(message_data):
+    """
+    Returns the reaction part of a serialized message for a `reaction.updated` event.
+    """
+    data = {'message': message_data['id']}
+    data.update({f'emoji_{code}': message_data[f'emoji_{code}'] for code in LEGACY_EMOJI_CODES})
+    return data
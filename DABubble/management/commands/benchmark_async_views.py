@@ -0,0 +1,197 @@
+import asyncio
+import statistics
+import time
+
+from asgiref.sync import async_to_sync
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.handlers.asgi import ASGIHandler
+from django.core.management.base import BaseCommand
+from django.core.signals import request_finished, request_started
+from django.db import close_old_connections, transaction
+from django.test.utils import override_settings
+from django.urls import path
+from rest_framework import status
+from rest_framework.authtoken.models import Token
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.response import Response
+from rest_framework.views import APIView
+
+from DABubble.authentication import CachedTokenAuthentication, token_cache
+from DABubble.conditional import channel_messages_etag, conditional, users_etag
+from DABubble.models import ChannelModel, MessageModel
+from DABubble.recent_messages import _cut_page, _load_window, messages_version, recent_limit, recent_messages
+from DABubble.serializers import UserSerializer
+from DABubble.views.chat.message_view import MessageView
+from DABubble.views.chat.user_view import ActiveUserView, UsersView
+
+
+class SyncUsersView(APIView):
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @conditional(users_etag)
+    def get(self, request, *args, **kwargs):
+        users = User.objects.all().values('id', 'first_name', 'last_name', 'email', 'username')
+        return Response(list(users), status=status.HTTP_200_OK)
+
+
+class SyncActiveUserView(APIView):
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        return Response(UserSerializer(request.user).data, status=status.HTTP_200_OK)
+
+
+class SyncMessageView(APIView):
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    @conditional(channel_messages_etag)
+    def get(self, request, *args, **kwargs):
+        channel_id = kwargs.get('channel_id')
+        version = messages_version(channel_id)
+        window = recent_messages.get(channel_id, version=version)
+        if window is None:
+            window = _load_window(channel_id, version)
+        return Response(_cut_page(window, recent_limit(request.query_params)), status=status.HTTP_200_OK)
+
+
+# The async views of the app next to sync twins doing the same work in a worker thread, the
+# way every view was served before.
+urlpatterns = [
+    path('async/users/', UsersView.as_view()),
+    path('async/user/', ActiveUserView.as_view()),
+    path('async/channel/<int:channel_id>/messages/', MessageView.as_view()),
+    path('sync/users/', SyncUsersView.as_view()),
+    path('sync/user/', SyncActiveUserView.as_view()),
+    path('sync/channel/<int:channel_id>/messages/', SyncMessageView.as_view()),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds users and a channel inside a transaction and serves concurrent requests through the '
+        'in-process ASGI handler, comparing the async read views with sync twins. Prints throughput '
+        'and latency percentiles. Nothing is left in the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--messages', type=int, default=500)
+        parser.add_argument('--clients', type=int, default=20, help='Concurrent clients.')
+        parser.add_argument('--requests', type=int, default=20, help='Requests per client and endpoint.')
+
+    def handle(self, *args, **options):
+        # The debug toolbar middleware is sync only; it would force every view into a worker thread.
+        middleware = [name for name in settings.MIDDLEWARE if not name.startswith('debug_toolbar.')]
+        # Closing "old" connections after each request would end the seeding transaction.
+        request_started.disconnect(close_old_connections)
+        request_finished.disconnect(close_old_connections)
+        try:
+            with override_settings(DEBUG=False, MIDDLEWARE=middleware, ROOT_URLCONF=__name__), transaction.atomic():
+                key, channel_id = self.seed(options)
+                results = async_to_sync(self.run)(ASGIHandler(), key, channel_id, options)
+                self.report(results, options)
+                transaction.set_rollback(True)
+        finally:
+            request_started.connect(close_old_connections)
+            request_finished.connect(close_old_connections)
+            token_cache.clear()
+            recent_messages.clear()
+
+    def seed(self, options):
+        users = User.objects.bulk_create(
+            [User(username=f'asyncbench{i}', email=f'asyncbench{i}@example.com') for i in range(options['users'])]
+        )
+        channel = ChannelModel.objects.create(channelName='Async Bench Channel', channelDescription='benchmark',
+                                              createdFrom=users[0])
+        MessageModel.objects.bulk_create([
+            MessageModel(channel=channel, sender=users[i % len(users)], content=f'message {i}')
+            for i in range(options['messages'])
+        ])
+        return Token.objects.create(user=users[0]).key, channel.id
+
+    async def run(self, app, key, channel_id, options):
+        endpoints = {
+            'users': 'users/',
+            'active user': 'user/',
+            'recent messages': f'channel/{channel_id}/messages/?limit=50',
+        }
+        results = {}
+        for label, url in endpoints.items():
+            for poll in (False, True):
+                for mode in ('sync', 'async'):
+                    # One warm-up request fills the token and message caches.
+                    await request(app, f'/{mode}/{url}', key)
+                    results[label, poll, mode] = await self.load(app, f'/{mode}/{url}', key, poll, options)
+        return results
+
+    async def load(self, app, url, key, poll, options):
+        latencies = []
+
+        async def client():
+            etag = None
+            for _ in range(options['requests']):
+                start = time.perf_counter()
+                code, headers = await request(app, url, key, etag)
+                latencies.append(time.perf_counter() - start)
+                if code not in (200, 304):
+                    raise RuntimeError(f'{url} returned {code}')
+                if poll:
+                    etag = headers.get(b'etag', etag)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(options['clients'])))
+        elapsed = time.perf_counter() - start
+        latencies.sort()
+        return (
+            len(latencies) / elapsed,
+            statistics.median(latencies) * 1000,
+            latencies[int(len(latencies) * 0.95) - 1] * 1000,
+        )
+
+    def report(self, results, options):
+        self.stdout.write(
+            f'{options["clients"]} concurrent clients x {options["requests"]} requests per endpoint\n'
+        )
+        self.stdout.write(f'{"endpoint":<34}{"mode":<7}{"req/s":>9}{"p50 ms":>9}{"p95 ms":>9}')
+        for (label, poll, mode), (throughput, p50, p95) in results.items():
+            name = f'{label} ({"If-None-Match" if poll else "full"})'
+            self.stdout.write(f'{name:<34}{mode:<7}{throughput:>9.0f}{p50:>9.2f}{p95:>9.2f}')
+
+
+async def request(app, url, key, etag=None):
+    """
+    Sends one GET through the ASGI application and returns the status code and headers.
+    """
+    path_, _, query = url.partition('?')
+    headers = [(b'host', b'localhost'), (b'authorization', f'Token {key}'.encode())]
+    if etag:
+        headers.append((b'if-none-match', etag))
+    scope = {
+        'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET', 'scheme': 'http',
+        'path': path_, 'raw_path': path_.encode(), 'query_string': query.encode(), 'headers': headers,
+        'server': ('localhost', 80), 'client': ('127.0.0.1', 50000),
+    }
+    body_sent = False
+    disconnected = asyncio.Event()
+    response = {}
+
+    async def receive():
+        nonlocal body_sent
+        if not body_sent:
+            body_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+            response['headers'] = dict(message['headers'])
+
+    await app(scope, receive, send)
+    disconnected.set()
+    return response['status'], response['headers']
@@ -0,0 +1,105 @@
+import statistics
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.db.models import Value
+from django.db.models.functions import Lower
+
+from DABubble.models import ChannelModel, MessageModel, ThreadChannelModel, ThreadMessageModel
+
+# Indexes added in migration 0023, dropped for the "before" measurement.
+INDEXES = ['message_channel_timeline', 'thread_message_timeline', 'unique_channel_name_ci', 'user_email']
+BATCH_SIZE = 5000
+
+
+class Command(BaseCommand):
+    help = (
+        'Seeds a large chat history inside a transaction and prints the query plans and timings of the '
+        'hot lookups with and without the indexes of migration 0023. Nothing is left in the database.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=5000)
+        parser.add_argument('--channels', type=int, default=200)
+        parser.add_argument('--messages', type=int, default=200000)
+        parser.add_argument('--thread-messages', type=int, default=50000)
+        parser.add_argument('--repeat', type=int, default=50, help='Runs per query; the median is reported.')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.seed(options)
+            queries = self.queries(options)
+            with transaction.atomic():
+                self.drop_indexes()
+                before = self.measure(queries, options['repeat'])
+                transaction.set_rollback(True)
+            after = self.measure(queries, options['repeat'])
+            self.report(queries, before, after)
+            transaction.set_rollback(True)
+
+    def seed(self, options):
+        self.stdout.write('Seeding...')
+        users = User.objects.bulk_create(
+            [User(username=f'bench{i}', email=f'bench{i}@example.com') for i in range(options['users'])],
+            batch_size=BATCH_SIZE,
+        )
+        channels = ChannelModel.objects.bulk_create(
+            [ChannelModel(channelName=f'Bench Channel {i}', channelDescription='benchmark', createdFrom=users[i % len(users)])
+             for i in range(options['channels'])],
+            batch_size=BATCH_SIZE,
+        )
+        for start in range(0, options['messages'], BATCH_SIZE):
+            MessageModel.objects.bulk_create([
+                MessageModel(channel=channels[i % len(channels)], sender=users[i % len(users)], content=f'message {i}')
+                for i in range(start, min(start + BATCH_SIZE, options['messages']))
+            ])
+        # One thread per message: a message has at most one thread (`unique_message_thread`).
+        roots = MessageModel.objects.filter(channel=channels[0]).order_by('id')[:options['channels']]
+        threads = ThreadChannelModel.objects.bulk_create([
+            ThreadChannelModel(threadName=f'thread {i}', threadDescription='benchmark', mainChannel=channels[0],
+                               createdFrom=users[0], original_message=root)
+            for i, root in enumerate(roots)
+        ])
+        for start in range(0, options['thread_messages'], BATCH_SIZE):
+            ThreadMessageModel.objects.bulk_create([
+                ThreadMessageModel(thread_channel=threads[i % len(threads)], sender=users[i % len(users)], content=f'reply {i}')
+                for i in range(start, min(start + BATCH_SIZE, options['thread_messages']))
+            ])
+        self.channel = channels[len(channels) // 2]
+        self.thread = threads[len(threads) // 2]
+
+    def queries(self, options):
+        return {
+            'channel history page': MessageModel.objects.filter(channel=self.channel).order_by('-timestamp', '-id')[:50],
+            'thread history': ThreadMessageModel.objects.filter(thread_channel=self.thread).order_by('timestamp', 'id')[:50],
+            'login by email': User.objects.filter(email=f'bench{options["users"] // 2}@example.com'),
+            'channel name check': ChannelModel.objects.alias(name_lower=Lower('channelName')).filter(
+                privateChannel=False, name_lower=Lower(Value(f'Bench Channel {options["channels"] // 2}'))
+            ),
+        }
+
+    def drop_indexes(self):
+        with connection.cursor() as cursor:
+            for name in INDEXES:
+                cursor.execute(f'DROP INDEX {connection.ops.quote_name(name)}')
+
+    def measure(self, queries, repeat):
+        results = {}
+        for label, queryset in queries.items():
+            timings = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                list(queryset.all())
+                timings.append(time.perf_counter() - start)
+            results[label] = (queryset.explain(), statistics.median(timings) * 1000)
+        return results
+
+    def report(self, queries, before, after):
+        for label in queries:
+            plan_before, ms_before = before[label]
+            plan_after, ms_after = after[label]
+            self.stdout.write(self.style.MIGRATE_HEADING(f'\n{label}: {ms_before:.3f} ms -> {ms_after:.3f} ms'))
+            self.stdout.write(f'  without indexes:\n    {plan_before.replace(chr(10), chr(10) + "    ")}')
+            self.stdout.write(f'  with indexes:\n    {plan_after.replace(chr(10), chr(10) + "    ")}')
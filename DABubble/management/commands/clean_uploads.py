@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from DABubble.uploads import expire_uploads
+
+
+class Command(BaseCommand):
+    help = (
+        'Removes the upload sessions that were not attached to a message and not touched for '
+        'UPLOAD_SESSIONS["EXPIRY"] seconds, with their partial and stored files.'
+    )
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Removed {expire_uploads()} expired upload(s).')
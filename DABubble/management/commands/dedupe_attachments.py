@@ -0,0 +1,133 @@
+import os
+from collections import Counter
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import F
+
+from DABubble import events
+from DABubble.blobs import acquire_blob, file_digest, release_blob
+from DABubble.models import BlobModel, ChangeModel, MessageModel, ThreadMessageModel, UploadModel
+from DABubble.previews import EXTENSION, describe_attachment
+
+
+class Command(BaseCommand):
+    help = (
+        'Moves the attachments stored before content-addressed storage into blobs: every file is '
+        'hashed, stored once per content, the messages and uploads using it are pointed to the blob '
+        'and the old copy is deleted; each moved message is logged as changed so clients and caches '
+        'pick up its new attachment URL. Then recounts the references of all blobs and records the '
+        'metadata of blobs stored without it.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Only report what would be deduplicated.')
+
+    def handle(self, *args, **options):
+        names = self.legacy_names()
+        if options['dry_run']:
+            self.report_duplicates(names)
+            return
+
+        files = saved = 0
+        for name in names:
+            if not default_storage.exists(name):
+                self.stderr.write(f'Missing file {name}, skipped.')
+                continue
+            size = default_storage.size(name)
+            with default_storage.open(name, 'rb') as file:
+                file.sha256 = file_digest(file)
+                duplicate = BlobModel.objects.filter(sha256=file.sha256).exists()
+                with transaction.atomic():
+                    self.point_to_blob(name, acquire_blob(file, name))
+            default_storage.delete(name)
+            files += 1
+            if duplicate:
+                saved += size
+        self.stdout.write(f'Moved {files} file(s) into blobs, {saved} bytes freed by deduplication.')
+        self.stdout.write(f'Corrected the reference count of {self.recount()} blob(s).')
+        self.stdout.write(f'Described {self.describe_missing()} blob(s).')
+
+    def legacy_names(self):
+        names = set()
+        for queryset in (
+            MessageModel.objects.filter(blob__isnull=True),
+            ThreadMessageModel.objects.filter(blob__isnull=True),
+            UploadModel.objects.filter(blob__isnull=True, status__in=[UploadModel.COMPLETE, UploadModel.ATTACHED]),
+        ):
+            field = 'file' if queryset.model is UploadModel else 'messageData'
+            names.update(queryset.exclude(**{field: ''}).exclude(**{f'{field}__isnull': True}).values_list(field, flat=True))
+        return sorted(names)
+
+    def point_to_blob(self, name, blob):
+        """
+        Points every row using the legacy file `name` to `blob` and counts their references;
+        `acquire_blob` already counted one.
+
+        The messages get a change log entry, which also moves on the versions behind the
+        message ETags and the recent messages cache of every process.
+        """
+        fields = {'blob': blob, 'messageData': blob.file.name, 'messageDataName': os.path.basename(name)}
+        messages = MessageModel.objects.filter(messageData=name, blob__isnull=True)
+        thread_messages = ThreadMessageModel.objects.filter(messageData=name, blob__isnull=True)
+        changes = [(channel_id, ChangeModel.MESSAGE, id) for id, channel_id in messages.values_list('id', 'channel_id')]
+        changes += [(channel_id, ChangeModel.THREAD_MESSAGE, id)
+                    for id, channel_id in thread_messages.values_list('id', 'thread_channel__mainChannel_id')]
+        references = messages.update(**fields)
+        references += thread_messages.update(**fields)
+        for change in changes:
+            events.record_change(*change)
+        # Only complete uploads hold a reference; attached ones passed it to their message.
+        references += UploadModel.objects.filter(file=name, blob__isnull=True, status=UploadModel.COMPLETE).update(
+            blob=blob, file=blob.file.name,
+        )
+        UploadModel.objects.filter(file=name, blob__isnull=True).update(blob=blob, file=blob.file.name)
+        if references == 0:
+            release_blob(blob.id)
+        elif references > 1:
+            BlobModel.objects.filter(id=blob.id).update(refcount=F('refcount') + references - 1)
+
+    def recount(self):
+        references = Counter()
+        for queryset in (
+            MessageModel.objects.filter(blob__isnull=False),
+            ThreadMessageModel.objects.filter(blob__isnull=False),
+            UploadModel.objects.filter(blob__isnull=False, status=UploadModel.COMPLETE),
+        ):
+            references.update(queryset.values_list('blob', flat=True))
+        corrected = 0
+        for blob_id, refcount in BlobModel.objects.values_list('id', 'refcount'):
+            if references[blob_id] != refcount:
+                BlobModel.objects.filter(id=blob_id).update(refcount=references[blob_id])
+                if references[blob_id] == 0:
+                    release_blob(blob_id)
+                corrected += 1
+        return corrected
+
+    def describe_missing(self):
+        described = 0
+        for blob in BlobModel.objects.filter(content_type='').iterator():
+            with blob.file.open('rb') as file:
+                blob.content_type, blob.width, blob.height, preview = describe_attachment(file, blob.file.name)
+            if preview is not None:
+                blob.preview.save(f'{blob.sha256}.{EXTENSION}', ContentFile(preview), save=False)
+            blob.save(update_fields=['content_type', 'width', 'height', 'preview'])
+            described += 1
+        return described
+
+    def report_duplicates(self, names):
+        known = set(BlobModel.objects.values_list('sha256', flat=True))
+        files = duplicates = saved = 0
+        for name in names:
+            if not default_storage.exists(name):
+                continue
+            with default_storage.open(name, 'rb') as file:
+                digest = file_digest(file)
+            files += 1
+            if digest in known:
+                duplicates += 1
+                saved += default_storage.size(name)
+            known.add(digest)
+        self.stdout.write(f'{files} legacy file(s), {duplicates} duplicate(s), {saved} bytes would be freed.')
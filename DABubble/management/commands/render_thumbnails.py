@@ -0,0 +1,29 @@
+from django.core.management.base import BaseCommand
+
+from DABubble.models import AvatarModel
+from DABubble.thumbnails import render_thumbnails
+
+
+class Command(BaseCommand):
+    help = (
+        'Renders the avatar thumbnails that are missing, e.g. for images uploaded before the '
+        'thumbnails existed or missed by the background renderer. With --all every uploaded '
+        'avatar is rendered again (after changing AVATAR_THUMBNAILS).'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help='Render the thumbnails of every uploaded avatar again.')
+
+    def handle(self, *args, **options):
+        avatars = AvatarModel.objects.exclude(image='').exclude(image__isnull=True)
+        if not options['all']:
+            avatars = avatars.filter(thumbnails={})
+        rendered = 0
+        for avatar in avatars.iterator():
+            try:
+                render_thumbnails(avatar)
+            except Exception as error:
+                self.stderr.write(f'Avatar {avatar.id}: {error}')
+                continue
+            rendered += 1
+        self.stdout.write(f'Rendered the thumbnails of {rendered} avatar(s).')
@@ -0,0 +1,27 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from DABubble.outbox import BATCH_SIZE, send_pending
+
+
+class Command(BaseCommand):
+    help = (
+        'Delivers the queued emails of the outbox (password reset links, ...) in batches over one '
+        'connection per batch. Runs until the outbox is drained, or forever with --loop.'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+        parser.add_argument('--loop', action='store_true', help='Keep polling the outbox instead of exiting when it is empty.')
+        parser.add_argument('--interval', type=float, default=2.0, help='Seconds to wait between polls of an empty outbox.')
+
+    def handle(self, *args, **options):
+        while True:
+            sent = send_pending(options['batch_size'])
+            if sent:
+                self.stdout.write(f'Sent {sent} email(s).')
+                continue
+            if not options['loop']:
+                return
+            time.sleep(options['interval'])
@@ -0,0 +1,145 @@
+import mimetypes
+import os
+import posixpath
+import stat as stat_module
+from urllib.parse import quote
+
+from django.conf import settings
+from django.http import FileResponse, HttpResponse, StreamingHttpResponse
+from django.utils.http import http_date
+
+DEFAULT_MAX_AGE = 365 * 24 * 60 * 60
+CHUNK_SIZE = 64 * 1024
+
+# Top-level media directories: avatars and their thumbnails are public, message attachments
+# are only served to users who can see the message.
+AVATAR_DIR = 'images'
+ATTACHMENT_DIR = 'ulpoads'
+
+
+class UnsatisfiableRange(Exception):
+    """
+    Raised when a `Range` header lies completely outside the file.
+    """
+
+
+def media_name(path):
+    """
+    Returns the normalized storage name of a media URL path, or None if it leaves MEDIA_ROOT.
+    """
+    name = posixpath.normpath(path).lstrip('/')
+    if name in ('', '.') or name == '..' or name.startswith('../') or '\0' in name:
+        return None
+    return name
+
+
+def parse_range(header, size):
+    """
+    Returns the inclusive `(start, end)` byte range requested by a `Range` header, or None
+    if the whole file should be sent (no header, several ranges or a syntax error, which
+    RFC 9110 allows to ignore).
+    """
+    if not header or not header.startswith('bytes=') or ',' in header:
+        return None
+    start, sep, end = header[len('bytes='):].strip().partition('-')
+    if not sep:
+        return None
+    try:
+        if not start:
+            suffix = int(end)
+            if suffix <= 0:
+                raise UnsatisfiableRange()
+            return max(size - suffix, 0), size - 1
+        start = int(start)
+        end = int(end) if end else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        raise UnsatisfiableRange()
+    if start > end:
+        return None
+    return start, min(end, size - 1)
+
+
+def media_etag(stat):
+    return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}"'
+
+
+def file_range(file, start, length):
+    try:
+        file.seek(start)
+        while length > 0:
+            chunk = file.read(min(CHUNK_SIZE, length))
+            if not chunk:
+                break
+            length -= len(chunk)
+            yield chunk
+    finally:
+        file.close()
+
+
+def serve_media(request, name, path, stat, public):
+    """
+    Returns the response delivering the media file `name` stored at `path`.
+
+    Media files are never changed in place (uploads get unique names, thumbnails carry a
+    content hash), so every response may be cached for `MEDIA_DELIVERY['MAX_AGE']` as `immutable`; attachments
+    only by the browser (`private`). With an offloading backend only headers are sent.
+    Otherwise a single `Range` is answered with 206 and the requested bytes; an `If-Range`
+    that no longer matches gets the whole file.
+    """
+    content_type, encoding = mimetypes.guess_type(name)
+    content_type = content_type or 'application/octet-stream'
+    etag = media_etag(stat)
+
+    # 'django' streams the file from the worker; 'x-accel-redirect' (nginx) and 'x-sendfile'
+    # (Apache, lighttpd, ...) only send headers and let the front server transfer the bytes.
+    delivery = getattr(settings, 'MEDIA_DELIVERY', {})
+    backend = delivery.get('BACKEND', 'django')
+    if backend == 'x-accel-redirect':
+        response = HttpResponse(content_type=content_type)
+        response['X-Accel-Redirect'] = delivery.get('ACCEL_PREFIX', '/protected-media/').rstrip('/') + '/' + quote(name)
+    elif backend == 'x-sendfile':
+        response = HttpResponse(content_type=content_type)
+        response['X-Sendfile'] = path
+    else:
+        byte_range = None
+        if request.headers.get('If-Range', etag) == etag:
+            try:
+                byte_range = parse_range(request.headers.get('Range'), stat.st_size)
+            except UnsatisfiableRange:
+                response = HttpResponse(status=416)
+                response['Content-Range'] = f'bytes */{stat.st_size}'
+                return response
+        if byte_range is None:
+            response = FileResponse(open(path, 'rb'), content_type=content_type)
+        else:
+            start, end = byte_range
+            response = StreamingHttpResponse(file_range(open(path, 'rb'), start, end - start + 1),
+                                             status=206, content_type=content_type)
+            response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+            response['Content-Length'] = str(end - start + 1)
+        response['Accept-Ranges'] = 'bytes'
+
+    if encoding:
+        response['Content-Encoding'] = encoding
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(stat.st_mtime)
+    max_age = delivery.get('MAX_AGE', DEFAULT_MAX_AGE)
+    response['Cache-Control'] = f'{"public" if public else "private"}, max-age={max_age}, immutable'
+    return response
+
+
+def media_path(name):
+    """
+    Returns the file system path of the media file `name` and its `os.stat`, or None if it
+    does not exist.
+    """
+    path = os.path.join(settings.MEDIA_ROOT, *name.split('/'))
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    if not stat_module.S_ISREG(stat.st_mode):
+        return None
+    return path, stat
@@ -0,0 +1,38 @@
+from urllib.parse import parse_qs
+
+from channels.db import database_sync_to_async
+from channels.middleware import BaseMiddleware
+from django.contrib.auth.models import AnonymousUser
+from rest_framework.exceptions import AuthenticationFailed
+
+from .authentication import CachedTokenAuthentication
+
+
+@database_sync_to_async
+def get_token_user(key):
+    """
+    Returns the active user owning the DRF token `key`, or an `AnonymousUser`.
+    """
+    if not key:
+        return AnonymousUser()
+    try:
+        user, _ = CachedTokenAuthentication().authenticate_credentials(key)
+    except AuthenticationFailed:
+        return AnonymousUser()
+    return user
+
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """
+    Authenticates websocket connections with the DRF token passed as `?token=<key>`.
+
+    Browsers cannot set an `Authorization` header on websocket requests, so the same token the
+    client uses for the REST API is read from the query string and the user is stored in
+    `scope['user']`.
+    """
+
+    async def __call__(self, scope, receive, send):
+        scope = dict(scope)
+        query = parse_qs(scope.get('query_string', b'').decode())
+        scope['user'] = await get_token_user(query.get('token', [None])[0])
+        return await super().__call__(scope, receive, send)
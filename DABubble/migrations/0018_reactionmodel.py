@@ -0,0 +1,39 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:08
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DABubble', '0017_threadmessagemodel_messagedata'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReactionModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('emoji', models.CharField(max_length=32)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reactions', to='DABubble.messagemodel')),
+                ('thread_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='reactions', to='DABubble.threadmessagemodel')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='reactions', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddConstraint(
+            model_name='reactionmodel',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('message__isnull', False), ('thread_message__isnull', True)), models.Q(('message__isnull', True), ('thread_message__isnull', False)), _connector='OR'), name='reaction_single_target'),
+        ),
+        migrations.AddConstraint(
+            model_name='reactionmodel',
+            constraint=models.UniqueConstraint(condition=models.Q(('message__isnull', False)), fields=('message', 'emoji', 'user'), name='unique_message_reaction'),
+        ),
+        migrations.AddConstraint(
+            model_name='reactionmodel',
+            constraint=models.UniqueConstraint(condition=models.Q(('thread_message__isnull', False)), fields=('thread_message', 'emoji', 'user'), name='unique_thread_message_reaction'),
+        ),
+    ]
@@ -0,0 +1,56 @@
+from itertools import islice
+
+from django.db import migrations
+
+LEGACY_EMOJI_CODES = ('handsup', 'check', 'nerd', 'rocket')
+TARGETS = (
+    ('MessageModel', 'messagemodel_id', 'message_id'),
+    ('ThreadMessageModel', 'threadmessagemodel_id', 'thread_message_id'),
+)
+BATCH_SIZE = 1000
+
+
+def bulk_insert(model, objs):
+    objs = iter(objs)
+    while batch := list(islice(objs, BATCH_SIZE)):
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def copy_emoji_fields(apps, schema_editor):
+    ReactionModel = apps.get_model('DABubble', 'ReactionModel')
+    for model_name, through_column, target_column in TARGETS:
+        model = apps.get_model('DABubble', model_name)
+        for code in LEGACY_EMOJI_CODES:
+            through = getattr(model, f'emoji_{code}').through
+            rows = through.objects.values_list(through_column, 'user_id').iterator(chunk_size=BATCH_SIZE)
+            bulk_insert(ReactionModel, (
+                ReactionModel(**{target_column: target_id}, user_id=user_id, emoji=code) for target_id, user_id in rows
+            ))
+
+
+def restore_emoji_fields(apps, schema_editor):
+    ReactionModel = apps.get_model('DABubble', 'ReactionModel')
+    for model_name, through_column, target_column in TARGETS:
+        model = apps.get_model('DABubble', model_name)
+        for code in LEGACY_EMOJI_CODES:
+            through = getattr(model, f'emoji_{code}').through
+            rows = (
+                ReactionModel.objects
+                .filter(**{f'{target_column}__isnull': False}, emoji=code)
+                .values_list(target_column, 'user_id')
+                .iterator(chunk_size=BATCH_SIZE)
+            )
+            bulk_insert(through, (
+                through(**{through_column: target_id}, user_id=user_id) for target_id, user_id in rows
+            ))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DABubble', '0018_reactionmodel'),
+    ]
+
+    operations = [
+        migrations.RunPython(copy_emoji_fields, restore_emoji_fields),
+    ]
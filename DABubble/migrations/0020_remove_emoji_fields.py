@@ -0,0 +1,45 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:09
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DABubble', '0019_copy_emoji_reactions'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='messagemodel',
+            name='emoji_check',
+        ),
+        migrations.RemoveField(
+            model_name='messagemodel',
+            name='emoji_handsup',
+        ),
+        migrations.RemoveField(
+            model_name='messagemodel',
+            name='emoji_nerd',
+        ),
+        migrations.RemoveField(
+            model_name='messagemodel',
+            name='emoji_rocket',
+        ),
+        migrations.RemoveField(
+            model_name='threadmessagemodel',
+            name='emoji_check',
+        ),
+        migrations.RemoveField(
+            model_name='threadmessagemodel',
+            name='emoji_handsup',
+        ),
+        migrations.RemoveField(
+            model_name='threadmessagemodel',
+            name='emoji_nerd',
+        ),
+        migrations.RemoveField(
+            model_name='threadmessagemodel',
+            name='emoji_rocket',
+        ),
+    ]
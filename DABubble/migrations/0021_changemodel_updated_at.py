@@ -0,0 +1,43 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:14
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def copy_timestamps(apps, schema_editor):
+    for model_name in ('MessageModel', 'ThreadMessageModel'):
+        apps.get_model('DABubble', model_name).objects.update(updated_at=models.F('timestamp'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DABubble', '0020_remove_emoji_fields'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='messagemodel',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddField(
+            model_name='threadmessagemodel',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.RunPython(copy_timestamps, migrations.RunPython.noop),
+        migrations.CreateModel(
+            name='ChangeModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('kind', models.CharField(choices=[('message', 'Message'), ('threadMessage', 'Thread message'), ('thread', 'Thread')], max_length=20)),
+                ('object_id', models.PositiveBigIntegerField()),
+                ('created', models.DateTimeField(auto_now_add=True)),
+                ('channel', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='changes', to='DABubble.channelmodel')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['channel', 'id'], name='change_channel_sequence')],
+            },
+        ),
+    ]
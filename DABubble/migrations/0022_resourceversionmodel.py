@@ -0,0 +1,21 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DABubble', '0021_changemodel_updated_at'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ResourceVersionModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('version', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:22
+
+import django.db.models.functions.text
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+USER_EMAIL_INDEX = models.Index(fields=['email'], name='user_email')
+
+
+def rename_duplicate_channels(apps, schema_editor):
+    """
+    Makes public channel names unique ignoring case before the constraint is added, by
+    appending ` (2)`, ` (3)`, ... to every later public channel with an already used name.
+    Private channels (direct messages, named after the partner) keep their names.
+
+    Names are compared lowered by the database, which is what the constraint compares.
+    """
+    ChannelModel = apps.get_model('DABubble', 'ChannelModel')
+    channels = ChannelModel.objects.filter(privateChannel=False).annotate(name_lower=Lower('channelName'))
+    used = set()
+    for channel in channels.order_by('id').only('id', 'channelName'):
+        if channel.name_lower not in used:
+            used.add(channel.name_lower)
+            continue
+        suffix = 1
+        while True:
+            suffix += 1
+            name = f'{channel.channelName[:240]} ({suffix})'
+            # The suffix does not change the case folding of the name.
+            lowered = f'{channel.name_lower[:240]} ({suffix})'
+            if lowered not in used:
+                break
+        used.add(lowered)
+        ChannelModel.objects.filter(id=channel.id).update(channelName=name)
+
+
+def add_user_email_index(apps, schema_editor):
+    schema_editor.add_index(apps.get_model(settings.AUTH_USER_MODEL), USER_EMAIL_INDEX)
+
+
+def remove_user_email_index(apps, schema_editor):
+    schema_editor.remove_index(apps.get_model(settings.AUTH_USER_MODEL), USER_EMAIL_INDEX)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DABubble', '0022_resourceversionmodel'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='messagemodel',
+            index=models.Index(fields=['channel', 'timestamp', 'id'], name='message_channel_timeline'),
+        ),
+        migrations.AddIndex(
+            model_name='threadmessagemodel',
+            index=models.Index(fields=['thread_channel', 'timestamp', 'id'], name='thread_message_timeline'),
+        ),
+        migrations.RunPython(rename_duplicate_channels, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='channelmodel',
+            constraint=models.UniqueConstraint(django.db.models.functions.text.Lower('channelName'), condition=models.Q(privateChannel=False), name='unique_channel_name_ci'),
+        ),
+        # auth.User cannot declare the index itself; login and password reset look users up by email.
+        migrations.RunPython(add_user_email_index, remove_user_email_index),
+    ]
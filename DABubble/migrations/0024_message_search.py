@@ -0,0 +1,85 @@
+from django.db import migrations
+
+# FTS5 index over the content of messages and thread messages (see DABubble/search.py).
+# rowid = 2 * id for messages and 2 * id + 1 for thread messages; channel_id is the channel
+# the message is visible in (the main channel for thread messages).
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE message_search USING fts5(
+        content, channel_id UNINDEXED, tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    INSERT INTO message_search (rowid, content, channel_id)
+    SELECT id * 2, content, channel_id FROM "DABubble_messagemodel"
+    """,
+    """
+    INSERT INTO message_search (rowid, content, channel_id)
+    SELECT message.id * 2 + 1, message.content, thread."mainChannel_id"
+    FROM "DABubble_threadmessagemodel" message
+    JOIN "DABubble_threadchannelmodel" thread ON thread.id = message.thread_channel_id
+    """,
+    """
+    CREATE TRIGGER message_search_insert AFTER INSERT ON "DABubble_messagemodel" BEGIN
+        INSERT INTO message_search (rowid, content, channel_id) VALUES (new.id * 2, new.content, new.channel_id);
+    END
+    """,
+    """
+    CREATE TRIGGER message_search_update AFTER UPDATE OF content ON "DABubble_messagemodel"
+    WHEN new.content IS NOT old.content BEGIN
+        UPDATE message_search SET content = new.content WHERE rowid = new.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER message_search_delete AFTER DELETE ON "DABubble_messagemodel" BEGIN
+        DELETE FROM message_search WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER thread_message_search_insert AFTER INSERT ON "DABubble_threadmessagemodel" BEGIN
+        INSERT INTO message_search (rowid, content, channel_id)
+        SELECT new.id * 2 + 1, new.content, "mainChannel_id" FROM "DABubble_threadchannelmodel" WHERE id = new.thread_channel_id;
+    END
+    """,
+    """
+    CREATE TRIGGER thread_message_search_update AFTER UPDATE OF content ON "DABubble_threadmessagemodel"
+    WHEN new.content IS NOT old.content BEGIN
+        UPDATE message_search SET content = new.content WHERE rowid = new.id * 2 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER thread_message_search_delete AFTER DELETE ON "DABubble_threadmessagemodel" BEGIN
+        DELETE FROM message_search WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+]
+DROP_SQL = [
+    'DROP TRIGGER IF EXISTS thread_message_search_delete',
+    'DROP TRIGGER IF EXISTS thread_message_search_update',
+    'DROP TRIGGER IF EXISTS thread_message_search_insert',
+    'DROP TRIGGER IF EXISTS message_search_delete',
+    'DROP TRIGGER IF EXISTS message_search_update',
+    'DROP TRIGGER IF EXISTS message_search_insert',
+    'DROP TABLE IF EXISTS message_search',
+]
+
+
+def run(statements):
+    def operation(apps, schema_editor):
+        # The search index relies on SQLite FTS5; other databases skip it (see `search_available`).
+        if schema_editor.connection.vendor != 'sqlite':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+    return operation
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DABubble', '0023_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(CREATE_SQL), run(DROP_SQL)),
+    ]
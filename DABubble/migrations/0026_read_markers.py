@@ -0,0 +1,59 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:44
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DABubble', '0025_outgoingemailmodel'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ReadMarkerModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('lastReadId', models.PositiveBigIntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddIndex(
+            model_name='messagemodel',
+            index=models.Index(fields=['channel', 'id'], name='message_channel_sequence'),
+        ),
+        migrations.AddIndex(
+            model_name='threadmessagemodel',
+            index=models.Index(fields=['thread_channel', 'id'], name='thread_message_sequence'),
+        ),
+        migrations.AddField(
+            model_name='readmarkermodel',
+            name='channel',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='read_markers', to='DABubble.channelmodel'),
+        ),
+        migrations.AddField(
+            model_name='readmarkermodel',
+            name='thread_channel',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='read_markers', to='DABubble.threadchannelmodel'),
+        ),
+        migrations.AddField(
+            model_name='readmarkermodel',
+            name='user',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='read_markers', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddConstraint(
+            model_name='readmarkermodel',
+            constraint=models.CheckConstraint(check=models.Q(models.Q(('channel__isnull', False), ('thread_channel__isnull', True)), models.Q(('channel__isnull', True), ('thread_channel__isnull', False)), _connector='OR'), name='read_marker_single_target'),
+        ),
+        migrations.AddConstraint(
+            model_name='readmarkermodel',
+            constraint=models.UniqueConstraint(condition=models.Q(('channel__isnull', False)), fields=('user', 'channel'), name='unique_channel_read_marker'),
+        ),
+        migrations.AddConstraint(
+            model_name='readmarkermodel',
+            constraint=models.UniqueConstraint(condition=models.Q(('thread_channel__isnull', False)), fields=('user', 'thread_channel'), name='unique_thread_read_marker'),
+        ),
+    ]
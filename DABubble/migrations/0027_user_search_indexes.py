@@ -0,0 +1,34 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:05
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Lower
+
+USER_SEARCH_INDEXES = [
+    models.Index(Lower(field), name=f'user_{field}_lower')
+    for field in ('username', 'first_name', 'last_name', 'email')
+]
+
+
+def add_user_search_indexes(apps, schema_editor):
+    for index in USER_SEARCH_INDEXES:
+        schema_editor.add_index(apps.get_model(settings.AUTH_USER_MODEL), index)
+
+
+def remove_user_search_indexes(apps, schema_editor):
+    for index in USER_SEARCH_INDEXES:
+        schema_editor.remove_index(apps.get_model(settings.AUTH_USER_MODEL), index)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DABubble', '0026_read_markers'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        # auth.User cannot declare the indexes itself; the user directory searches by prefix
+        # (see `DABubble.directory.search_users`).
+        migrations.RunPython(add_user_search_indexes, remove_user_search_indexes),
+    ]
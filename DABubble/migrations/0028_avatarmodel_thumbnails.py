@@ -0,0 +1,18 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:51
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DABubble', '0027_user_search_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='avatarmodel',
+            name='thumbnails',
+            field=models.JSONField(blank=True, default=dict),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.0.7 on 2026-10-18 08:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DABubble', '0028_avatarmodel_thumbnails'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='messagemodel',
+            index=models.Index(fields=['messageData'], name='message_attachment'),
+        ),
+        migrations.AddIndex(
+            model_name='threadmessagemodel',
+            index=models.Index(fields=['messageData'], name='thread_message_attachment'),
+        ),
+    ]
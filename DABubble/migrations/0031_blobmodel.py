@@ -0,0 +1,62 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:00
+
+import importlib
+
+import DABubble.models
+import django.db.models.deletion
+from django.db import migrations, models
+
+# SQLite rebuilds the message tables to add the foreign keys, which drops the triggers of
+# the search index (migration 0024); they are created again afterwards.
+message_search = importlib.import_module('DABubble.migrations.0024_message_search')
+TRIGGER_SQL = [statement for statement in message_search.CREATE_SQL if 'CREATE TRIGGER' in statement]
+DROP_TRIGGER_SQL = [statement for statement in message_search.DROP_SQL if 'TRIGGER' in statement]
+restore_triggers = message_search.run(DROP_TRIGGER_SQL + TRIGGER_SQL)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DABubble', '0030_uploadmodel'),
+    ]
+
+    operations = [
+        migrations.RunPython(migrations.RunPython.noop, restore_triggers),
+        migrations.CreateModel(
+            name='BlobModel',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('sha256', models.CharField(max_length=64, unique=True)),
+                ('file', models.FileField(max_length=255, unique=True, upload_to=DABubble.models.blob_path)),
+                ('size', models.PositiveBigIntegerField()),
+                ('refcount', models.PositiveIntegerField(default=0)),
+                ('created', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='messagemodel',
+            name='messageDataName',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='threadmessagemodel',
+            name='messageDataName',
+            field=models.CharField(blank=True, default='', max_length=255),
+        ),
+        migrations.AddField(
+            model_name='messagemodel',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='DABubble.blobmodel'),
+        ),
+        migrations.AddField(
+            model_name='threadmessagemodel',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='DABubble.blobmodel'),
+        ),
+        migrations.AddField(
+            model_name='uploadmodel',
+            name='blob',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.PROTECT, related_name='+', to='DABubble.blobmodel'),
+        ),
+        migrations.RunPython(restore_triggers, migrations.RunPython.noop),
+    ]
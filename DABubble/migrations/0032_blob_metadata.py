@@ -0,0 +1,33 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DABubble', '0031_blobmodel'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='blobmodel',
+            name='content_type',
+            field=models.CharField(blank=True, default='', max_length=100),
+        ),
+        migrations.AddField(
+            model_name='blobmodel',
+            name='height',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='blobmodel',
+            name='preview',
+            field=models.FileField(blank=True, db_index=True, null=True, upload_to='ulpoads/previews/'),
+        ),
+        migrations.AddField(
+            model_name='blobmodel',
+            name='width',
+            field=models.PositiveIntegerField(blank=True, null=True),
+        ),
+    ]
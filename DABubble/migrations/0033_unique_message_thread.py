@@ -0,0 +1,60 @@
+# Generated by Django 5.0.7 on 2026-10-18 09:06
+
+import importlib
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count
+
+# SQLite rebuilds the thread table to add the constraint, which fails while the search index
+# trigger of thread messages (migration 0024) refers to it; the triggers are dropped meanwhile.
+message_search = importlib.import_module('DABubble.migrations.0024_message_search')
+drop_triggers = message_search.run([statement for statement in message_search.DROP_SQL if 'TRIGGER' in statement])
+create_triggers = message_search.run([statement for statement in message_search.CREATE_SQL if 'CREATE TRIGGER' in statement])
+
+
+def merge_duplicate_threads(apps, schema_editor):
+    """
+    Threads opened twice for the same message (concurrent PATCH requests) are merged into the
+    one the message points to: their thread messages and members move over, their read
+    markers are dropped.
+    """
+    ThreadChannelModel = apps.get_model('DABubble', 'ThreadChannelModel')
+    ThreadMessageModel = apps.get_model('DABubble', 'ThreadMessageModel')
+    MessageModel = apps.get_model('DABubble', 'MessageModel')
+    ReadMarkerModel = apps.get_model('DABubble', 'ReadMarkerModel')
+    Membership = ThreadChannelModel.threadMember.through
+
+    duplicated = ThreadChannelModel.objects.values('original_message').annotate(threads=Count('id')).filter(threads__gt=1)
+    for row in duplicated:
+        thread_ids = list(ThreadChannelModel.objects.filter(original_message=row['original_message'])
+                          .order_by('id').values_list('id', flat=True))
+        current = MessageModel.objects.filter(id=row['original_message']).values_list('thread_channel', flat=True).first()
+        keep = current if current in thread_ids else thread_ids[0]
+        others = [thread_id for thread_id in thread_ids if thread_id != keep]
+
+        ThreadMessageModel.objects.filter(thread_channel__in=others).update(thread_channel=keep)
+        MessageModel.objects.filter(thread_channel__in=others).update(thread_channel=keep)
+        members = set(Membership.objects.filter(threadchannelmodel__in=others).values_list('user', flat=True))
+        members -= set(Membership.objects.filter(threadchannelmodel=keep).values_list('user', flat=True))
+        Membership.objects.bulk_create([Membership(threadchannelmodel_id=keep, user_id=user_id) for user_id in members])
+        ReadMarkerModel.objects.filter(thread_channel__in=others).delete()
+        ThreadChannelModel.objects.filter(id__in=others).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DABubble', '0032_blob_metadata'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(merge_duplicate_threads, migrations.RunPython.noop),
+        migrations.RunPython(drop_triggers, create_triggers),
+        migrations.AddConstraint(
+            model_name='threadchannelmodel',
+            constraint=models.UniqueConstraint(fields=('original_message',), name='unique_message_thread'),
+        ),
+        migrations.RunPython(create_triggers, drop_triggers),
+    ]
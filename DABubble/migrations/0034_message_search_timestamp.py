@@ -0,0 +1,76 @@
+import importlib
+
+from django.db import migrations
+
+# Rebuilds the search index of migration 0024 with the message timestamp, by which search
+# picks the newest matches to rank (see DABubble/search.py). The rowids of messages and
+# thread messages come from two independent id sequences, so they do not order by time.
+# Migrations that rebuild a message table drop and recreate these triggers.
+message_search = importlib.import_module('DABubble.migrations.0024_message_search')
+
+CREATE_SQL = [
+    """
+    CREATE VIRTUAL TABLE message_search USING fts5(
+        content, channel_id UNINDEXED, timestamp UNINDEXED,
+        tokenize = 'unicode61 remove_diacritics 2', prefix = '2 3'
+    )
+    """,
+    """
+    INSERT INTO message_search (rowid, content, channel_id, timestamp)
+    SELECT id * 2, content, channel_id, timestamp FROM "DABubble_messagemodel"
+    """,
+    """
+    INSERT INTO message_search (rowid, content, channel_id, timestamp)
+    SELECT message.id * 2 + 1, message.content, thread."mainChannel_id", message.timestamp
+    FROM "DABubble_threadmessagemodel" message
+    JOIN "DABubble_threadchannelmodel" thread ON thread.id = message.thread_channel_id
+    """,
+    """
+    CREATE TRIGGER message_search_insert AFTER INSERT ON "DABubble_messagemodel" BEGIN
+        INSERT INTO message_search (rowid, content, channel_id, timestamp)
+        VALUES (new.id * 2, new.content, new.channel_id, new.timestamp);
+    END
+    """,
+    """
+    CREATE TRIGGER message_search_update AFTER UPDATE OF content ON "DABubble_messagemodel"
+    WHEN new.content IS NOT old.content BEGIN
+        UPDATE message_search SET content = new.content WHERE rowid = new.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER message_search_delete AFTER DELETE ON "DABubble_messagemodel" BEGIN
+        DELETE FROM message_search WHERE rowid = old.id * 2;
+    END
+    """,
+    """
+    CREATE TRIGGER thread_message_search_insert AFTER INSERT ON "DABubble_threadmessagemodel" BEGIN
+        INSERT INTO message_search (rowid, content, channel_id, timestamp)
+        SELECT new.id * 2 + 1, new.content, "mainChannel_id", new.timestamp
+        FROM "DABubble_threadchannelmodel" WHERE id = new.thread_channel_id;
+    END
+    """,
+    """
+    CREATE TRIGGER thread_message_search_update AFTER UPDATE OF content ON "DABubble_threadmessagemodel"
+    WHEN new.content IS NOT old.content BEGIN
+        UPDATE message_search SET content = new.content WHERE rowid = new.id * 2 + 1;
+    END
+    """,
+    """
+    CREATE TRIGGER thread_message_search_delete AFTER DELETE ON "DABubble_threadmessagemodel" BEGIN
+        DELETE FROM message_search WHERE rowid = old.id * 2 + 1;
+    END
+    """,
+]
+DROP_SQL = message_search.DROP_SQL
+run = message_search.run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DABubble', '0033_unique_message_thread'),
+    ]
+
+    operations = [
+        migrations.RunPython(run(DROP_SQL + CREATE_SQL), run(DROP_SQL + message_search.CREATE_SQL)),
+    ]
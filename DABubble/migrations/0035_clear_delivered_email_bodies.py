@@ -0,0 +1,21 @@
+from django.db import migrations
+
+
+def clear_delivered_bodies(apps, schema_editor):
+    """
+    Sent and failed emails no longer keep their bodies, which may contain password reset
+    links (see `DABubble.outbox.send_pending`); this clears those stored before.
+    """
+    OutgoingEmailModel = apps.get_model('DABubble', 'OutgoingEmailModel')
+    OutgoingEmailModel.objects.filter(status__in=['sent', 'failed']).update(body='', html_body='')
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('DABubble', '0034_message_search_timestamp'),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_delivered_bodies, migrations.RunPython.noop),
+    ]
@@ -1,12 +1,18 @@
 # models.py
 
+import os
+
 from django.db import models
+from django.db.models.functions import Lower
 from django.contrib.auth.models import User
 
+LEGACY_EMOJI_CODES = ('handsup', 'check', 'nerd', 'rocket')
+
 class AvatarModel(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     image = models.ImageField(upload_to='images/', blank=True, null=True)
     image_path = models.CharField(max_length=255, blank=True, null=True)
+    thumbnails = models.JSONField(default=dict, blank=True)
     default_image_path = 'assets/img/avatar/avatar_empty.svg' 
 
     def save(self, *args, **kwargs):
@@ -24,6 +30,12 @@ class ChannelModel(models.Model):
     createdFrom = models.ForeignKey(User, on_delete=models.CASCADE, related_name="created_channels")
     privateChannel = models.BooleanField(default=False)
 
+    class Meta:
+        constraints = [
+            # Only public channels: direct messages are private channels named after the partner.
+            models.UniqueConstraint(Lower('channelName'), condition=models.Q(privateChannel=False), name='unique_channel_name_ci'),
+        ]
+
     def __str__(self):
         return self.channelName
 
@@ -32,13 +44,20 @@ class MessageModel(models.Model):
     sender = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     threadOpen = models.BooleanField(default=False)
     thread_channel = models.ForeignKey('ThreadChannelModel', on_delete=models.SET_NULL, null=True, blank=True, related_name='messages')
-    emoji_handsup = models.ManyToManyField(User, related_name='emoji_handsup', blank=True)
-    emoji_check = models.ManyToManyField(User, related_name='emoji_check', blank=True)
-    emoji_nerd = models.ManyToManyField(User, related_name='emoji_nerd', blank=True)
-    emoji_rocket = models.ManyToManyField(User, related_name='emoji_rocket', blank=True)
     messageData = models.FileField(upload_to='ulpoads/', null=True, blank=True)
+    messageDataName = models.CharField(max_length=255, blank=True, default='')
+    blob = models.ForeignKey('BlobModel', on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['channel', 'timestamp', 'id'], name='message_channel_timeline'),
+            models.Index(fields=['channel', 'id'], name='message_channel_sequence'),
+            models.Index(fields=['messageData'], name='message_attachment'),
+        ]
+
     def __str__(self):
         return f'{self.sender} - {self.content[:20]}'
 
@@ -50,6 +69,11 @@ class ThreadChannelModel(models.Model):
     threadMember = models.ManyToManyField(User, related_name="threads")
     original_message = models.ForeignKey(MessageModel, on_delete=models.CASCADE, related_name='threads')
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['original_message'], name='unique_message_thread'),
+        ]
+
     def __str__(self):
         return f'{self.threadName} - {self.mainChannel.channelName}'
 
@@ -57,12 +81,163 @@ class ThreadMessageModel(models.Model):
     sender = models.ForeignKey(User, on_delete=models.CASCADE)
     content = models.TextField()
     timestamp = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
     thread_channel = models.ForeignKey('ThreadChannelModel', on_delete=models.CASCADE, related_name='thread_messages')
-    emoji_handsup = models.ManyToManyField(User, related_name='emoji_handsup_thread', blank=True)
-    emoji_check = models.ManyToManyField(User, related_name='emoji_check_thread', blank=True)
-    emoji_nerd = models.ManyToManyField(User, related_name='emoji_nerd_thread', blank=True)
-    emoji_rocket = models.ManyToManyField(User, related_name='emoji_rocket_thread', blank=True)
     messageData = models.FileField(upload_to='ulpoads/', null=True, blank=True)
+    messageDataName = models.CharField(max_length=255, blank=True, default='')
+    blob = models.ForeignKey('BlobModel', on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['thread_channel', 'timestamp', 'id'], name='thread_message_timeline'),
+            models.Index(fields=['thread_channel', 'id'], name='thread_message_sequence'),
+            models.Index(fields=['messageData'], name='thread_message_attachment'),
+        ]
+
     def __str__(self):
         return f'{self.sender} - {self.content[:20]}'
-    
+
+class ReactionModel(models.Model):
+    message = models.ForeignKey(MessageModel, on_delete=models.CASCADE, null=True, blank=True, related_name='reactions')
+    thread_message = models.ForeignKey(ThreadMessageModel, on_delete=models.CASCADE, null=True, blank=True, related_name='reactions')
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='reactions')
+    emoji = models.CharField(max_length=32)
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(message__isnull=False, thread_message__isnull=True) | models.Q(message__isnull=True, thread_message__isnull=False),
+                name='reaction_single_target',
+            ),
+            models.UniqueConstraint(fields=['message', 'emoji', 'user'], condition=models.Q(message__isnull=False), name='unique_message_reaction'),
+            models.UniqueConstraint(fields=['thread_message', 'emoji', 'user'], condition=models.Q(thread_message__isnull=False), name='unique_thread_message_reaction'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.emoji}'
+
+class ReadMarkerModel(models.Model):
+    user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='read_markers')
+    channel = models.ForeignKey(ChannelModel, on_delete=models.CASCADE, null=True, blank=True, related_name='read_markers')
+    thread_channel = models.ForeignKey(ThreadChannelModel, on_delete=models.CASCADE, null=True, blank=True, related_name='read_markers')
+    lastReadId = models.PositiveBigIntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                check=models.Q(channel__isnull=False, thread_channel__isnull=True) | models.Q(channel__isnull=True, thread_channel__isnull=False),
+                name='read_marker_single_target',
+            ),
+            models.UniqueConstraint(fields=['user', 'channel'], condition=models.Q(channel__isnull=False), name='unique_channel_read_marker'),
+            models.UniqueConstraint(fields=['user', 'thread_channel'], condition=models.Q(thread_channel__isnull=False), name='unique_thread_read_marker'),
+        ]
+
+    def __str__(self):
+        return f'{self.user} - {self.channel_id or self.thread_channel_id}: {self.lastReadId}'
+
+class ChangeModel(models.Model):
+    MESSAGE = 'message'
+    THREAD_MESSAGE = 'threadMessage'
+    THREAD = 'thread'
+    KIND_CHOICES = [
+        (MESSAGE, 'Message'),
+        (THREAD_MESSAGE, 'Thread message'),
+        (THREAD, 'Thread'),
+    ]
+
+    channel = models.ForeignKey(ChannelModel, on_delete=models.CASCADE, related_name='changes')
+    kind = models.CharField(max_length=20, choices=KIND_CHOICES)
+    object_id = models.PositiveBigIntegerField()
+    created = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['channel', 'id'], name='change_channel_sequence'),
+        ]
+
+    def __str__(self):
+        return f'{self.id} - {self.kind} {self.object_id}'
+
+class ResourceVersionModel(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    version = models.PositiveBigIntegerField(default=0)
+
+    def __str__(self):
+        return f'{self.name} - {self.version}'
+
+class OutgoingEmailModel(models.Model):
+    PENDING = 'pending'
+    SENT = 'sent'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (SENT, 'Sent'),
+        (FAILED, 'Failed'),
+    ]
+
+    to = models.EmailField()
+    from_email = models.CharField(max_length=254)
+    subject = models.CharField(max_length=255)
+    body = models.TextField()
+    html_body = models.TextField(blank=True)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField()
+    last_error = models.TextField(blank=True)
+    created = models.DateTimeField(auto_now_add=True)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'next_attempt_at'], name='outgoing_email_due'),
+        ]
+
+    def __str__(self):
+        return f'{self.to} - {self.subject} ({self.status})'
+
+class UploadModel(models.Model):
+    OPEN = 'open'
+    COMPLETE = 'complete'
+    ATTACHED = 'attached'
+    STATUS_CHOICES = [
+        (OPEN, 'Open'),
+        (COMPLETE, 'Complete'),
+        (ATTACHED, 'Attached'),
+    ]
+
+    owner = models.ForeignKey(User, on_delete=models.CASCADE, related_name='uploads')
+    filename = models.CharField(max_length=255)
+    size = models.PositiveBigIntegerField()
+    received = models.PositiveBigIntegerField(default=0)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=OPEN)
+    file = models.FileField(upload_to='ulpoads/', null=True, blank=True)
+    blob = models.ForeignKey('BlobModel', on_delete=models.PROTECT, null=True, blank=True, related_name='+')
+    created = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'updated_at'], name='upload_expiry'),
+        ]
+
+    def __str__(self):
+        return f'{self.owner} - {self.filename} ({self.status}, {self.received}/{self.size})'
+
+def blob_path(instance, filename):
+    return f'ulpoads/{instance.sha256[:2]}/{instance.sha256}{os.path.splitext(filename)[1].lower()}'
+
+class BlobModel(models.Model):
+    sha256 = models.CharField(max_length=64, unique=True)
+    file = models.FileField(upload_to=blob_path, max_length=255, unique=True)
+    size = models.PositiveBigIntegerField()
+    content_type = models.CharField(max_length=100, blank=True, default='')
+    width = models.PositiveIntegerField(null=True, blank=True)
+    height = models.PositiveIntegerField(null=True, blank=True)
+    preview = models.FileField(upload_to='ulpoads/previews/', null=True, blank=True, db_index=True)
+    refcount = models.PositiveIntegerField(default=0)
+    created = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f'{self.sha256[:12]} ({self.size} bytes, {self.refcount} references)'
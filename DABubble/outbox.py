@@ -0,0 +1,118 @@
+import logging
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.utils import timezone
+
+from .models import OutgoingEmailModel
+
+logger = logging.getLogger(__name__)
+
+OUTBOX_SETTINGS = getattr(settings, 'EMAIL_OUTBOX', {})
+BATCH_SIZE = OUTBOX_SETTINGS.get('BATCH_SIZE', 50)
+MAX_ATTEMPTS = OUTBOX_SETTINGS.get('MAX_ATTEMPTS', 5)
+RETRY_DELAY = OUTBOX_SETTINGS.get('RETRY_DELAY', 30)
+MAX_RETRY_DELAY = OUTBOX_SETTINGS.get('MAX_RETRY_DELAY', 3600)
+# A claimed email is not picked up by another worker for this many seconds.
+CLAIM_TIMEOUT = OUTBOX_SETTINGS.get('CLAIM_TIMEOUT', 300)
+# Replaces the bodies of sent and failed emails.
+CLEARED_BODY = {'body': '', 'html_body': ''}
+
+
+def enqueue_email(to, subject, body, html_body='', from_email=None):
+    """
+    Stores an email in the outbox; `send_pending` (the `send_outbox` command) delivers it.
+    """
+    return OutgoingEmailModel.objects.create(
+        to=to,
+        from_email=from_email or settings.DEFAULT_FROM_EMAIL,
+        subject=subject,
+        body=body,
+        html_body=html_body,
+        next_attempt_at=timezone.now(),
+    )
+
+
+def retry_delay(attempts):
+    """
+    Returns the seconds to wait before the next attempt: `RETRY_DELAY` doubled for every
+    failed attempt, at most `MAX_RETRY_DELAY`.
+    """
+    return min(RETRY_DELAY * 2 ** (attempts - 1), MAX_RETRY_DELAY)
+
+
+def claim_due(batch_size):
+    """
+    Returns up to `batch_size` due emails and pushes their next attempt back by
+    `CLAIM_TIMEOUT`, so that concurrent workers never send the same email twice. An email
+    whose worker died is picked up again once the claim expires.
+    """
+    now = timezone.now()
+    due = OutgoingEmailModel.objects.filter(
+        status=OutgoingEmailModel.PENDING, next_attempt_at__lte=now,
+    ).order_by('next_attempt_at', 'id')[:batch_size]
+    claimed = []
+    for email in due:
+        if OutgoingEmailModel.objects.filter(id=email.id, next_attempt_at=email.next_attempt_at).update(
+            next_attempt_at=now + timedelta(seconds=CLAIM_TIMEOUT)
+        ):
+            claimed.append(email)
+    return claimed
+
+
+def send_pending(batch_size=BATCH_SIZE):
+    """
+    Sends one batch of due emails over a single backend connection and returns the number
+    of emails sent.
+
+    A failed email is retried with exponential backoff (`retry_delay`) and marked as failed
+    after `MAX_ATTEMPTS` attempts. If the connection cannot be opened, every email of the
+    batch counts as a failed attempt.
+
+    The bodies are cleared once an email is sent or given up (`CLEARED_BODY`): they may carry
+    secrets such as password reset links, which must not stay in the database and its backups.
+    """
+    emails = claim_due(batch_size)
+    if not emails:
+        return 0
+
+    sent = 0
+    connection = get_connection()
+    try:
+        connection.open()
+    except Exception as error:
+        for email in emails:
+            record_failure(email, error)
+        return 0
+
+    try:
+        for email in emails:
+            message = EmailMultiAlternatives(email.subject, email.body, email.from_email, [email.to], connection=connection)
+            if email.html_body:
+                message.attach_alternative(email.html_body, 'text/html')
+            try:
+                message.send()
+            except Exception as error:
+                record_failure(email, error)
+                continue
+            OutgoingEmailModel.objects.filter(id=email.id).update(
+                status=OutgoingEmailModel.SENT, sent_at=timezone.now(), attempts=email.attempts + 1, last_error='',
+                **CLEARED_BODY,
+            )
+            sent += 1
+    finally:
+        connection.close()
+    return sent
+
+
+def record_failure(email, error):
+    attempts = email.attempts + 1
+    update = {'attempts': attempts, 'last_error': str(error)}
+    if attempts >= MAX_ATTEMPTS:
+        update.update(status=OutgoingEmailModel.FAILED, **CLEARED_BODY)
+        logger.error('Giving up on email %s to %s after %s attempts: %s', email.id, email.to, attempts, error)
+    else:
+        update['next_attempt_at'] = timezone.now() + timedelta(seconds=retry_delay(attempts))
+        logger.warning('Sending email %s to %s failed (attempt %s): %s', email.id, email.to, attempts, error)
+    OutgoingEmailModel.objects.filter(id=email.id).update(**update)
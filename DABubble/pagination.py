@@ -0,0 +1,88 @@
+from django.db.models import Q
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 200
+CURSOR_PARAMS = ('before', 'after', 'limit')
+
+
+class InvalidCursor(Exception):
+    """
+    Raised when the cursor or page size given in the query string cannot be used.
+    """
+
+
+def wants_cursor_page(params):
+    """
+    Returns True if the request asks for a single page instead of the full history.
+    """
+    return any(name in params for name in CURSOR_PARAMS)
+
+
+def _parse_positive_int(value, name):
+    try:
+        number = int(value)
+    except (TypeError, ValueError):
+        raise InvalidCursor(f'`{name}` must be a positive integer.')
+    if number < 1:
+        raise InvalidCursor(f'`{name}` must be a positive integer.')
+    return number
+
+
+def cursor_page(queryset, params):
+    """
+    Returns one page of `queryset` using keyset pagination on (timestamp, id).
+
+    The cursor is the id of a message from the same queryset:
+    - `before=<id>` returns the messages right before that message (scrolling back).
+    - `after=<id>` returns the messages right after that message (catching up).
+    - Without a cursor the newest messages are returned.
+    `limit` caps the page size (default `DEFAULT_PAGE_SIZE`, at most `MAX_PAGE_SIZE`).
+
+    Every page is a single range scan on the ordering columns, so fetching a page deep
+    in the history costs the same as fetching the first one.
+
+    Returns a dict with the messages of the page in chronological order (`results`),
+    whether more messages exist in the paging direction (`hasMore`) and the ids of the
+    first and last message of the page to use as the next `before`/`after` cursor.
+    """
+    limit = DEFAULT_PAGE_SIZE
+    if 'limit' in params:
+        limit = min(_parse_positive_int(params.get('limit'), 'limit'), MAX_PAGE_SIZE)
+
+    if 'before' in params and 'after' in params:
+        raise InvalidCursor('Use either `before` or `after`, not both.')
+
+    forward = 'after' in params
+    cursor_name = 'after' if forward else 'before'
+    page = queryset
+    if cursor_name in params:
+        cursor_id = _parse_positive_int(params.get(cursor_name), cursor_name)
+        cursor = queryset.filter(id=cursor_id).values('id', 'timestamp').first()
+        if cursor is None:
+            raise InvalidCursor('Cursor message not found.')
+        if forward:
+            page = page.filter(
+                Q(timestamp__gt=cursor['timestamp']) | Q(timestamp=cursor['timestamp'], id__gt=cursor['id'])
+            )
+        else:
+            page = page.filter(
+                Q(timestamp__lt=cursor['timestamp']) | Q(timestamp=cursor['timestamp'], id__lt=cursor['id'])
+            )
+
+    if forward:
+        page = page.order_by('timestamp', 'id')
+    else:
+        page = page.order_by('-timestamp', '-id')
+
+    rows = list(page[:limit + 1])
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    if not forward:
+        rows.reverse()
+
+    return {
+        'results': rows,
+        'hasMore': has_more,
+        'before': rows[0].id if rows else None,
+        'after': rows[-1].id if rows else None,
+    }
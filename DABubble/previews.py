@@ -0,0 +1,68 @@
+import logging
+import mimetypes
+from io import BytesIO
+
+from django.conf import settings
+from PIL import ExifTags, Image, ImageOps, UnidentifiedImageError
+
+from .thumbnails import EXTENSION, FORMAT
+
+logger = logging.getLogger(__name__)
+
+PREVIEW_SETTINGS = getattr(settings, 'ATTACHMENT_PREVIEWS', {})
+PREVIEW_SIZE = PREVIEW_SETTINGS.get('SIZE', 320)
+QUALITY = PREVIEW_SETTINGS.get('QUALITY', 75)
+PREVIEW_DIR = 'ulpoads/previews'
+DEFAULT_CONTENT_TYPE = 'application/octet-stream'
+# EXIF orientations that rotate the image by 90 degrees, which swaps the displayed width and height.
+ROTATED = {5, 6, 7, 8}
+
+
+def describe_attachment(file, filename):
+    """
+    Returns `(content_type, width, height, preview)` of an attachment.
+
+    Images readable by Pillow get their MIME type from the decoded format, their displayed
+    dimensions and a preview that fits into `PREVIEW_SIZE` pixels, encoded like the avatar
+    thumbnails (WebP, JPEG as fallback). Other files get the type guessed from `filename`
+    and None for the rest.
+    """
+    content_type = mimetypes.guess_type(filename)[0] or DEFAULT_CONTENT_TYPE
+    file.seek(0)
+    try:
+        with Image.open(file) as original:
+            content_type = Image.MIME.get(original.format, content_type)
+            width, height = original.size
+            if original.getexif().get(ExifTags.Base.Orientation) in ROTATED:
+                width, height = height, width
+            # Decodes JPEGs at a reduced scale, see `DABubble.thumbnails.render_thumbnails`.
+            original.draft(None, (PREVIEW_SIZE * 2, PREVIEW_SIZE * 2))
+            image = ImageOps.exif_transpose(original)
+            image.thumbnail((PREVIEW_SIZE, PREVIEW_SIZE), Image.LANCZOS)
+            image = image.convert('RGBA' if FORMAT == 'WEBP' and 'A' in image.getbands() else 'RGB')
+            output = BytesIO()
+            image.save(output, FORMAT, quality=QUALITY)
+    except UnidentifiedImageError:
+        return content_type, None, None, None
+    except Exception:
+        logger.exception('Rendering the preview of %s failed', filename)
+        return content_type, None, None, None
+    finally:
+        file.seek(0)
+    return content_type, width, height, output.getvalue()
+
+
+def attachment_meta(blob):
+    """
+    Returns the metadata of an attachment shown with its message, or None for files stored
+    before content-addressed storage (see the `dedupe_attachments` command).
+    """
+    if blob is None:
+        return None
+    return {
+        'size': blob.size,
+        'type': blob.content_type or DEFAULT_CONTENT_TYPE,
+        'width': blob.width,
+        'height': blob.height,
+        'preview': blob.preview.url if blob.preview else None,
+    }
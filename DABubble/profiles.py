@@ -0,0 +1,94 @@
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db.models import OuterRef, Subquery
+
+from .cache import LRUCache
+from .conditional import USERS, get_version
+from .models import AvatarModel
+from .reactions import display_name
+
+PROFILE_CACHE_SETTINGS = getattr(settings, 'PROFILE_CACHE', {})
+MAX_RESOLVE_IDS = 200
+# Thumbnail size used as the profile avatar once rendered (see `DABubble.thumbnails`).
+AVATAR_SIZE = str(PROFILE_CACHE_SETTINGS.get('AVATAR_SIZE', 64))
+
+
+class Profile:
+    """
+    What a client needs to render a user next to a message: display name and avatar URL.
+
+    Slots keep each cached profile at a few dozen bytes, so the whole user base fits in
+    the cache of every worker.
+    """
+    __slots__ = ('id', 'name', 'avatar')
+
+    def __init__(self, id, name, avatar):
+        self.id = id
+        self.name = name
+        self.avatar = avatar
+
+    def as_dict(self):
+        return {'id': self.id, 'name': self.name, 'avatar': self.avatar}
+
+
+# user id -> Profile, valid for the users version counter it was loaded at (see
+# `DABubble.conditional.USERS`), which every user and avatar change increments.
+profile_cache = LRUCache(
+    max_size=PROFILE_CACHE_SETTINGS.get('MAX_SIZE', 50000),
+    ttl=PROFILE_CACHE_SETTINGS.get('TTL', 600),
+)
+
+
+def avatar_url(image, image_path, thumbnails):
+    storage = AvatarModel._meta.get_field('image').storage
+    if thumbnails and AVATAR_SIZE in thumbnails:
+        return storage.url(thumbnails[AVATAR_SIZE])
+    if image:
+        return storage.url(image)
+    return image_path or AvatarModel.default_image_path
+
+
+def load_profiles(user_ids):
+    """
+    Loads the profiles of `user_ids` in one query; the newest avatar of each user is read
+    by correlated subqueries. The avatar URL points to the `AVATAR_SIZE` thumbnail once it
+    is rendered, to the original image before.
+    """
+    avatars = AvatarModel.objects.filter(user=OuterRef('pk')).order_by('-id')
+    users = User.objects.filter(id__in=user_ids).annotate(
+        avatar_image=Subquery(avatars.values('image')[:1]),
+        avatar_path=Subquery(avatars.values('image_path')[:1]),
+        avatar_thumbnails=Subquery(avatars.values('thumbnails')[:1]),
+    ).values_list('id', 'first_name', 'last_name', 'username', 'avatar_image', 'avatar_path', 'avatar_thumbnails')
+    return {
+        id: Profile(id, display_name(first_name, last_name, username), avatar_url(image, image_path, thumbnails))
+        for id, first_name, last_name, username, image, image_path, thumbnails in users
+    }
+
+
+def resolve_profiles(user_ids):
+    """
+    Returns `{id: Profile}` for the existing users among `user_ids`.
+
+    Cached profiles are checked against the users version counter (one query); the missing
+    ones are loaded together (one more query) and cached.
+    """
+    version = get_version(USERS)
+    profiles = {}
+    missing = []
+    for user_id in user_ids:
+        profile = profile_cache.get(user_id, version=version)
+        if profile is None:
+            missing.append(user_id)
+        else:
+            profiles[user_id] = profile
+    if missing:
+        loaded = load_profiles(missing)
+        for user_id, profile in loaded.items():
+            profile_cache.set(user_id, profile, version=version)
+        profiles.update(loaded)
+    return profiles
+
+
+def forget_profile(user_id):
+    profile_cache.delete(user_id)
@@ -0,0 +1,155 @@
+import re
+
+from django.contrib.auth.models import User
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Prefetch, Q, Window, prefetch_related_objects
+from django.db.models.functions import RowNumber
+
+from .models import LEGACY_EMOJI_CODES, MessageModel, ReactionModel
+
+SUMMARY_SAMPLE_SIZE = 3
+EMOJI_CODE_PATTERN = re.compile(r'^[a-z0-9_]{1,32}$')
+
+
+def reactions_prefetch():
+    """
+    Returns the prefetch that loads all reactions of a page of messages, with their users, in one query.
+    """
+    return Prefetch('reactions', queryset=ReactionModel.objects.select_related('user').order_by('id'))
+
+
+def reaction_target(message):
+    """
+    Returns the `ReactionModel` field that points to `message` ('message' or 'thread_message').
+    """
+    return 'message' if isinstance(message, MessageModel) else 'thread_message'
+
+
+def is_valid_emoji_code(code):
+    """
+    Returns True if `code` can be stored as an emoji code (lowercase letters, digits and `_`).
+    """
+    return bool(EMOJI_CODE_PATTERN.match(code))
+
+
+def set_reaction(message, user, code, reacted):
+    """
+    Adds (`reacted=True`) or removes the reaction `code` of `user` on `message`.
+
+    Only the single reaction row is inserted or deleted, so the cost does not depend on how many
+    reactions the message already has. Both directions are idempotent: the unique constraint
+    turns a concurrent or repeated add into a no-op instead of a duplicate, and removing a
+    missing reaction deletes nothing.
+
+    Returns the resulting state as `{'emoji': code, 'reacted': bool, 'count': int}`.
+    """
+    target = reaction_target(message)
+    if reacted:
+        try:
+            with transaction.atomic():
+                ReactionModel.objects.create(**{target: message}, user=user, emoji=code)
+        except IntegrityError:
+            pass
+    else:
+        ReactionModel.objects.filter(**{target: message}, user=user, emoji=code).delete()
+
+    count = ReactionModel.objects.filter(**{target: message}, emoji=code).count()
+    return {'emoji': code, 'reacted': reacted, 'count': count}
+
+
+def reactors(message, code):
+    """
+    Returns the users that reacted to `message` with `code`.
+
+    The reactions are prefetched on first use, so a message that was not loaded with
+    `reactions_prefetch()` still costs a single query for all of its emojis.
+    """
+    if 'reactions' not in getattr(message, '_prefetched_objects_cache', {}):
+        prefetch_related_objects([message], reactions_prefetch())
+    return [reaction.user for reaction in message.reactions.all() if reaction.emoji == code]
+
+
+def replace_legacy_reactions(message, data):
+    """
+    Replaces the reactions of `message` for the legacy emoji codes with the user lists in `data`.
+
+    `data` uses the old request format: one `emoji_<code>` key per code holding a list of user
+    dicts with an `id`. A missing key clears that emoji. Only the rows that actually changed are
+    deleted or inserted; unknown user ids are ignored.
+    """
+    wanted = {
+        (code, int(user['id']))
+        for code in LEGACY_EMOJI_CODES
+        for user in data.get(f'emoji_{code}', [])
+    }
+    known_users = set(User.objects.filter(id__in={user_id for _, user_id in wanted}).values_list('id', flat=True))
+    wanted = {(code, user_id) for code, user_id in wanted if user_id in known_users}
+
+    reactions = message.reactions.filter(emoji__in=LEGACY_EMOJI_CODES)
+    existing = set(reactions.values_list('emoji', 'user_id'))
+
+    removed = existing - wanted
+    if removed:
+        condition = Q()
+        for code, user_id in removed:
+            condition |= Q(emoji=code, user_id=user_id)
+        reactions.filter(condition).delete()
+
+    added = wanted - existing
+    if added:
+        target = reaction_target(message)
+        ReactionModel.objects.bulk_create(
+            [ReactionModel(**{target: message}, user_id=user_id, emoji=code) for code, user_id in added],
+            ignore_conflicts=True,
+        )
+
+
+def wants_reaction_summary(params):
+    """
+    Returns True if the request asks for compact reaction summaries (`?reactions=summary`).
+    """
+    return params.get('reactions') == 'summary'
+
+
+def display_name(first_name, last_name, username):
+    return f'{first_name} {last_name}'.strip() or username
+
+
+def summarize_reactions(reactions, target, user):
+    """
+    Returns the compact reaction summary of every message referenced by `reactions`.
+
+    `reactions` is a `ReactionModel` queryset already narrowed down to the messages of a page or
+    channel, `target` is the field pointing to them ('message' or 'thread_message'). The result
+    maps each message id to `{code: {'count': int, 'reacted': bool, 'users': [names]}}` with at
+    most `SUMMARY_SAMPLE_SIZE` sample names per emoji.
+
+    The summary is built from two grouped queries, whatever the number of reactions.
+    """
+    target_id = f'{target}_id'
+    summaries = {}
+    counts = (
+        reactions
+        .values(target_id, 'emoji')
+        .annotate(count=Count('id'), reacted=Count('id', filter=Q(user=user)))
+        .order_by()
+    )
+    for row in counts:
+        summaries.setdefault(row[target_id], {})[row['emoji']] = {
+            'count': row['count'],
+            'reacted': row['reacted'] > 0,
+            'users': [],
+        }
+
+    samples = (
+        reactions
+        .annotate(position=Window(RowNumber(), partition_by=[F(target_id), F('emoji')], order_by=F('id').asc()))
+        .filter(position__lte=SUMMARY_SAMPLE_SIZE)
+        .values_list(target_id, 'emoji', 'user__first_name', 'user__last_name', 'user__username')
+        .order_by('id')
+    )
+    for message_id, code, first_name, last_name, username in samples:
+        summary = summaries.get(message_id, {}).get(code)
+        if summary is not None:
+            summary['users'].append(display_name(first_name, last_name, username))
+    return summaries
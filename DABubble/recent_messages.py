@@ -0,0 +1,144 @@
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Max
+
+from .cache import LRUCache
+from .conditional import users_version
+from .models import ChangeModel, ChannelModel, MessageModel
+from .pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, cursor_page, wants_cursor_page
+from .reactions import reactions_prefetch, wants_reaction_summary
+from .serializers import MessageSerializer
+
+RECENT_MESSAGES_SETTINGS = getattr(settings, 'RECENT_MESSAGES_CACHE', {})
+WINDOW_SIZE = min(RECENT_MESSAGES_SETTINGS.get('WINDOW', DEFAULT_PAGE_SIZE), MAX_PAGE_SIZE)
+
+# channel id -> {'messages': [serialized message, ...], 'hasMore': bool}, oldest message first.
+# At most MAX_CHANNELS windows of WINDOW_SIZE messages are kept, least recently read first out.
+recent_messages = LRUCache(
+    max_size=RECENT_MESSAGES_SETTINGS.get('MAX_CHANNELS', 1000),
+    ttl=RECENT_MESSAGES_SETTINGS.get('TTL', 300),
+)
+
+
+def messages_version(channel_id, before=None):
+    """
+    Returns the version of the messages of a channel: the id of the newest `message` change
+    log entry (0 if there is none), optionally only among the entries older than `before`,
+    and the users version counter, read together in one query.
+
+    Every write to a message of the channel appends such an entry (see `DABubble.events`) and
+    every profile change bumps the users counter (the messages embed their reactors), so a
+    cached window built at this version is current as long as the version does not change.
+    """
+    return _version(_message_changes(channel_id, before).aggregate(version=Max('id'), users=users_version()))
+
+
+async def amessages_version(channel_id):
+    return _version(await _message_changes(channel_id).aaggregate(version=Max('id'), users=users_version()))
+
+
+def _version(versions):
+    return versions['version'] or 0, versions['users']
+
+
+def _message_changes(channel_id, before=None):
+    changes = ChangeModel.objects.filter(channel_id=channel_id, kind=ChangeModel.MESSAGE)
+    if before is not None:
+        changes = changes.filter(id__lt=before)
+    return changes
+
+
+def recent_limit(params):
+    """
+    Returns the page size if the request asks for the newest page of messages in the full
+    reaction format and the page fits into the cached window, otherwise None.
+    """
+    if not wants_cursor_page(params) or wants_reaction_summary(params):
+        return None
+    if 'before' in params or 'after' in params:
+        return None
+    try:
+        limit = int(params.get('limit'))
+    except (TypeError, ValueError):
+        return None
+    return limit if 1 <= limit <= WINDOW_SIZE else None
+
+
+def _load_window(channel_id, version):
+    if not ChannelModel.objects.filter(id=channel_id).exists():
+        return None
+    messages = MessageModel.objects.filter(channel_id=channel_id).select_related('blob').prefetch_related(reactions_prefetch())
+    page = cursor_page(messages, {'limit': WINDOW_SIZE})
+    window = {'messages': list(MessageSerializer(page['results'], many=True).data), 'hasMore': page['hasMore']}
+    recent_messages.set(channel_id, window, version=version)
+    return window
+
+
+async def arecent_page(channel_id, limit):
+    """
+    Returns the newest `limit` messages of the channel, serialized, in the format of
+    `DABubble.pagination.cursor_page`, or None if the channel does not exist.
+
+    The page is cut from the cached window of the channel while the window is current for
+    `messages_version`; a hit costs one query on the async ORM. Otherwise the window is
+    rebuilt from the database in a worker thread and stored. The version is read before
+    loading, so a write that happens meanwhile makes the next read rebuild it again instead
+    of serving a stale window.
+    """
+    version = await amessages_version(channel_id)
+    window = recent_messages.get(channel_id, version=version)
+    if window is None:
+        window = await sync_to_async(_load_window)(channel_id, version)
+    return _cut_page(window, limit)
+
+
+def _cut_page(window, limit):
+    if window is None:
+        return None
+    messages = window['messages'][-limit:]
+    return {
+        'results': messages,
+        'hasMore': window['hasMore'] or len(window['messages']) > limit,
+        'before': messages[0]['id'] if messages else None,
+        'after': messages[-1]['id'] if messages else None,
+    }
+
+
+def cache_message(change, data, created=False):
+    """
+    Writes the serialized message `data`, just recorded as `change`, through to the cached
+    window of its channel: a `created` message is appended, an edited one replaced in place.
+
+    The window is only updated if it was current right before `change`; otherwise it is
+    dropped and rebuilt by the next read.
+    """
+    channel_id = change.channel_id
+    if channel_id not in recent_messages:
+        return
+    version = messages_version(channel_id, before=change.id)
+    window = recent_messages.peek(channel_id, version=version)
+    if window is None:
+        recent_messages.delete(channel_id)
+        return
+
+    messages = list(window['messages'])
+    has_more = window['hasMore']
+    if created:
+        messages.append(data)
+        if len(messages) > WINDOW_SIZE:
+            messages = messages[-WINDOW_SIZE:]
+            has_more = True
+    else:
+        messages = [data if message['id'] == data['id'] else message for message in messages]
+    recent_messages.set(channel_id, {'messages': messages, 'hasMore': has_more}, version=(change.id, version[1]))
+
+
+def forget_channel(channel_id):
+    recent_messages.delete(channel_id)
+
+
+def forget_all_channels():
+    """
+    Drops every cached window, e.g. after messages were deleted without a change log entry.
+    """
+    recent_messages.delete_where(lambda window: True)
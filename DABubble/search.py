@@ -0,0 +1,117 @@
+import html
+import re
+
+from django.db import connection
+
+from .models import ChannelModel, MessageModel, ThreadMessageModel
+
+# Full-text index created in migration 0024 (with the timestamp since 0034) and kept in sync by
+# triggers on both message tables. The rowid encodes the source row: 2 * id for a message,
+# 2 * id + 1 for a thread message; the two id sequences are independent, so the newest matches
+# are chosen by `timestamp`.
+SEARCH_TABLE = 'message_search'
+DEFAULT_SEARCH_LIMIT = 20
+MAX_SEARCH_LIMIT = 100
+SNIPPET_TOKENS = 12
+# Only the newest matches are ranked, which bounds the cost of very common words and short prefixes.
+RANK_WINDOW = 2000
+
+# Control characters cannot occur in the escaped text, so they mark the matches until the
+# snippet is HTML-escaped and the marks are turned into <mark> tags.
+MATCH_START = '\x02'
+MATCH_END = '\x03'
+TERM = re.compile(r'\w+')
+
+
+def search_available():
+    return connection.vendor == 'sqlite'
+
+
+def fts_query(text):
+    """
+    Turns user input into an FTS5 query: every word must occur, the last one as a prefix so
+    results appear while typing. Returns None if the input contains no word.
+
+    The words are quoted, so FTS5 operators and punctuation in the input have no effect.
+    """
+    terms = TERM.findall(text)
+    if not terms:
+        return None
+    quoted = [f'"{term}"' for term in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def placeholders(values):
+    return ', '.join(['%s'] * len(values))
+
+
+def highlight(snippet):
+    return html.escape(snippet).replace(MATCH_START, '<mark>').replace(MATCH_END, '</mark>')
+
+
+def search_messages(user, text, limit=DEFAULT_SEARCH_LIMIT, offset=0):
+    """
+    Returns `(results, has_more)` for the messages and thread messages matching `text` in the
+    channels `user` is a member of, best match first (FTS5 `rank`, i.e. bm25) among the
+    newest `RANK_WINDOW` matches.
+
+    Each result holds the type, id, channel, thread, sender, timestamp and an HTML snippet
+    of the content with the matched words wrapped in `<mark>`.
+    """
+    query = fts_query(text)
+    channel_ids = list(ChannelModel.objects.filter(channelMembers=user).values_list('id', flat=True))
+    if query is None or not channel_ids:
+        return [], False
+
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM ('
+            f'SELECT rowid, rank FROM {SEARCH_TABLE} WHERE {SEARCH_TABLE} MATCH %s AND channel_id IN ({placeholders(channel_ids)}) '
+            f'ORDER BY timestamp DESC, rowid DESC LIMIT %s'
+            f') ORDER BY rank LIMIT %s OFFSET %s',
+            [query, *channel_ids, RANK_WINDOW, limit + 1, offset],
+        )
+        rowids = [rowid for rowid, in cursor.fetchall()]
+        has_more = len(rowids) > limit
+        rowids = rowids[:limit]
+        if not rowids:
+            return [], has_more
+        # Snippets are built in a second statement, only for the rows of the page.
+        cursor.execute(
+            f'SELECT rowid, snippet({SEARCH_TABLE}, 0, %s, %s, %s, %s) FROM {SEARCH_TABLE} '
+            f'WHERE {SEARCH_TABLE} MATCH %s AND rowid IN ({placeholders(rowids)})',
+            [MATCH_START, MATCH_END, '…', SNIPPET_TOKENS, query, *rowids],
+        )
+        snippets = dict(cursor.fetchall())
+    rows = [(rowid, snippets.get(rowid, '')) for rowid in rowids]
+
+    message_ids = [rowid // 2 for rowid, _ in rows if rowid % 2 == 0]
+    thread_message_ids = [rowid // 2 for rowid, _ in rows if rowid % 2 == 1]
+    messages = {
+        message['id']: message for message in MessageModel.objects.filter(id__in=message_ids).values(
+            'id', 'channel', 'sender', 'timestamp'
+        )
+    }
+    thread_messages = {
+        message['id']: message for message in ThreadMessageModel.objects.filter(id__in=thread_message_ids).values(
+            'id', 'thread_channel', 'thread_channel__mainChannel', 'sender', 'timestamp'
+        )
+    }
+
+    results = []
+    for rowid, snippet in rows:
+        if rowid % 2 == 0:
+            message = messages.get(rowid // 2)
+            if message is None:
+                continue
+            results.append({'type': 'message', 'id': message['id'], 'channel': message['channel'], 'thread': None,
+                            'sender': message['sender'], 'timestamp': message['timestamp'], 'snippet': highlight(snippet)})
+        else:
+            message = thread_messages.get(rowid // 2)
+            if message is None:
+                continue
+            results.append({'type': 'threadMessage', 'id': message['id'], 'channel': message['thread_channel__mainChannel'],
+                            'thread': message['thread_channel'], 'sender': message['sender'],
+                            'timestamp': message['timestamp'], 'snippet': highlight(snippet)})
+    return results, has_more
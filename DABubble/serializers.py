@@ -1,7 +1,10 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import AvatarModel, ChannelModel, MessageModel, ThreadMessageModel, ThreadChannelModel
+from .models import AvatarModel, ChannelModel, MessageModel, ThreadMessageModel, ThreadChannelModel, UploadModel
 from rest_framework.serializers import ModelSerializer
+from .previews import attachment_meta
+from .reactions import reactors
+from .thumbnails import thumbnail_urls
 
 class RegistrationSerializer(serializers.ModelSerializer):
     """
@@ -59,13 +62,20 @@ class AvatarModelSerializer(serializers.ModelSerializer):
 
     This serializer is used for creating or updating a user's avatar. 
     If neither an image nor an image path is provided, the default image path is used.
+    `thumbnails` maps each pre-rendered size to its URL (`{"32": url, "64": url, "128": url}`);
+    it is empty until the thumbnails of an uploaded image are rendered.
     """
+
+    thumbnails = serializers.SerializerMethodField()
     
     class Meta:
         model = AvatarModel
-        fields = ['id', 'user', 'image', 'image_path']
+        fields = ['id', 'user', 'image', 'image_path', 'thumbnails']
         read_only_fields = ['user']
 
+    def get_thumbnails(self, obj):
+        return thumbnail_urls(obj, self.context.get('request'))
+
     def validate(self, data):
         if not data.get('image') and not data.get('image_path'):
             data['image_path'] = AvatarModel.default_image_path
@@ -84,46 +94,114 @@ class UserSerializer(ModelSerializer):
     class Meta:
         model = User
         fields = ['first_name', 'last_name', 'email', 'id']
-        
-        
-class ThreadMessageSerializer(serializers.ModelSerializer):
+
+class LegacyReactionsMixin:
+    """
+    Serializes the reactions of a message in the original `emoji_<code>` format.
+
+    Each of the four legacy emoji fields lists the users (`UserSerializer`) that reacted with it.
+    The users are taken from the prefetched `reactions` of the message when available.
+    """
+
+    def get_emoji_handsup(self, obj):
+        return UserSerializer(reactors(obj, 'handsup'), many=True).data
+
+    def get_emoji_check(self, obj):
+        return UserSerializer(reactors(obj, 'check'), many=True).data
+
+    def get_emoji_nerd(self, obj):
+        return UserSerializer(reactors(obj, 'nerd'), many=True).data
+
+    def get_emoji_rocket(self, obj):
+        return UserSerializer(reactors(obj, 'rocket'), many=True).data
+
+
+class AttachmentMetaMixin:
+    """
+    Adds `messageDataMeta`: size, MIME type, image dimensions and preview URL of the
+    attachment (see `DABubble.previews.attachment_meta`), so clients can render the message
+    list without fetching the files. Querysets select the related `blob` to avoid a query
+    per message.
+    """
+
+    def get_messageDataMeta(self, obj):
+        return attachment_meta(obj.blob)
+
+
+class ThreadMessageSerializer(AttachmentMetaMixin, LegacyReactionsMixin, serializers.ModelSerializer):
     """
     Serializer for the ThreadMessage model.
 
     This serializer is used to serialize messages within a thread. 
-    It supports emoji reactions and file uploads.
+    It supports emoji reactions (read-only, see `LegacyReactionsMixin`) and file uploads.
     """
     
     content = serializers.CharField(required=False)
-    emoji_handsup = UserSerializer(many=True, required=False)
-    emoji_check = UserSerializer(many=True, required=False)
-    emoji_nerd = UserSerializer(many=True, required=False)
-    emoji_rocket = UserSerializer(many=True, required=False)
+    emoji_handsup = serializers.SerializerMethodField()
+    emoji_check = serializers.SerializerMethodField()
+    emoji_nerd = serializers.SerializerMethodField()
+    emoji_rocket = serializers.SerializerMethodField()
     messageData = serializers.FileField(required=False, allow_null=True)
+    messageDataMeta = serializers.SerializerMethodField()
     class Meta:
         model = ThreadMessageModel
-        fields = ['id', 'sender', 'thread_channel', 'content', 'timestamp', 'emoji_handsup', 'emoji_check', 'emoji_nerd', 'emoji_rocket', 'messageData']
-        read_only_fields = ['sender']
+        fields = ['id', 'sender', 'thread_channel', 'content', 'timestamp', 'updated_at', 'emoji_handsup', 'emoji_check', 'emoji_nerd', 'emoji_rocket', 'messageData', 'messageDataName', 'messageDataMeta']
+        read_only_fields = ['sender', 'messageDataName']
 
-class MessageSerializer(serializers.ModelSerializer):
+class MessageSerializer(AttachmentMetaMixin, LegacyReactionsMixin, serializers.ModelSerializer):
     """
     Serializer for the Message model.
 
     This serializer is used to serialize messages within a channel. 
-    It also supports emoji reactions and file uploads.
+    It also supports emoji reactions (read-only, see `LegacyReactionsMixin`) and file uploads.
     """
     
     content = serializers.CharField(required=False)
     thread_channel = serializers.PrimaryKeyRelatedField(read_only=True)
-    emoji_handsup = UserSerializer(many=True, required=False)
-    emoji_check = UserSerializer(many=True, required=False)
-    emoji_nerd = UserSerializer(many=True, required=False)
-    emoji_rocket = UserSerializer(many=True, required=False)
+    emoji_handsup = serializers.SerializerMethodField()
+    emoji_check = serializers.SerializerMethodField()
+    emoji_nerd = serializers.SerializerMethodField()
+    emoji_rocket = serializers.SerializerMethodField()
     messageData = serializers.FileField(required=False, allow_null=True)
+    messageDataMeta = serializers.SerializerMethodField()
     class Meta:
         model = MessageModel
-        fields = ['id', 'channel', 'sender', 'content', 'timestamp', 'threadOpen', 'thread_channel', 'emoji_handsup', 'emoji_check', 'emoji_nerd', 'emoji_rocket', 'messageData']
-        read_only_fields = ['sender']
+        fields = ['id', 'channel', 'sender', 'content', 'timestamp', 'updated_at', 'threadOpen', 'thread_channel', 'emoji_handsup', 'emoji_check', 'emoji_nerd', 'emoji_rocket', 'messageData', 'messageDataName', 'messageDataMeta']
+        read_only_fields = ['sender', 'messageDataName']
+
+class CompactReactionsMixin:
+    """
+    Replaces the four `emoji_<code>` user lists with a compact `reactions` summary.
+
+    The summaries are computed for the whole page with `summarize_reactions` and passed in the
+    serializer context as `reaction_summaries` (message id -> summary). The serializers using
+    it leave the `emoji_<code>` fields out of `Meta.fields`.
+    """
+
+    def get_reactions(self, obj):
+        return self.context['reaction_summaries'].get(obj.id, {})
+
+
+class CompactMessageSerializer(CompactReactionsMixin, MessageSerializer):
+    """
+    Serializer for messages with a compact reaction summary instead of the reacting users.
+    """
+
+    reactions = serializers.SerializerMethodField()
+
+    class Meta(MessageSerializer.Meta):
+        fields = [field for field in MessageSerializer.Meta.fields if not field.startswith('emoji_')] + ['reactions']
+
+
+class CompactThreadMessageSerializer(CompactReactionsMixin, ThreadMessageSerializer):
+    """
+    Serializer for thread messages with a compact reaction summary instead of the reacting users.
+    """
+
+    reactions = serializers.SerializerMethodField()
+
+    class Meta(ThreadMessageSerializer.Meta):
+        fields = [field for field in ThreadMessageSerializer.Meta.fields if not field.startswith('emoji_')] + ['reactions']
 
 class ChannelSerializer(serializers.ModelSerializer):
     """
@@ -141,6 +219,23 @@ class ChannelSerializer(serializers.ModelSerializer):
         model = ChannelModel
         fields = ['id', 'channelName', 'channelDescription', 'channelMembers', 'messages', 'createdFrom', 'privateChannel']
 
+class ChannelSummarySerializer(serializers.ModelSerializer):
+    """
+    Read-only serializer for the channel list.
+
+    This serializer describes a channel without its messages. `memberCount`, `lastActivity` and
+    `lastMessageId` have to be annotated on the queryset (see `ChannelView.get`).
+    """
+
+    createdFrom = UserSerializer(read_only=True)
+    memberCount = serializers.IntegerField(read_only=True)
+    lastActivity = serializers.DateTimeField(read_only=True, allow_null=True)
+    lastMessageId = serializers.IntegerField(read_only=True, allow_null=True)
+
+    class Meta:
+        model = ChannelModel
+        fields = ['id', 'channelName', 'channelDescription', 'privateChannel', 'memberCount', 'createdFrom', 'lastActivity', 'lastMessageId']
+
 class ThreadChannelSerializer(serializers.ModelSerializer):
     """
     Serializer for the ThreadChannel model.
@@ -153,4 +248,17 @@ class ThreadChannelSerializer(serializers.ModelSerializer):
 
     class Meta:
         model = ThreadChannelModel
-        fields = ['id', 'threadName', 'threadDescription', 'mainChannel', 'createdFrom', 'threadMember', 'original_message', 'thread_messages']
\ No newline at end of file
+        fields = ['id', 'threadName', 'threadDescription', 'mainChannel', 'createdFrom', 'threadMember', 'original_message', 'thread_messages']
+
+class UploadSerializer(serializers.ModelSerializer):
+    """
+    Read-only serializer for upload sessions.
+
+    `received` is the number of bytes stored so far, i.e. the offset of the next chunk.
+    `file` is set once the upload is complete.
+    """
+
+    class Meta:
+        model = UploadModel
+        fields = ['id', 'filename', 'size', 'received', 'status', 'file', 'created']
+        read_only_fields = fields
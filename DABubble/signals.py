@@ -0,0 +1,67 @@
+from django.contrib.auth.models import User
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_token, forget_user_tokens
+from .conditional import CHANNELS, USERS, bump_version
+from .blobs import release_blob
+from .models import AvatarModel, ChannelModel, MessageModel, ThreadMessageModel, UploadModel
+from .profiles import forget_profile
+from .thumbnails import delete_thumbnails
+from .recent_messages import forget_all_channels, forget_channel
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def user_changed(sender, instance, **kwargs):
+    forget_user_tokens(instance.pk)
+    forget_profile(instance.pk)
+    if kwargs['signal'] is post_delete:
+        forget_all_channels()
+    if kwargs.get('update_fields') == frozenset({'last_login'}):
+        return
+    bump_version(USERS)
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(sender, instance, **kwargs):
+    forget_token(instance.key)
+
+
+@receiver(post_save, sender=ChannelModel)
+@receiver(post_delete, sender=ChannelModel)
+@receiver(m2m_changed, sender=ChannelModel.channelMembers.through)
+def channel_changed(sender, **kwargs):
+    if kwargs.get('action', 'post_').startswith('post_'):
+        bump_version(CHANNELS)
+
+
+@receiver(post_delete, sender=ChannelModel)
+def channel_deleted(sender, instance, **kwargs):
+    forget_channel(instance.pk)
+
+
+@receiver(post_save, sender=AvatarModel)
+@receiver(post_delete, sender=AvatarModel)
+def avatar_changed(sender, instance, **kwargs):
+    forget_profile(instance.user_id)
+    bump_version(USERS)
+
+
+@receiver(post_delete, sender=AvatarModel)
+def avatar_deleted(sender, instance, **kwargs):
+    delete_thumbnails(instance)
+
+
+@receiver(post_delete, sender=MessageModel)
+@receiver(post_delete, sender=ThreadMessageModel)
+def message_deleted(sender, instance, **kwargs):
+    release_blob(instance.blob_id)
+
+
+@receiver(post_delete, sender=UploadModel)
+def upload_deleted(sender, instance, **kwargs):
+    # Only a complete upload still holds its reference; an attached one passed it to its message.
+    if instance.status == UploadModel.COMPLETE:
+        release_blob(instance.blob_id)
@@ -1,3 +1,1232 @@
-from django.test import TestCase
+import hashlib
+import os
+import shutil
+import tempfile
+from datetime import timedelta
+from io import BytesIO, StringIO
+from smtplib import SMTPException
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import sync_to_async
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth.models import User
+from django.core import mail
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.mail.backends.locmem import EmailBackend
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+from DABubble_Backend.asgi import application
+
+from .authentication import token_cache
+from .models import AvatarModel, BlobModel, ChangeModel, ChannelModel, MessageModel, OutgoingEmailModel, ReactionModel, ThreadChannelModel, ThreadMessageModel, UploadModel
+from .outbox import MAX_ATTEMPTS, send_pending
+from .pagination import MAX_PAGE_SIZE
+from .profiles import profile_cache
+from .recent_messages import recent_messages
+from .serializers import MessageSerializer
+from .unread import UNREAD_LIMIT
+from .uploads import OffsetMismatch, expire_uploads, partial_path, write_chunk
+
+
+class ReadQueryCountTests(TestCase):
+    """
+    Pins the number of queries of the chat read endpoints, independent of the page size.
+
+    The messages are created without change log entries, so the recent messages cache is
+    cleared before every request to measure the database path.
+    """
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.users = [User.objects.create_user(f'user{i}', f'user{i}@example.com', 'secret') for i in range(3)]
+        cls.user = cls.users[0]
+        cls.channel = ChannelModel.objects.create(channelName='general', channelDescription='General', createdFrom=cls.user)
+        cls.channel.channelMembers.set(cls.users)
+        root = MessageModel.objects.create(channel=cls.channel, sender=cls.user, content='root')
+        cls.thread = ThreadChannelModel.objects.create(
+            threadName='thread', threadDescription='thread', mainChannel=cls.channel,
+            createdFrom=cls.user, original_message=root,
+        )
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def add_messages(self, count):
+        for i in range(count):
+            message = MessageModel.objects.create(channel=self.channel, sender=self.user, content=f'message {i}')
+            thread_message = ThreadMessageModel.objects.create(thread_channel=self.thread, sender=self.user, content=f'reply {i}')
+            ReactionModel.objects.bulk_create(
+                [ReactionModel(message=message, user=user, emoji='handsup') for user in self.users]
+                + [ReactionModel(message=message, user=self.user, emoji='rocket')]
+                + [ReactionModel(thread_message=thread_message, user=user, emoji='check') for user in self.users]
+            )
+
+    def assert_constant_queries(self, url, expected):
+        self.add_messages(2)
+        recent_messages.clear()
+        with self.assertNumQueries(expected):
+            self.assertEqual(self.client.get(url).status_code, 200)
+        self.add_messages(20)
+        recent_messages.clear()
+        with self.assertNumQueries(expected):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_message_list(self):
+        self.assert_constant_queries(f'/channel/{self.channel.id}/messages/', 4)
+
+    def test_message_page(self):
+        self.assert_constant_queries(f'/channel/{self.channel.id}/messages/?limit=50&after={self.thread.original_message_id}', 5)
+
+    def test_recent_messages_cache_miss(self):
+        self.assert_constant_queries(f'/channel/{self.channel.id}/messages/?limit=50', 5)
+
+    def test_thread_message_list(self):
+        self.assert_constant_queries(f'/channelThread/{self.thread.id}/messages/', 3)
+
+    def test_message_page_with_reaction_summary(self):
+        self.assert_constant_queries(f'/channel/{self.channel.id}/messages/?limit=50&reactions=summary', 5)
+
+    def test_thread_message_list_with_reaction_summary(self):
+        self.assert_constant_queries(f'/channelThread/{self.thread.id}/messages/?reactions=summary', 4)
+
+    def test_channel_summaries(self):
+        self.assert_constant_queries('/channel/', 3)
+
+    def test_channel_summary_shape(self):
+        self.add_messages(2)
+        latest = MessageModel.objects.filter(channel=self.channel).latest('timestamp', 'id')
+        summary = self.client.get('/channel/').data[0]
+        self.assertEqual(set(summary), {'id', 'channelName', 'channelDescription', 'privateChannel', 'memberCount',
+                                        'createdFrom', 'lastActivity', 'lastMessageId'})
+        self.assertEqual((summary['memberCount'], summary['lastMessageId']), (3, latest.id))
+        self.assertEqual(summary['createdFrom']['id'], self.user.id)
+        # The nested form with messages is opt-in.
+        self.assertEqual(len(self.client.get('/channel/?expand=messages').data[0]['messages']), 3)
+
+    def test_channel_list_with_messages(self):
+        self.assert_constant_queries('/channel/?expand=messages', 6)
+
+    def test_single_channel(self):
+        self.assert_constant_queries(f'/channel/{self.channel.id}/', 4)
+
+    def test_legacy_reaction_format(self):
+        self.add_messages(1)
+        message = MessageModel.objects.latest('id')
+        response = self.client.patch(
+            f'/channel/{self.channel.id}/messages/{message.id}/emoji/',
+            {'emoji_handsup': [{'id': self.users[1].id}], 'emoji_nerd': [{'id': self.user.id}]},
+            format='json',
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([user['id'] for user in response.data['emoji_handsup']], [self.users[1].id])
+        self.assertEqual([user['id'] for user in response.data['emoji_nerd']], [self.user.id])
+        self.assertEqual(response.data['emoji_check'], [])
+        self.assertEqual(response.data['emoji_rocket'], [])
+
+    def test_reaction_summary(self):
+        self.add_messages(1)
+        message = MessageModel.objects.latest('id')
+        response = self.client.get(f'/channel/{self.channel.id}/messages/?limit=1&reactions=summary')
+        reactions = response.data['results'][0]['reactions']
+        self.assertNotIn('emoji_handsup', response.data['results'][0])
+        self.assertEqual(reactions['handsup'], {'count': 3, 'reacted': True, 'users': ['user0', 'user1', 'user2']})
+        self.assertEqual(reactions['rocket'], {'count': 1, 'reacted': True, 'users': ['user0']})
+        self.assertEqual(response.data['results'][0]['id'], message.id)
+
+
+class CursorPaginationTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user', 'user@example.com', 'secret')
+        cls.channel = ChannelModel.objects.create(channelName='general', channelDescription='General', createdFrom=cls.user)
+        cls.other_channel = ChannelModel.objects.create(channelName='other', channelDescription='Other', createdFrom=cls.user)
+        cls.ids = [MessageModel.objects.create(channel=cls.channel, sender=cls.user, content=f'message {i}').id for i in range(5)]
+        # Equal timestamps: the id breaks the tie.
+        MessageModel.objects.filter(channel=cls.channel).update(timestamp=timezone.now())
+        cls.foreign_id = MessageModel.objects.create(channel=cls.other_channel, sender=cls.user, content='foreign').id
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def page(self, **params):
+        response = self.client.get(f'/channel/{self.channel.id}/messages/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_before_pages_back_in_chronological_order(self):
+        page = self.page(before=self.ids[4], limit=2)
+        self.assertEqual([message['id'] for message in page['results']], self.ids[2:4])
+        self.assertEqual((page['hasMore'], page['before'], page['after']), (True, self.ids[2], self.ids[3]))
+        last = self.page(before=page['before'], limit=2)
+        self.assertEqual([message['id'] for message in last['results']], self.ids[:2])
+        self.assertFalse(last['hasMore'])
+
+    def test_after_pages_forward(self):
+        page = self.page(after=self.ids[0], limit=3)
+        self.assertEqual([message['id'] for message in page['results']], self.ids[1:4])
+        self.assertTrue(page['hasMore'])
+        last = self.page(after=page['after'], limit=3)
+        self.assertEqual([message['id'] for message in last['results']], self.ids[4:])
+        self.assertFalse(last['hasMore'])
+        self.assertEqual(self.page(after=self.ids[4])['results'], [])
+
+    def test_limit_is_clamped(self):
+        MessageModel.objects.bulk_create([MessageModel(channel=self.channel, sender=self.user, content=f'more {i}') for i in range(MAX_PAGE_SIZE)])
+        page = self.page(after=self.ids[0], limit=MAX_PAGE_SIZE * 5)
+        self.assertEqual(len(page['results']), MAX_PAGE_SIZE)
+        self.assertTrue(page['hasMore'])
+
+    def test_invalid_cursors_are_rejected(self):
+        url = f'/channel/{self.channel.id}/messages/'
+        for params in ({'before': 'abc'}, {'after': 0}, {'limit': 0}, {'before': self.foreign_id},
+                       {'before': self.ids[3], 'after': self.ids[1]}):
+            response = self.client.get(url, params)
+            self.assertEqual(response.status_code, 400, params)
+            self.assertIn('detail', response.data)
+
+
+class ConditionalGetTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user', 'user@example.com', 'secret')
+        cls.channel = ChannelModel.objects.create(channelName='general', channelDescription='General', createdFrom=cls.user)
+        cls.channel.channelMembers.add(cls.user)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_unchanged_resources_return_304(self):
+        for url in [f'/channel/{self.channel.id}/messages/', '/channel/', '/users/']:
+            etag = self.client.get(url)['ETag']
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_new_message_changes_etag(self):
+        url = f'/channel/{self.channel.id}/messages/'
+        etag = self.client.get(url)['ETag']
+        self.client.post(url, {'content': 'hello', 'channel': self.channel.id})
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_profile_update_changes_etag(self):
+        etag = self.client.get('/users/')['ETag']
+        self.client.put('/users/', {'first_name': 'Changed'})
+        self.assertEqual(self.client.get('/users/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_profile_update_changes_message_and_channel_etags(self):
+        urls = [f'/channel/{self.channel.id}/messages/', '/channel/']
+        self.client.post(urls[0], {'content': 'hello', 'channel': self.channel.id})
+        etags = [self.client.get(url)['ETag'] for url in urls]
+        self.client.put('/users/', {'first_name': 'Changed'})
+        for url, etag in zip(urls, etags):
+            self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+
+class ChannelNameTests(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('user', 'user@example.com', 'secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_channel(self, name, private=False):
+        return self.client.post('/channel/', {'channelName': name, 'channelDescription': 'description',
+                                              'channelMembers': [self.user.id], 'privateChannel': private})
+
+    def test_names_are_unique_ignoring_case(self):
+        self.assertEqual(self.create_channel('General').status_code, 201)
+        self.assertEqual(self.create_channel('general').status_code, 400)
+
+    def test_private_channels_may_share_names(self):
+        # Direct messages are private channels named after the partner.
+        self.assertEqual(self.create_channel('Tim Widl', private=True).status_code, 201)
+        self.assertEqual(self.create_channel('Tim Widl', private=True).status_code, 201)
+        self.assertEqual(self.create_channel('tim widl').status_code, 201)
+        self.assertEqual(self.create_channel('Tim Widl').status_code, 400)
+
+    def test_check_folds_case_like_the_constraint(self):
+        # SQLite's LOWER only folds ASCII letters, so the constraint tells these names apart.
+        self.assertEqual(self.create_channel('ärger').status_code, 201)
+        self.assertEqual(self.create_channel('Ärger').status_code, 201)
+
+    def test_rename_to_taken_name_is_rejected(self):
+        self.create_channel('General')
+        channel_id = self.create_channel('Random').data['id']
+        response = self.client.put(f'/channel/{channel_id}/', {'channelName': 'GENERAL'})
+        self.assertEqual(response.status_code, 400)
+
+
+class ChannelVisibilityTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.other = [User.objects.create_user(f'user{i}', f'user{i}@example.com', 'secret') for i in range(2)]
+
+        def channel(name, private, members):
+            channel = ChannelModel.objects.create(channelName=name, channelDescription=name, createdFrom=cls.other, privateChannel=private)
+            channel.channelMembers.set(members)
+            return channel
+
+        cls.joined = channel('joined', False, [cls.user, cls.other])
+        cls.public = [channel(f'public {i}', False, [cls.other]) for i in range(3)]
+        cls.private_member = channel('private member', True, [cls.user, cls.other])
+        cls.private_other = channel('private other', True, [cls.other])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_list_hides_private_channels_of_others(self):
+        ids = [channel['id'] for channel in self.client.get('/channel/').data]
+        self.assertEqual(ids, [self.joined.id, *[channel.id for channel in self.public], self.private_member.id])
+        ids = [channel['id'] for channel in self.client.get('/channel/?expand=messages').data]
+        self.assertNotIn(self.private_other.id, ids)
+
+    def test_discovery_pages_through_unjoined_public_channels(self):
+        page = self.client.get('/channel/discover/?limit=2').data
+        self.assertEqual([channel['id'] for channel in page['results']], [channel.id for channel in self.public[:2]])
+        self.assertTrue(page['hasMore'])
+
+        page = self.client.get(f'/channel/discover/?limit=2&after={page["after"]}').data
+        self.assertEqual([channel['id'] for channel in page['results']], [self.public[2].id])
+        self.assertFalse(page['hasMore'])
+
+    def test_discovery_rejects_invalid_cursor(self):
+        self.assertEqual(self.client.get('/channel/discover/?after=abc').status_code, 400)
+        self.assertEqual(self.client.get('/channel/discover/?limit=0').status_code, 400)
+
+
+class UserDirectoryTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.anna = User.objects.create_user('anna', 'anna@example.com', 'secret', first_name='Zoe', last_name='Smith')
+        cls.bob = User.objects.create_user('bob', 'bob@example.com', 'secret', first_name='Annabel', last_name='Jones')
+        cls.carl = User.objects.create_user('carl', 'ann.carl@example.com', 'secret', first_name='Carl', last_name='Annerson')
+        cls.dora = User.objects.create_user('dora', 'dora@example.com', 'secret', first_name='Dora', last_name='Brown')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.anna)
+
+    def test_prefix_search_ranks_by_matched_field(self):
+        response = self.client.get('/users/?q=ANN')
+        self.assertEqual([user['username'] for user in response.data['results']], ['anna', 'bob', 'carl'])
+        self.assertFalse(response.data['hasMore'])
+
+    def test_search_stops_at_limit(self):
+        # ETag version, then username and first name matches fill the result; last name and
+        # email are not queried.
+        with self.assertNumQueries(3):
+            response = self.client.get('/users/?q=ann&limit=1')
+        self.assertEqual([user['username'] for user in response.data['results']], ['anna'])
+        self.assertTrue(response.data['hasMore'])
+
+    def test_pages_in_id_order(self):
+        page = self.client.get('/users/?limit=3').data
+        self.assertEqual([user['id'] for user in page['results']], [self.anna.id, self.bob.id, self.carl.id])
+        self.assertTrue(page['hasMore'])
+        page = self.client.get(f'/users/?limit=3&after={page["after"]}').data
+        self.assertEqual([user['id'] for user in page['results']], [self.dora.id])
+        self.assertFalse(page['hasMore'])
+
+    def test_rejects_invalid_parameters(self):
+        self.assertEqual(self.client.get('/users/?q=').status_code, 400)
+        self.assertEqual(self.client.get('/users/?q=a&limit=x').status_code, 400)
+        self.assertEqual(self.client.get('/users/?after=-1').status_code, 400)
+
+
+class ProfileCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user', 'user@example.com', 'secret', first_name='Ada', last_name='Lovelace')
+        cls.other = User.objects.create_user('other', 'other@example.com', 'secret')
+        AvatarModel.objects.create(user=cls.other, image_path='assets/img/avatar/avatar1.svg')
+
+    def setUp(self):
+        profile_cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def resolve(self, *ids):
+        return self.client.get(f'/users/resolve/?ids={",".join(str(id) for id in ids)}').data['users']
+
+    def test_resolves_names_and_avatars(self):
+        self.assertEqual(self.resolve(self.other.id, 0, self.user.id), [
+            {'id': self.other.id, 'name': 'other', 'avatar': 'assets/img/avatar/avatar1.svg'},
+            {'id': self.user.id, 'name': 'Ada Lovelace', 'avatar': AvatarModel.default_image_path},
+        ])
+
+    def test_cached_profiles_cost_one_query(self):
+        self.resolve(self.user.id, self.other.id)
+        with self.assertNumQueries(1):
+            self.resolve(self.user.id, self.other.id)
+
+    def test_profile_update_invalidates(self):
+        self.resolve(self.user.id)
+        self.client.put('/users/', {'first_name': 'Grace'})
+        self.assertEqual(self.resolve(self.user.id)[0]['name'], 'Grace Lovelace')
+
+    def test_avatar_upload_invalidates(self):
+        self.resolve(self.user.id)
+        self.client.post('/api/images/', {'image_path': 'assets/img/avatar/avatar2.svg'})
+        self.assertEqual(self.resolve(self.user.id)[0]['avatar'], 'assets/img/avatar/avatar2.svg')
+
+    def test_rejects_invalid_ids(self):
+        self.assertEqual(self.client.get('/users/resolve/?ids=1,a').status_code, 400)
+        self.assertEqual(self.client.get('/users/resolve/').status_code, 400)
+
+
+class TempMediaMixin:
+    """
+    Stores the media files of each test in a temporary `MEDIA_ROOT` (`self.media_root`) that
+    is removed afterwards.
+    """
+
+    def setUp(self):
+        super().setUp()
+        self.media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.media_root)
+        settings_override = override_settings(MEDIA_ROOT=self.media_root)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+
+@override_settings(AVATAR_THUMBNAILS={'BACKGROUND': False})
+class AvatarThumbnailTests(TempMediaMixin, TestCase):
+
+    def setUp(self):
+        super().setUp()
+        profile_cache.clear()
+        self.user = User.objects.create_user('user', 'user@example.com', 'secret')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def image(self, color='teal'):
+        output = BytesIO()
+        Image.new('RGB', (1200, 800), color).save(output, 'JPEG', quality=95)
+        return SimpleUploadedFile('photo.jpg', output.getvalue(), content_type='image/jpeg')
+
+    def upload(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            return self.client.post('/api/images/', {'image': self.image()}, format='multipart').data['id']
+
+    def test_upload_renders_square_thumbnails(self):
+        avatar_id = self.upload()
+        avatar = AvatarModel.objects.get(id=avatar_id)
+        self.assertEqual(set(avatar.thumbnails), {'32', '64', '128'})
+        for size, name in avatar.thumbnails.items():
+            with avatar.image.storage.open(name) as file, Image.open(file) as thumbnail:
+                self.assertEqual(thumbnail.size, (int(size), int(size)))
+            self.assertLess(avatar.image.storage.size(name), avatar.image.size)
+
+        data = self.client.get(f'/api/images/{avatar_id}/').data
+        self.assertTrue(data['thumbnails']['64'].endswith(avatar.thumbnails['64']))
+
+    def test_profile_avatar_uses_thumbnail(self):
+        avatar = AvatarModel.objects.get(id=self.upload())
+        users = self.client.get(f'/users/resolve/?ids={self.user.id}').data['users']
+        self.assertTrue(users[0]['avatar'].endswith(avatar.thumbnails['64']))
+
+    def test_new_image_replaces_the_old_thumbnails(self):
+        avatar = AvatarModel.objects.get(id=self.upload())
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.client.patch(f'/api/images/{avatar.id}/', {'image': self.image('red')}, format='multipart')
+        replaced = AvatarModel.objects.get(id=avatar.id)
+        self.assertEqual(replaced.thumbnails, {})
+        users = self.client.get(f'/users/resolve/?ids={self.user.id}').data['users']
+        self.assertTrue(users[0]['avatar'].endswith(replaced.image.name))
+
+        for callback in callbacks:
+            callback()
+        replaced.refresh_from_db()
+        self.assertEqual(set(replaced.thumbnails), {'32', '64', '128'})
+        for name in avatar.thumbnails.values():
+            self.assertFalse(avatar.image.storage.exists(name))
+
+    def test_update_keeping_the_image_renders_nothing(self):
+        avatar = AvatarModel.objects.get(id=self.upload())
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.client.patch(f'/api/images/{avatar.id}/', {'image_path': 'assets/img/avatar/other.svg'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(callbacks, [])
+        self.assertEqual(AvatarModel.objects.get(id=avatar.id).thumbnails, avatar.thumbnails)
+
+    def test_delete_removes_thumbnails(self):
+        avatar = AvatarModel.objects.get(id=self.upload())
+        self.client.delete(f'/api/images/{avatar.id}/')
+        for name in avatar.thumbnails.values():
+            self.assertFalse(avatar.image.storage.exists(name))
+
+
+class MediaDeliveryTests(TempMediaMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.member, cls.outsider = [User.objects.create_user(f'user{i}', f'user{i}@example.com', 'secret') for i in range(2)]
+        cls.channel = ChannelModel.objects.create(channelName='private', channelDescription='private',
+                                                  createdFrom=cls.member, privateChannel=True)
+        cls.channel.channelMembers.add(cls.member)
+        cls.message = MessageModel.objects.create(channel=cls.channel, sender=cls.member, content='file',
+                                                  messageData='ulpoads/report.txt')
+
+    def setUp(self):
+        super().setUp()
+        for name, content in [('ulpoads/report.txt', b'0123456789'), ('images/avatar.png', b'png')]:
+            os.makedirs(os.path.join(self.media_root, os.path.dirname(name)), exist_ok=True)
+            with open(os.path.join(self.media_root, name), 'wb') as file:
+                file.write(content)
+        self.client = APIClient()
+        self.client.force_authenticate(self.member)
+
+    def test_avatars_are_public_and_immutable(self):
+        response = APIClient().get('/media/images/avatar.png')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b''.join(response.streaming_content), b'png')
+        self.assertEqual(response['Cache-Control'], f'public, max-age={365 * 24 * 60 * 60}, immutable')
+
+    def test_attachments_require_access(self):
+        self.assertEqual(APIClient().get('/media/ulpoads/report.txt').status_code, 401)
+        outsider = APIClient()
+        outsider.force_authenticate(self.outsider)
+        self.assertEqual(outsider.get('/media/ulpoads/report.txt').status_code, 404)
+        response = self.client.get('/media/ulpoads/report.txt')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Cache-Control'].startswith('private'))
+
+    def test_token_in_query_for_browser_requests(self):
+        token = Token.objects.create(user=self.member)
+        self.assertEqual(APIClient().get(f'/media/ulpoads/report.txt?token={token.key}').status_code, 200)
+        outsider = Token.objects.create(user=self.outsider)
+        self.assertEqual(APIClient().get(f'/media/ulpoads/report.txt?token={outsider.key}').status_code, 404)
+        self.assertEqual(APIClient().get('/media/ulpoads/report.txt?token=invalid').status_code, 401)
+
+    def test_range_requests(self):
+        response = self.client.get('/media/ulpoads/report.txt', HTTP_RANGE='bytes=2-5')
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(b''.join(response.streaming_content), b'2345')
+        self.assertEqual(response['Content-Range'], 'bytes 2-5/10')
+
+        response = self.client.get('/media/ulpoads/report.txt', HTTP_RANGE='bytes=-3')
+        self.assertEqual(b''.join(response.streaming_content), b'789')
+        response = self.client.get('/media/ulpoads/report.txt', HTTP_RANGE='bytes=20-')
+        self.assertEqual(response.status_code, 416)
+        self.assertEqual(response['Content-Range'], 'bytes */10')
+
+    def test_revalidation(self):
+        etag = self.client.get('/media/ulpoads/report.txt')['ETag']
+        self.assertEqual(self.client.get('/media/ulpoads/report.txt', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+    def test_rejects_paths_outside_media(self):
+        self.assertEqual(self.client.get('/media/images/../../manage.py').status_code, 404)
+        self.assertEqual(self.client.get('/media/other/file.txt').status_code, 404)
+
+    def test_cache_lifetime_follows_settings(self):
+        with self.settings(MEDIA_DELIVERY={'BACKEND': 'django', 'MAX_AGE': 3600}):
+            response = APIClient().get('/media/images/avatar.png')
+        self.assertEqual(response['Cache-Control'], 'public, max-age=3600, immutable')
+
+    def test_offloads_transfer_to_front_server(self):
+        with self.settings(MEDIA_DELIVERY={'BACKEND': 'x-accel-redirect', 'ACCEL_PREFIX': '/protected-media/'}):
+            response = self.client.get('/media/ulpoads/report.txt')
+        self.assertEqual(response['X-Accel-Redirect'], '/protected-media/ulpoads/report.txt')
+        self.assertEqual(response.content, b'')
+
+
+class UploadTests(TempMediaMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.other = [User.objects.create_user(f'user{i}', f'user{i}@example.com', 'secret') for i in range(2)]
+        cls.channel = ChannelModel.objects.create(channelName='uploads', channelDescription='uploads', createdFrom=cls.user)
+        cls.channel.channelMembers.add(cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def put_chunk(self, upload_id, start, data, size=10, client=None):
+        return (client or self.client).put(
+            f'/uploads/{upload_id}/', data, content_type='application/octet-stream',
+            HTTP_CONTENT_RANGE=f'bytes {start}-{start + len(data) - 1}/{size}',
+        )
+
+    def upload(self, content=b'0123456789'):
+        upload_id = self.client.post('/uploads/', {'filename': 'report.txt', 'size': len(content)}, format='json').data['id']
+        self.put_chunk(upload_id, 0, content, size=len(content))
+        self.client.post(f'/uploads/{upload_id}/complete/')
+        return upload_id
+
+    def test_chunks_resume_from_the_received_offset(self):
+        response = self.client.post('/uploads/', {'filename': 'report.txt', 'size': 10}, format='json')
+        self.assertEqual(response.status_code, 201)
+        upload_id = response.data['id']
+
+        self.assertEqual(self.put_chunk(upload_id, 0, b'01234').data['received'], 5)
+        # A retried or skipped chunk is rejected with the offset to resume from.
+        conflict = self.put_chunk(upload_id, 2, b'23456')
+        self.assertEqual(conflict.status_code, 409)
+        self.assertEqual(conflict.data['received'], 5)
+        self.assertEqual(self.client.get(f'/uploads/{upload_id}/').data['received'], 5)
+        self.assertEqual(self.put_chunk(upload_id, 5, b'56789').data['received'], 10)
+
+        response = self.client.post(f'/uploads/{upload_id}/complete/')
+        self.assertEqual(response.data['status'], 'complete')
+        upload = UploadModel.objects.get(id=upload_id)
+        with upload.file.open('rb') as file:
+            self.assertEqual(file.read(), b'0123456789')
+
+    def test_stale_retry_leaves_the_received_data_intact(self):
+        upload_id = self.client.post('/uploads/', {'filename': 'report.txt', 'size': 20}, format='json').data['id']
+        stale = UploadModel.objects.get(id=upload_id)
+        self.put_chunk(upload_id, 0, b'0123456789', size=20)
+        self.put_chunk(upload_id, 10, b'abcdefghij', size=20)
+        # A retry of the first chunk that was delayed past the second one.
+        with self.assertRaises(OffsetMismatch) as raised:
+            write_chunk(stale, 0, 10, BytesIO(b'0123456789'))
+        self.assertEqual(raised.exception.received, 20)
+
+        response = self.client.post(f'/uploads/{upload_id}/complete/')
+        self.assertEqual(response.data['status'], 'complete')
+        with UploadModel.objects.get(id=upload_id).file.open('rb') as file:
+            self.assertEqual(file.read(), b'0123456789abcdefghij')
+
+    def test_complete_checks_the_partial_file(self):
+        upload_id = self.client.post('/uploads/', {'filename': 'report.txt', 'size': 10}, format='json').data['id']
+        self.put_chunk(upload_id, 0, b'0123456789')
+        with open(partial_path(UploadModel.objects.get(id=upload_id)), 'r+b') as file:
+            file.truncate(5)
+        self.assertEqual(self.client.post(f'/uploads/{upload_id}/complete/').status_code, 400)
+
+    def test_incomplete_and_foreign_uploads_are_rejected(self):
+        upload_id = self.client.post('/uploads/', {'filename': 'report.txt', 'size': 10}, format='json').data['id']
+        self.put_chunk(upload_id, 0, b'01234')
+        self.assertEqual(self.client.post(f'/uploads/{upload_id}/complete/').status_code, 400)
+        self.assertEqual(self.client.put(f'/uploads/{upload_id}/', b'56789', content_type='application/octet-stream').status_code, 400)
+        other = APIClient()
+        other.force_authenticate(self.other)
+        self.assertEqual(self.put_chunk(upload_id, 5, b'56789', client=other).status_code, 404)
+
+    def test_completed_upload_is_attached_once(self):
+        upload_id = self.upload()
+        response = self.client.post(f'/channel/{self.channel.id}/messages/', {'content': 'file', 'channel': self.channel.id, 'uploadId': upload_id})
+        self.assertEqual(response.status_code, 201)
+        message = MessageModel.objects.get(id=response.data['id'])
+        self.assertEqual(message.messageData.name, UploadModel.objects.get(id=upload_id).file.name)
+        self.assertTrue(message.messageData.name.startswith('ulpoads/'))
+
+        response = self.client.post(f'/channel/{self.channel.id}/messages/', {'content': 'again', 'channel': self.channel.id, 'uploadId': upload_id})
+        self.assertEqual(response.status_code, 400)
+
+    def test_failed_save_leaves_the_upload_claimable(self):
+        upload_id = self.upload()
+        data = {'content': 'file', 'channel': self.channel.id, 'uploadId': upload_id}
+        with mock.patch('DABubble.views.chat.message_view.MessageSerializer.save', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                self.client.post(f'/channel/{self.channel.id}/messages/', data)
+        upload = UploadModel.objects.get(id=upload_id)
+        self.assertEqual((upload.status, upload.blob.refcount), (UploadModel.COMPLETE, 1))
+        self.assertEqual(self.client.post(f'/channel/{self.channel.id}/messages/', data).status_code, 201)
+
+    def test_expired_sessions_are_removed(self):
+        upload_id = self.client.post('/uploads/', {'filename': 'report.txt', 'size': 10}, format='json').data['id']
+        self.put_chunk(upload_id, 0, b'01234')
+        UploadModel.objects.filter(id=upload_id).update(updated_at=timezone.now() - timedelta(days=2))
+        self.assertEqual(expire_uploads(), 1)
+        self.assertFalse(UploadModel.objects.filter(id=upload_id).exists())
+
+
+class BlobStorageTests(TempMediaMixin, TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user', 'user@example.com', 'secret')
+        cls.channels = [ChannelModel.objects.create(channelName=f'channel {i}', channelDescription='files', createdFrom=cls.user)
+                        for i in range(2)]
+        for channel in cls.channels:
+            channel.channelMembers.add(cls.user)
+
+    def setUp(self):
+        super().setUp()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def post_file(self, channel, name='report.pdf', content=b'%PDF same bytes'):
+        response = self.client.post(f'/channel/{channel.id}/messages/', {
+            'content': 'file', 'channel': channel.id, 'messageData': SimpleUploadedFile(name, content),
+        }, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return MessageModel.objects.get(id=response.data['id'])
+
+    def write_legacy(self, name, content):
+        os.makedirs(os.path.join(self.media_root, 'ulpoads'), exist_ok=True)
+        with open(os.path.join(self.media_root, 'ulpoads', name), 'wb') as file:
+            file.write(content)
+
+    def test_same_content_is_stored_once(self):
+        first = self.post_file(self.channels[0])
+        second = self.post_file(self.channels[1], name='copy.pdf')
+        blob = BlobModel.objects.get()
+        self.assertEqual(blob.sha256, hashlib.sha256(b'%PDF same bytes').hexdigest())
+        self.assertEqual(blob.refcount, 2)
+        self.assertEqual(first.messageData.name, blob.file.name)
+        self.assertEqual(second.messageData.name, blob.file.name)
+        self.assertEqual((first.messageDataName, second.messageDataName), ('report.pdf', 'copy.pdf'))
+        self.assertEqual(len(os.listdir(os.path.dirname(blob.file.path))), 1)
+
+    def test_failed_save_deletes_the_new_blob_file(self):
+        with mock.patch('DABubble.views.chat.message_view.MessageSerializer.save', side_effect=IntegrityError):
+            with self.assertRaises(IntegrityError):
+                self.client.post(f'/channel/{self.channels[0].id}/messages/', {
+                    'content': 'file', 'channel': self.channels[0].id, 'messageData': SimpleUploadedFile('report.pdf', b'%PDF same bytes'),
+                }, format='multipart')
+        self.assertFalse(BlobModel.objects.exists())
+        self.assertEqual([files for _, _, files in os.walk(self.media_root) if files], [])
+        message = self.post_file(self.channels[0])
+        self.assertEqual(os.path.basename(message.messageData.name), f"{hashlib.sha256(b'%PDF same bytes').hexdigest()}.pdf")
+
+    def test_blob_is_deleted_with_its_last_reference(self):
+        first = self.post_file(self.channels[0])
+        second = self.post_file(self.channels[1])
+        path = BlobModel.objects.get().file.path
+        with self.captureOnCommitCallbacks(execute=True):
+            first.delete()
+        self.assertEqual(BlobModel.objects.get().refcount, 1)
+        self.assertTrue(os.path.exists(path))
+        with self.captureOnCommitCallbacks(execute=True):
+            second.delete()
+        self.assertFalse(BlobModel.objects.exists())
+        self.assertFalse(os.path.exists(path))
+
+    def test_images_get_metadata_and_a_readable_preview(self):
+        image = BytesIO()
+        Image.new('RGB', (1200, 600), 'blue').save(image, 'PNG')
+        message = self.post_file(self.channels[0], name='photo.png', content=image.getvalue())
+        meta = self.client.get(f'/channel/{self.channels[0].id}/messages/').data[0]['messageDataMeta']
+        self.assertEqual({key: meta[key] for key in ('size', 'type', 'width', 'height')},
+                         {'size': len(image.getvalue()), 'type': 'image/png', 'width': 1200, 'height': 600})
+        with Image.open(message.blob.preview.path) as preview:
+            self.assertEqual(preview.size, (320, 160))
+
+        self.assertEqual(self.client.get(meta['preview']).status_code, 200)
+        outsider = APIClient()
+        outsider.force_authenticate(User.objects.create_user('outsider', 'outsider@example.com', 'secret'))
+        self.channels[0].privateChannel = True
+        self.channels[0].save()
+        self.assertEqual(outsider.get(meta['preview']).status_code, 404)
+
+    def test_other_files_get_type_from_name(self):
+        message = self.post_file(self.channels[0])
+        self.assertEqual(MessageSerializer(message).data['messageDataMeta'],
+                         {'size': 15, 'type': 'application/pdf', 'width': None, 'height': None, 'preview': None})
+
+    def test_dedupe_command_moves_legacy_files_into_blobs(self):
+        self.write_legacy('a.txt', b'same')
+        self.write_legacy('b.txt', b'same')
+        self.write_legacy('c.txt', b'other')
+        messages = [MessageModel.objects.create(channel=self.channels[0], sender=self.user, content=name,
+                                                messageData=f'ulpoads/{name}') for name in ('a.txt', 'b.txt', 'c.txt', 'a.txt')]
+        call_command('dedupe_attachments', stdout=StringIO())
+
+        self.assertEqual(BlobModel.objects.count(), 2)
+        a, b, c, a_again = [MessageModel.objects.get(id=message.id) for message in messages]
+        self.assertEqual(a.messageData.name, b.messageData.name)
+        self.assertEqual(a.messageData.name, a_again.messageData.name)
+        self.assertNotEqual(a.messageData.name, c.messageData.name)
+        self.assertEqual(a.blob.refcount, 3)
+        self.assertEqual(b.messageDataName, 'b.txt')
+        self.assertEqual(sorted(os.listdir(os.path.join(self.media_root, 'ulpoads'))),
+                         sorted({a.blob.sha256[:2], c.blob.sha256[:2]}))
+
+    def test_dedupe_command_logs_moved_messages(self):
+        self.write_legacy('a.txt', b'same')
+        message = MessageModel.objects.create(channel=self.channels[0], sender=self.user, content='a', messageData='ulpoads/a.txt')
+        url = f'/channel/{self.channels[0].id}/messages/'
+        etag = self.client.get(url)['ETag']
+        call_command('dedupe_attachments', stdout=StringIO())
+        self.assertTrue(ChangeModel.objects.filter(channel=self.channels[0], kind=ChangeModel.MESSAGE, object_id=message.id).exists())
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data[0]['messageDataName'], 'a.txt')
+
+
+class SearchTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user', 'user@example.com', 'secret')
+        cls.channel = ChannelModel.objects.create(channelName='general', channelDescription='General', createdFrom=cls.user)
+        cls.channel.channelMembers.add(cls.user)
+        cls.other = ChannelModel.objects.create(channelName='other', channelDescription='Other', createdFrom=cls.user)
+        cls.message = MessageModel.objects.create(channel=cls.channel, sender=cls.user, content='Deploy the <b>backend</b> today')
+        MessageModel.objects.create(channel=cls.other, sender=cls.user, content='deploy elsewhere')
+        cls.thread = ThreadChannelModel.objects.create(
+            threadName='thread', threadDescription='thread', mainChannel=cls.channel,
+            createdFrom=cls.user, original_message=cls.message,
+        )
+        cls.reply = ThreadMessageModel.objects.create(thread_channel=cls.thread, sender=cls.user, content='deployment is done')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def search(self, q):
+        return self.client.get('/search/', {'q': q}).data['results']
+
+    def test_finds_messages_in_member_channels_only(self):
+        results = self.search('deploy')
+        self.assertEqual({(result['type'], result['id']) for result in results},
+                         {('message', self.message.id), ('threadMessage', self.reply.id)})
+        self.assertEqual({result['channel'] for result in results}, {self.channel.id})
+
+    def test_snippet_is_escaped_and_highlighted(self):
+        [result] = self.search('backend')
+        self.assertEqual(result['snippet'], 'Deploy the &lt;b&gt;<mark>backend</mark>&lt;/b&gt; today')
+
+    def test_index_follows_edits(self):
+        self.client.patch(f'/channel/{self.channel.id}/messages/{self.message.id}/', {'content': 'release notes'})
+        self.assertEqual([result['id'] for result in self.search('release')], [self.message.id])
+        self.assertEqual(self.search('backend'), [])
+
+    def test_operators_in_input_are_ignored(self):
+        self.assertEqual(self.search('"backend" OR NEAR('), [])
+        self.assertEqual(len(self.search('backend)')), 1)
+
+    def test_ranking_window_holds_the_newest_matches_of_both_tables(self):
+        # Older messages with much higher ids than the thread messages posted after them.
+        for i in range(3):
+            MessageModel.objects.create(id=1000 + i, channel=self.channel, sender=self.user, content='window')
+        new = [ThreadMessageModel.objects.create(thread_channel=self.thread, sender=self.user, content='window')
+               for _ in range(3)]
+        with mock.patch('DABubble.search.RANK_WINDOW', 4):
+            results = self.client.get('/search/', {'q': 'window', 'limit': 10}).data['results']
+        self.assertEqual(len(results), 4)
+        self.assertEqual({result['id'] for result in results if result['type'] == 'threadMessage'},
+                         {message.id for message in new})
+
+
+class ThreadOpeningTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.other = [User.objects.create_user(f'user{i}', f'user{i}@example.com', 'secret') for i in range(2)]
+        cls.channel = ChannelModel.objects.create(channelName='general', channelDescription='General', createdFrom=cls.user)
+        cls.message = MessageModel.objects.create(channel=cls.channel, sender=cls.other, content='hello')
+        cls.url = f'/channel/{cls.channel.id}/messages/{cls.message.id}/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_opening_returns_the_new_thread(self):
+        response = self.client.patch(self.url, {'threadOpen': True}, format='json')
+        thread = ThreadChannelModel.objects.get(original_message=self.message)
+        self.assertEqual(response.data['thread_channel'], thread.id)
+        self.assertTrue(response.data['threadOpen'])
+        self.assertEqual(list(thread.threadMember.all()), [self.user])
+        seed = ThreadMessageModel.objects.get(thread_channel=thread)
+        self.assertEqual((seed.sender, seed.content), (self.other, 'hello'))
+
+    def test_opening_an_open_thread_reuses_it(self):
+        self.client.patch(self.url, {'threadOpen': True}, format='json')
+        # A request that loaded the message before the other one opened the thread.
+        MessageModel.objects.filter(id=self.message.id).update(thread_channel=None, threadOpen=False)
+        response = self.client.patch(self.url, {'threadOpen': True}, format='json')
+        self.assertEqual(ThreadChannelModel.objects.filter(original_message=self.message).count(), 1)
+        self.assertEqual(response.data['thread_channel'], ThreadChannelModel.objects.get().id)
+        self.assertEqual(ThreadMessageModel.objects.count(), 1)
+
+    def test_message_has_at_most_one_thread(self):
+        ThreadChannelModel.objects.create(threadName='a', threadDescription='a', mainChannel=self.channel,
+                                          createdFrom=self.user, original_message=self.message)
+        with self.assertRaises(IntegrityError):
+            ThreadChannelModel.objects.create(threadName='b', threadDescription='b', mainChannel=self.channel,
+                                              createdFrom=self.user, original_message=self.message)
+
+
+class SyncTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.other = [User.objects.create_user(f'user{i}', f'user{i}@example.com', 'secret') for i in range(2)]
+        cls.channel = ChannelModel.objects.create(channelName='general', channelDescription='General', createdFrom=cls.user)
+        cls.channel.channelMembers.add(cls.user, cls.other)
+        # Public, but the user is not a member: its changes are not synced.
+        cls.foreign = ChannelModel.objects.create(channelName='foreign', channelDescription='Foreign', createdFrom=cls.other)
+        cls.foreign.channelMembers.add(cls.other)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.other_client = APIClient()
+        self.other_client.force_authenticate(self.other)
+
+    def post_message(self, content, channel=None, client=None):
+        channel = channel or self.channel
+        return (client or self.client).post(f'/channel/{channel.id}/messages/', {'content': content, 'channel': channel.id}).data
+
+    def sync(self, since, **params):
+        response = self.client.get('/sync/', {'since': since, **params})
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def checkpoint(self):
+        return self.client.get('/sync/').data['checkpoint']
+
+    def test_checkpoint_advances_with_member_channel_changes_only(self):
+        start = self.checkpoint()
+        message = self.post_message('hello')
+        self.post_message('elsewhere', channel=self.foreign, client=self.other_client)
+
+        data = self.sync(start)
+        self.assertEqual([synced['id'] for synced in data['messages']], [message['id']])
+        self.assertFalse(data['hasMore'])
+        self.assertGreater(data['checkpoint'], start)
+        self.assertEqual(self.checkpoint(), data['checkpoint'])
+
+        again = self.sync(data['checkpoint'])
+        self.assertEqual((again['checkpoint'], again['messages']), (data['checkpoint'], []))
+
+    def test_limit_pages_through_changes(self):
+        start = self.checkpoint()
+        ids = [self.post_message(f'message {i}')['id'] for i in range(3)]
+        first = self.sync(start, limit=2)
+        self.assertTrue(first['hasMore'])
+        self.assertEqual([message['id'] for message in first['messages']], ids[:2])
+        second = self.sync(first['checkpoint'], limit=2)
+        self.assertFalse(second['hasMore'])
+        self.assertEqual([message['id'] for message in second['messages']], ids[2:])
+
+    def test_edits_and_reactions_return_the_current_state(self):
+        message = self.post_message('draft')
+        start = self.checkpoint()
+        self.other_client.patch(f'/channel/{self.channel.id}/messages/{message["id"]}/', {'content': 'final'}, format='json')
+        self.other_client.put(f'/channel/{self.channel.id}/messages/{message["id"]}/reactions/rocket/')
+
+        data = self.sync(start)
+        self.assertEqual(len(data['messages']), 1)
+        self.assertEqual(data['messages'][0]['content'], 'final')
+        self.assertEqual([user['email'] for user in data['messages'][0]['emoji_rocket']], [self.other.email])
+
+    def test_opened_thread_syncs_with_its_messages(self):
+        message = self.post_message('start a thread')
+        start = self.checkpoint()
+        thread_id = self.other_client.patch(f'/channel/{self.channel.id}/messages/{message["id"]}/',
+                                            {'threadOpen': True}, format='json').data['thread_channel']
+        reply = self.other_client.post(f'/channelThread/{thread_id}/messages/',
+                                       {'content': 'reply', 'thread_channel': thread_id}).data
+
+        data = self.sync(start)
+        self.assertEqual([thread['id'] for thread in data['threads']], [thread_id])
+        self.assertEqual([synced['content'] for synced in data['threadMessages']], ['start a thread', 'reply'])
+        self.assertEqual(data['threadMessages'][1]['id'], reply['id'])
+        self.assertEqual([synced['id'] for synced in data['messages']], [message['id']])
+
+    def test_invalid_parameters_are_rejected(self):
+        for params in ({'since': 'abc'}, {'since': 0, 'limit': 'x'}, {'since': 0, 'limit': 0}):
+            self.assertEqual(self.client.get('/sync/', params).status_code, 400)
+
+
+class ReactionToggleTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user', 'user@example.com', 'secret')
+        cls.channel = ChannelModel.objects.create(channelName='general', channelDescription='General', createdFrom=cls.user)
+        cls.message = MessageModel.objects.create(channel=cls.channel, sender=cls.user, content='hello')
+        cls.url = f'/channel/{cls.channel.id}/messages/{cls.message.id}/reactions/rocket/'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_add_is_idempotent(self):
+        for _ in range(2):
+            response = self.client.put(self.url)
+            self.assertEqual(response.data, {'emoji': 'rocket', 'reacted': True, 'count': 1})
+        self.assertEqual(ReactionModel.objects.filter(message=self.message).count(), 1)
+
+    def test_remove_is_idempotent(self):
+        self.client.put(self.url)
+        for _ in range(2):
+            response = self.client.delete(self.url)
+            self.assertEqual(response.data, {'emoji': 'rocket', 'reacted': False, 'count': 0})
+
+    def test_cost_does_not_depend_on_reaction_count(self):
+        others = User.objects.bulk_create([User(username=f'other{i}') for i in range(20)])
+        ReactionModel.objects.bulk_create([ReactionModel(message=self.message, user=other, emoji='rocket') for other in others])
+        with self.assertNumQueries(6):
+            response = self.client.put(self.url)
+        self.assertEqual(response.data['count'], 21)
+
+    def test_invalid_emoji_code(self):
+        response = self.client.put(f'/channel/{self.channel.id}/messages/{self.message.id}/reactions/Rocket!/')
+        self.assertEqual(response.status_code, 400)
+
+
+class RecentMessagesCacheTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user', 'user@example.com', 'secret')
+        cls.channel = ChannelModel.objects.create(channelName='general', channelDescription='General', createdFrom=cls.user)
+        cls.url = f'/channel/{cls.channel.id}/messages/'
+
+    def setUp(self):
+        recent_messages.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        for i in range(3):
+            self.client.post(self.url, {'content': f'message {i}', 'channel': self.channel.id})
+
+    def get_page(self, limit=2):
+        return self.client.get(f'{self.url}?limit={limit}').data
+
+    def test_repeated_reads_hit_the_cache(self):
+        self.assertEqual(self.get_page(), self.get_page())
+        with self.assertNumQueries(2):
+            page = self.get_page()
+        self.assertEqual([message['content'] for message in page['results']], ['message 1', 'message 2'])
+        self.assertTrue(page['hasMore'])
+        self.assertEqual(recent_messages.stats()['misses'], 1)
+
+    def test_writes_update_the_cached_page(self):
+        self.get_page()
+        message_id = self.client.post(self.url, {'content': 'new', 'channel': self.channel.id}).data['id']
+        self.client.patch(f'{self.url}{message_id}/', {'content': 'edited'})
+        with self.assertNumQueries(2):
+            page = self.get_page()
+        self.assertEqual([message['content'] for message in page['results']], ['message 2', 'edited'])
+
+    def test_reaction_invalidates_the_cached_page(self):
+        message_id = self.get_page()['results'][-1]['id']
+        self.client.put(f'{self.url}{message_id}/reactions/rocket/')
+        self.client.patch(f'{self.url}{message_id}/emoji/', {'emoji_nerd': [{'id': self.user.id}]}, format='json')
+        page = self.get_page()
+        self.assertEqual([user['id'] for user in page['results'][-1]['emoji_nerd']], [self.user.id])
+        self.assertEqual(page['results'][-1]['emoji_rocket'], [])
+        self.assertEqual(page['results'], self.client.get(self.url).data[-2:])
+
+    def test_profile_update_invalidates_the_cached_page(self):
+        message_id = self.get_page()['results'][-1]['id']
+        self.client.put(f'{self.url}{message_id}/reactions/rocket/')
+        self.get_page()
+        self.client.put('/users/', {'first_name': 'Changed'})
+        self.assertEqual(self.get_page()['results'][-1]['emoji_rocket'][0]['first_name'], 'Changed')
+
+
+class CachedTokenAuthenticationTests(TestCase):
+
+    def setUp(self):
+        token_cache.clear()
+        self.user = User.objects.create_user('user', 'user@example.com', 'secret')
+        self.token = Token.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.credentials(HTTP_AUTHORIZATION=f'Token {self.token.key}')
+
+    def test_token_is_looked_up_once(self):
+        self.client.get('/users/')
+        with self.assertNumQueries(2):
+            self.assertEqual(self.client.get('/users/').status_code, 200)
+        self.assertEqual(token_cache.stats()['hits'], 1)
+
+    def test_logout_invalidates_cached_token(self):
+        self.client.get('/users/')
+        self.assertEqual(self.client.post('/logout/').status_code, 200)
+        self.assertEqual(self.client.get('/users/').status_code, 401)
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get('/users/')
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get('/users/').status_code, 401)
+
+    def test_async_view_with_cached_token_needs_no_query(self):
+        self.client.get('/user/')
+        with self.assertNumQueries(0):
+            response = self.client.get('/user/')
+        self.assertEqual(response.data['email'], 'user@example.com')
+
+    def test_async_view_rejects_missing_token(self):
+        self.client.credentials()
+        self.assertEqual(self.client.get('/user/').status_code, 401)
+        self.assertEqual(self.client.get('/users/').status_code, 401)
+
+
+class CountingEmailBackend(EmailBackend):
+    opened = 0
+
+    def open(self):
+        CountingEmailBackend.opened += 1
+        return super().open()
+
+
+class FailingEmailBackend(EmailBackend):
+
+    def send_messages(self, messages):
+        raise SMTPException('Mail server unavailable')
+
+
+class EmailOutboxTests(TestCase):
+
+    def setUp(self):
+        User.objects.create_user('user', 'user@example.com', 'secret')
+        CountingEmailBackend.opened = 0
+
+    def request_reset(self):
+        return APIClient().post('/password_reset/', {'emailName': 'user@example.com'})
+
+    def test_request_only_queues_the_email(self):
+        self.assertEqual(self.request_reset().status_code, 200)
+        self.assertEqual(mail.outbox, [])
+        self.assertEqual(OutgoingEmailModel.objects.get().status, OutgoingEmailModel.PENDING)
+
+    @override_settings(EMAIL_BACKEND='DABubble.tests.CountingEmailBackend')
+    def test_batch_is_sent_over_one_connection(self):
+        for _ in range(3):
+            self.request_reset()
+        self.assertEqual(send_pending(), 3)
+        self.assertEqual(CountingEmailBackend.opened, 1)
+        self.assertEqual(len(mail.outbox), 3)
+        self.assertIn('reset-password?token=', mail.outbox[0].alternatives[0][0])
+        self.assertFalse(OutgoingEmailModel.objects.exclude(status=OutgoingEmailModel.SENT).exists())
+        self.assertEqual(send_pending(), 0)
+
+    @override_settings(EMAIL_BACKEND='django.core.mail.backends.locmem.EmailBackend')
+    def test_no_reset_token_remains_after_delivery(self):
+        self.request_reset()
+        self.assertIn('token=', OutgoingEmailModel.objects.get().html_body)
+        send_pending()
+        self.assertIn('token=', mail.outbox[0].alternatives[0][0])
+        self.assertEqual(OutgoingEmailModel.objects.values_list('body', 'html_body').get(), ('', ''))
+
+    @override_settings(EMAIL_BACKEND='DABubble.tests.FailingEmailBackend')
+    def test_failures_are_retried_with_backoff(self):
+        self.request_reset()
+        with self.assertLogs('DABubble.outbox', level='WARNING'):
+            for attempt in range(1, MAX_ATTEMPTS + 1):
+                self.assertEqual(send_pending(), 0)
+                email = OutgoingEmailModel.objects.get()
+                self.assertEqual(email.attempts, attempt)
+                self.assertEqual(send_pending(), 0)
+                OutgoingEmailModel.objects.update(next_attempt_at=timezone.now() - timedelta(seconds=1))
+        email.refresh_from_db()
+        self.assertEqual(email.status, OutgoingEmailModel.FAILED)
+        self.assertEqual(email.last_error, 'Mail server unavailable')
+        self.assertEqual((email.body, email.html_body), ('', ''))
+
+
+class UnreadCountTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user, cls.other = [User.objects.create_user(f'user{i}', f'user{i}@example.com', 'secret') for i in range(2)]
+        cls.channel = ChannelModel.objects.create(channelName='general', channelDescription='General', createdFrom=cls.user)
+        cls.channel.channelMembers.set([cls.user, cls.other])
+        cls.messages = [MessageModel.objects.create(channel=cls.channel, sender=cls.other, content=f'message {i}') for i in range(3)]
+        MessageModel.objects.create(channel=cls.channel, sender=cls.user, content='own message')
+        cls.thread = ThreadChannelModel.objects.create(
+            threadName='thread', threadDescription='thread', mainChannel=cls.channel,
+            createdFrom=cls.user, original_message=cls.messages[0],
+        )
+        cls.thread.threadMember.add(cls.user)
+        ThreadMessageModel.objects.create(thread_channel=cls.thread, sender=cls.other, content='reply')
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def unread(self):
+        return self.client.get('/unread/').json()
+
+    def test_counts_messages_of_others(self):
+        with self.assertNumQueries(1):
+            counts = self.unread()
+        self.assertEqual(counts['channels'], {str(self.channel.id): 3})
+        self.assertEqual(counts['threads'], {str(self.thread.id): 1})
+
+    def test_marker_only_moves_forward(self):
+        response = self.client.post(f'/channel/{self.channel.id}/read/', {'messageId': self.messages[1].id})
+        self.assertEqual(response.data['lastReadId'], self.messages[1].id)
+        self.assertEqual(self.unread()['channels'], {str(self.channel.id): 1})
+
+        response = self.client.post(f'/channel/{self.channel.id}/read/', {'messageId': self.messages[0].id})
+        self.assertEqual(response.data['lastReadId'], self.messages[1].id)
+        self.assertEqual(self.unread()['channels'], {str(self.channel.id): 1})
+
+    def test_mark_all_read(self):
+        self.client.post(f'/channel/{self.channel.id}/read/')
+        self.client.post(f'/channelThread/{self.thread.id}/read/')
+        counts = self.unread()
+        self.assertEqual(counts['channels'], {str(self.channel.id): 0})
+        self.assertEqual(counts['threads'], {str(self.thread.id): 0})
+
+    def test_posting_marks_channel_read(self):
+        self.client.post(f'/channel/{self.channel.id}/messages/', {'content': 'reply', 'channel': self.channel.id})
+        self.assertEqual(self.unread()['channels'], {str(self.channel.id): 0})
+
+    def test_rejects_message_of_other_channel(self):
+        other_channel = ChannelModel.objects.create(channelName='random', channelDescription='Random', createdFrom=self.user)
+        message = MessageModel.objects.create(channel=other_channel, sender=self.other, content='elsewhere')
+        response = self.client.post(f'/channel/{self.channel.id}/read/', {'messageId': message.id})
+        self.assertEqual(response.status_code, 400)
+
+    def test_counts_stop_at_limit(self):
+        MessageModel.objects.bulk_create(
+            [MessageModel(channel=self.channel, sender=self.other, content='more') for _ in range(UNREAD_LIMIT)]
+        )
+        self.assertEqual(self.unread()['channels'], {str(self.channel.id): UNREAD_LIMIT})
+
+
+class RealtimeEventTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('user', 'user@example.com', 'secret')
+        cls.token = Token.objects.create(user=cls.user)
+        cls.channel = ChannelModel.objects.create(channelName='general', channelDescription='General', createdFrom=cls.user)
+        cls.channel.channelMembers.add(cls.user)
+
+    def post_message(self, content):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            return client.post(f'/channel/{self.channel.id}/messages/', {'content': content, 'channel': self.channel.id}).data
+
+    async def test_member_receives_new_message(self):
+        communicator = WebsocketCommunicator(application, f'/ws/chat/?token={self.token.key}', headers=[(b'origin', b'http://localhost')])
+        connected, _ = await communicator.connect()
+        self.assertTrue(connected)
+
+        message = await sync_to_async(self.post_message)('hello')
+        event = await communicator.receive_json_from()
+        self.assertEqual(event['event'], 'message.created')
+        self.assertEqual(event['channel'], self.channel.id)
+        self.assertEqual(event['data']['id'], message['id'])
+        await communicator.disconnect()
+
+    async def test_non_object_payload_gets_an_error(self):
+        communicator = WebsocketCommunicator(application, f'/ws/chat/?token={self.token.key}', headers=[(b'origin', b'http://localhost')])
+        await communicator.connect()
+        for payload in ([], 'x', 1):
+            await communicator.send_json_to(payload)
+            self.assertEqual(await communicator.receive_json_from(), {'error': 'Unknown action.'})
+        await communicator.send_json_to({'action': 'subscribe', 'channel': self.channel.id})
+        self.assertTrue(await communicator.receive_nothing())
+        await communicator.disconnect()
+
+    async def test_rejects_invalid_token(self):
+        communicator = WebsocketCommunicator(application, '/ws/chat/?token=invalid', headers=[(b'origin', b'http://localhost')])
+        connected, _ = await communicator.connect()
+        self.assertFalse(connected)
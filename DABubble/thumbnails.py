@@ -0,0 +1,129 @@
+import hashlib
+import logging
+import posixpath
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, transaction
+from PIL import Image, ImageOps, features
+
+from .models import AvatarModel
+
+logger = logging.getLogger(__name__)
+
+THUMBNAIL_SETTINGS = getattr(settings, 'AVATAR_THUMBNAILS', {})
+SIZES = THUMBNAIL_SETTINGS.get('SIZES', [32, 64, 128])
+QUALITY = THUMBNAIL_SETTINGS.get('QUALITY', 80)
+THUMBNAIL_DIR = 'images/thumbnails'
+# WebP is about a third smaller than JPEG at the same quality; JPEG is the fallback for
+# Pillow builds without libwebp.
+FORMAT, EXTENSION = ('WEBP', 'webp') if features.check('webp') else ('JPEG', 'jpg')
+
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='thumbnails')
+
+
+def thumbnail_name(avatar, size, content):
+    """
+    Names carry a hash of the content, so a re-rendered thumbnail gets a new URL and the
+    media responses can be cached as immutable (see `DABubble.media`).
+    """
+    digest = hashlib.sha256(content).hexdigest()[:12]
+    return posixpath.join(THUMBNAIL_DIR, f'{avatar.id}-{size}-{digest}.{EXTENSION}')
+
+
+def render_thumbnails(avatar):
+    """
+    Renders the square thumbnails of an uploaded avatar image in every size of `SIZES`,
+    cropped to the center, stores them next to the originals and saves their names in
+    `avatar.thumbnails` (`{"32": name, ...}`).
+
+    Avatars without an uploaded image (`image_path` assets) have no thumbnails.
+    """
+    previous = set(avatar.thumbnails.values())
+    if not avatar.image:
+        thumbnails = {}
+    else:
+        storage = avatar.image.storage
+        with avatar.image.open('rb') as file, Image.open(file) as original:
+            # Lets the JPEG decoder scale down while decoding (1/2 to 1/8), which is most of the
+            # work for camera-sized photos; it keeps at least twice the largest size.
+            original.draft(None, (max(SIZES) * 2, max(SIZES) * 2))
+            image = ImageOps.exif_transpose(original)
+            image = image.convert('RGBA' if FORMAT == 'WEBP' and 'A' in image.getbands() else 'RGB')
+            thumbnails = {}
+            for size in SIZES:
+                output = BytesIO()
+                ImageOps.fit(image, (size, size), Image.LANCZOS).save(output, FORMAT, quality=QUALITY)
+                content = output.getvalue()
+                name = thumbnail_name(avatar, size, content)
+                if not storage.exists(name):
+                    storage.save(name, ContentFile(content))
+                thumbnails[str(size)] = name
+    avatar.thumbnails = thumbnails
+    avatar.save(update_fields=['thumbnails'])
+    for name in previous - set(thumbnails.values()):
+        avatar.image.storage.delete(name)
+    return thumbnails
+
+
+def thumbnail_urls(avatar, request=None):
+    """
+    Returns `{"32": url, ...}` for the rendered thumbnails of `avatar`, absolute if `request`
+    is given, or an empty dict while they are not rendered yet.
+    """
+    storage = AvatarModel._meta.get_field('image').storage
+    urls = {}
+    for size, name in avatar.thumbnails.items():
+        url = storage.url(name)
+        urls[size] = request.build_absolute_uri(url) if request is not None else url
+    return urls
+
+
+def clear_thumbnails(avatar):
+    """
+    Empties `avatar.thumbnails` before its image is replaced, so that the avatar shows the new
+    original instead of the old thumbnails until the new ones are rendered. The caller saves
+    the avatar; the old files are deleted once the transaction commits.
+    """
+    storage = avatar.image.storage
+    stale = list(avatar.thumbnails.values())
+    avatar.thumbnails = {}
+    transaction.on_commit(lambda: [storage.delete(name) for name in stale])
+
+
+def delete_thumbnails(avatar):
+    for name in avatar.thumbnails.values():
+        avatar.image.storage.delete(name)
+
+
+def _render(avatar_id):
+    try:
+        avatar = AvatarModel.objects.filter(id=avatar_id).first()
+        if avatar is not None:
+            render_thumbnails(avatar)
+    except Exception:
+        logger.exception('Rendering the thumbnails of avatar %s failed', avatar_id)
+
+
+def _render_in_background(avatar_id):
+    try:
+        _render(avatar_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_thumbnails(avatar):
+    """
+    Renders the thumbnails of `avatar` in a background thread once the current transaction
+    commits, so the upload request does not wait for the resizing. Avatars the thread misses
+    (e.g. because the process stopped) are picked up by the `render_thumbnails` command.
+
+    With `AVATAR_THUMBNAILS['BACKGROUND']` set to False the thumbnails are rendered on commit
+    in the calling thread instead.
+    """
+    if getattr(settings, 'AVATAR_THUMBNAILS', {}).get('BACKGROUND', True):
+        transaction.on_commit(lambda: _executor.submit(_render_in_background, avatar.id))
+    else:
+        transaction.on_commit(lambda: _render(avatar.id))
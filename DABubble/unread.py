@@ -0,0 +1,74 @@
+from django.db import IntegrityError, transaction
+from django.db.models import IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import ChannelModel, MessageModel, ReadMarkerModel, ThreadChannelModel, ThreadMessageModel
+
+# Unread messages are counted up to this number, so a badge costs at most this many index
+# entries per channel or thread however long the history is; clients show e.g. "99+".
+UNREAD_LIMIT = 100
+
+
+class LimitedCount(Subquery):
+    """
+    Counts the rows of a sliced subquery: `(SELECT COUNT(*) FROM (<subquery> LIMIT n))`.
+    """
+    template = '(SELECT COUNT(*) FROM (%(subquery)s) _limited)'
+    output_field = IntegerField()
+
+
+def last_read(user, field):
+    """
+    Subquery of the user's read position in the outer channel or thread (`field` names the
+    marker's foreign key), 0 without marker.
+    """
+    markers = ReadMarkerModel.objects.filter(user=user, **{field: OuterRef(OuterRef('pk'))})
+    return Coalesce(Subquery(markers.values('lastReadId')[:1]), 0)
+
+
+def unread_counts(user):
+    """
+    Returns `(channels, threads)`: `{id: unread}` for every channel the user is a member of and
+    every thread the user follows. Both are read in a single query (`UNION ALL`).
+
+    A message counts as unread if its id is above the user's read marker and someone else sent
+    it. The counts walk the `(channel, id)` / `(thread_channel, id)` indexes from the marker
+    on and stop at `UNREAD_LIMIT`. Posting moves the sender's marker to the new message, so
+    the walk does not pass over the user's own history either.
+    """
+    unread_messages = MessageModel.objects.filter(
+        channel=OuterRef('pk'), id__gt=last_read(user, 'channel'),
+    ).exclude(sender=user).values('id')[:UNREAD_LIMIT]
+    unread_thread_messages = ThreadMessageModel.objects.filter(
+        thread_channel=OuterRef('pk'), id__gt=last_read(user, 'thread_channel'),
+    ).exclude(sender=user).values('id')[:UNREAD_LIMIT]
+
+    channels = ChannelModel.objects.filter(channelMembers=user).annotate(
+        kind=Value('channel'), unread=LimitedCount(unread_messages),
+    ).values_list('kind', 'id', 'unread')
+    threads = ThreadChannelModel.objects.filter(threadMember=user).annotate(
+        kind=Value('thread'), unread=LimitedCount(unread_thread_messages),
+    ).values_list('kind', 'id', 'unread')
+
+    counts = {'channel': {}, 'thread': {}}
+    for kind, id, unread in channels.union(threads, all=True):
+        counts[kind][id] = unread
+    return counts['channel'], counts['thread']
+
+
+def mark_read(user, message_id, **target):
+    """
+    Moves the user's read marker of the channel or thread given in `target`
+    (`channel=...` or `thread_channel=...`) forward to `message_id`. A marker never moves
+    back, so a late request from another device cannot mark read messages unread again.
+    Returns the resulting marker position.
+    """
+    markers = ReadMarkerModel.objects.filter(user=user, **target)
+    if not markers.filter(lastReadId__lt=message_id).update(lastReadId=message_id):
+        try:
+            with transaction.atomic():
+                ReadMarkerModel.objects.get_or_create(user=user, **target, defaults={'lastReadId': message_id})
+        except IntegrityError:
+            # Created concurrently; advance that marker instead.
+            markers.filter(lastReadId__lt=message_id).update(lastReadId=message_id)
+    return markers.values_list('lastReadId', flat=True).get()
@@ -0,0 +1,203 @@
+import os
+import re
+import shutil
+import tempfile
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.files import File, locks
+from django.utils import timezone
+from django.utils.text import get_valid_filename
+
+from .blobs import acquire_blob
+from .models import UploadModel
+
+UPLOAD_SETTINGS = getattr(settings, 'UPLOAD_SESSIONS', {})
+MAX_UPLOAD_SIZE = UPLOAD_SETTINGS.get('MAX_SIZE', 500 * 1024 * 1024)
+MAX_CHUNK_SIZE = UPLOAD_SETTINGS.get('MAX_CHUNK', 8 * 1024 * 1024)
+# Open sessions untouched for this many seconds are removed by the `clean_uploads` command.
+EXPIRY = UPLOAD_SETTINGS.get('EXPIRY', 24 * 60 * 60)
+BUFFER_SIZE = 64 * 1024
+CONTENT_RANGE = re.compile(r'^bytes (\d+)-(\d+)/(\d+)$')
+UPLOAD_NOT_AVAILABLE = {'detail': 'Upload not found, not complete or attached already.'}
+
+
+class UploadError(Exception):
+    """
+    Raised when a chunk or an upload session cannot be accepted; the message is shown to
+    the client.
+    """
+
+
+class OffsetMismatch(UploadError):
+    """
+    Raised when a chunk does not start where the received data ends. The client resumes
+    from `received`.
+    """
+
+    def __init__(self, received):
+        super().__init__(f'Expected the chunk at offset {received}.')
+        self.received = received
+
+
+def partial_dir():
+    return UPLOAD_SETTINGS.get('TEMP_DIR') or os.path.join(settings.MEDIA_ROOT, 'partial')
+
+
+def partial_path(upload):
+    return os.path.join(partial_dir(), f'{upload.id}.part')
+
+
+def create_upload(owner, filename, size):
+    """
+    Opens an upload session for a file of `size` bytes and creates its empty partial file.
+    """
+    filename = get_valid_filename(os.path.basename(filename or ''))
+    if not filename:
+        raise UploadError('`filename` is required.')
+    if not 0 < size <= MAX_UPLOAD_SIZE:
+        raise UploadError(f'`size` must be between 1 and {MAX_UPLOAD_SIZE} bytes.')
+    upload = UploadModel.objects.create(owner=owner, filename=filename, size=size)
+    os.makedirs(partial_dir(), exist_ok=True)
+    open(partial_path(upload), 'wb').close()
+    return upload
+
+
+def parse_content_range(header, upload):
+    """
+    Returns `(start, length)` of the chunk described by `Content-Range: bytes start-end/size`.
+    """
+    match = CONTENT_RANGE.match(header or '')
+    if match is None:
+        raise UploadError('`Content-Range: bytes <start>-<end>/<size>` is required.')
+    start, end, total = (int(group) for group in match.groups())
+    if total != upload.size or start > end or end >= upload.size:
+        raise UploadError('`Content-Range` does not match the upload.')
+    if end - start + 1 > MAX_CHUNK_SIZE:
+        raise UploadError(f'Chunks must not exceed {MAX_CHUNK_SIZE} bytes.')
+    return start, end - start + 1
+
+
+def write_chunk(upload, start, length, stream):
+    """
+    Appends `length` bytes read from `stream` (the request body) at `start`, which must be
+    where the received data ends, and returns the new number of received bytes.
+
+    The body is first copied in `BUFFER_SIZE` pieces into a temporary file of its own, so
+    memory stays bounded whatever the chunk size and a slow client holds no lock. The chunk
+    is then appended under an exclusive lock on the partial file, after checking the offset
+    against the database again: a delayed retry of a chunk that already landed gets the 409
+    without touching the file, and the file is never cut below the recorded `received`. If
+    the connection drops mid-chunk, the bytes that arrived are kept and the client resumes
+    after them. The lock needs `UPLOAD_SESSIONS['TEMP_DIR']` on a file system supporting
+    `flock` when several hosts serve uploads.
+    """
+    if upload.status != UploadModel.OPEN:
+        raise UploadError('The upload is already complete.')
+    if start != upload.received:
+        raise OffsetMismatch(upload.received)
+
+    with tempfile.TemporaryFile(dir=partial_dir()) as chunk:
+        written = 0
+        while written < length:
+            data = stream.read(min(BUFFER_SIZE, length - written))
+            if not data:
+                break
+            chunk.write(data)
+            written += len(data)
+        chunk.seek(0)
+
+        with open(partial_path(upload), 'r+b') as file:
+            locks.lock(file, locks.LOCK_EX)
+            try:
+                upload.refresh_from_db(fields=['status', 'received'])
+                if upload.status != UploadModel.OPEN:
+                    raise UploadError('The upload is already complete.')
+                if start != upload.received:
+                    raise OffsetMismatch(upload.received)
+                file.seek(start)
+                shutil.copyfileobj(chunk, file, BUFFER_SIZE)
+                file.truncate()
+                file.flush()
+                UploadModel.objects.filter(id=upload.id).update(received=start + written, updated_at=timezone.now())
+            finally:
+                locks.unlock(file)
+    upload.received = start + written
+    return upload.received
+
+
+def complete_upload(upload):
+    """
+    Stores the fully received partial file as a blob (see `acquire_blob`) and marks the
+    upload as complete, ready to be attached to a message. The upload holds one reference
+    to the blob until it is attached or discarded.
+    """
+    if upload.status != UploadModel.OPEN:
+        raise UploadError('The upload is already complete.')
+    if upload.received != upload.size:
+        raise UploadError(f'Only {upload.received} of {upload.size} bytes were received.')
+    path = partial_path(upload)
+    if os.path.getsize(path) != upload.size:
+        raise UploadError('The received data is incomplete; upload the file again.')
+    with open(path, 'rb') as file:
+        blob = acquire_blob(File(file), upload.filename)
+    upload.blob = blob
+    upload.file = blob.file.name
+    upload.status = UploadModel.COMPLETE
+    upload.save(update_fields=['blob', 'file', 'status', 'updated_at'])
+    os.remove(path)
+    return upload
+
+
+def claim_upload(owner, upload_id):
+    """
+    Marks the complete upload `upload_id` of `owner` as attached and returns it, or None if
+    there is no such upload or it is attached already. An upload is attached only once.
+    """
+    try:
+        upload_id = int(upload_id)
+    except (TypeError, ValueError):
+        return None
+    claimed = UploadModel.objects.filter(id=upload_id, owner=owner, status=UploadModel.COMPLETE).update(
+        status=UploadModel.ATTACHED, updated_at=timezone.now(),
+    )
+    if not claimed:
+        return None
+    return UploadModel.objects.get(id=upload_id)
+
+
+def upload_attachment(upload):
+    """
+    Returns the message fields that attach a claimed upload; its blob reference passes to
+    the message.
+    """
+    return {'blob_id': upload.blob_id, 'messageData': upload.file.name, 'messageDataName': upload.filename}
+
+
+def discard_upload(upload):
+    """
+    Deletes an upload session that is not attached, with its partial file. A complete
+    upload releases its blob (see the `post_delete` signal of `UploadModel`).
+    """
+    if upload.status == UploadModel.ATTACHED:
+        raise UploadError('The upload is attached to a message.')
+    try:
+        os.remove(partial_path(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+
+def expire_uploads():
+    """
+    Discards the open and complete uploads untouched for `EXPIRY` seconds and returns their number.
+    """
+    stale = UploadModel.objects.filter(
+        status__in=[UploadModel.OPEN, UploadModel.COMPLETE],
+        updated_at__lt=timezone.now() - timedelta(seconds=EXPIRY),
+    )
+    count = 0
+    for upload in stale.iterator():
+        discard_upload(upload)
+        count += 1
+    return count
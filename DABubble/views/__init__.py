@@ -3,7 +3,13 @@ from .authentication.logout_view import LogoutView
 from .authentication.avatarModel_view import AvatarModelViewSet, AvatarUserModelView
 from .authentication.passwordReset_view import PasswordRequestView, PasswordResetConfirm
 from .authentication.regestration_view import RegistrationView
-from .chat.channel_view import ChannelView, SingleChannelView
-from .chat.message_view import MessageView, MessageEmojiView
-from .chat.thread_view import ThreadMessageView, ThreadEmojiView
-from .chat.user_view import UsersView, ActiveUserView
+from .chat.channel_view import ChannelView, ChannelDiscoveryView, SingleChannelView
+from .chat.message_view import MessageView, MessageEmojiView, MessageReactionView
+from .chat.thread_view import ThreadMessageView, ThreadEmojiView, ThreadReactionView
+from .chat.user_view import UsersView, ActiveUserView, UserResolveView
+from .chat.sync_view import SyncView
+from .chat.cache_view import CacheStatsView
+from .chat.search_view import SearchView
+from .chat.read_view import ChannelReadView, ThreadReadView, UnreadView
+from .chat.media_view import MediaView
+from .chat.upload_view import UploadView, UploadSessionView, UploadCompleteView
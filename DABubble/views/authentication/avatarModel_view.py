@@ -2,8 +2,9 @@ from rest_framework.response import Response
 from rest_framework import status
 from DABubble.serializers import AvatarModelSerializer
 from DABubble.models import AvatarModel
+from DABubble.thumbnails import clear_thumbnails, schedule_thumbnails
 from rest_framework import viewsets
-from rest_framework.authentication import TokenAuthentication
+from DABubble.authentication import CachedTokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 
@@ -17,20 +18,36 @@ class AvatarModelViewSet(viewsets.ModelViewSet):
     - PUT/PATCH: Update an existing avatar instance.
     - DELETE: Delete an avatar instance.
 
+    Behavior:
+    - After an image is uploaded (POST, PUT/PATCH), square thumbnails in the sizes of
+      `AVATAR_THUMBNAILS['SIZES']` are rendered in the background (see `DABubble.thumbnails`)
+      and listed in the `thumbnails` field once ready. Replacing the image clears the old
+      thumbnails in the same save, so clients show the new original meanwhile; updates that
+      keep the image render nothing.
+
     Attributes:
     - queryset: Retrieves all instances of the AvatarModel.
     - serializer_class: Specifies the serializer to use (AvatarModelSerializer).
-    - authentication_classes (list): Specifies the authentication backend used (TokenAuthentication).
+    - authentication_classes (list): Specifies the authentication backend used (CachedTokenAuthentication).
     - permission_classes (list): Ensures that only authenticated users can access this endpoint.
     """
     queryset = AvatarModel.objects.all()
     serializer_class = AvatarModelSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def perform_create(self, serializer):
         if self.request.user.is_authenticated:
-            serializer.save(user=self.request.user)
+            avatar = serializer.save(user=self.request.user)
+            schedule_thumbnails(avatar)
+
+    def perform_update(self, serializer):
+        avatar = serializer.instance
+        if 'image' not in serializer.validated_data or not (serializer.validated_data['image'] or avatar.image):
+            serializer.save()
+            return
+        clear_thumbnails(avatar)
+        schedule_thumbnails(serializer.save())
             
 
 class AvatarUserModelView(APIView):
@@ -42,11 +59,11 @@ class AvatarUserModelView(APIView):
 
     Attributes:
     - serializer_class: Specifies the serializer to use (AvatarModelSerializer).
-    - authentication_classes (list): Specifies the authentication backend used (TokenAuthentication).
+    - authentication_classes (list): Specifies the authentication backend used (CachedTokenAuthentication).
     - permission_classes (list): Ensures that only authenticated users can access this endpoint.
     """
     serializer_class= AvatarModelSerializer
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
     
     def get(self, request, *args, **kwargs):
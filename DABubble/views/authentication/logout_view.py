@@ -1,7 +1,7 @@
 import logging
 from rest_framework.response import Response
 from rest_framework import status
-from rest_framework.authentication import TokenAuthentication
+from DABubble.authentication import CachedTokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 
@@ -16,10 +16,10 @@ class LogoutView(APIView):
     - POST: Invalidates the user's session by deleting their authentication token.
 
     Attributes:
-    - authentication_classes (list): Specifies the authentication backend used (TokenAuthentication).
+    - authentication_classes (list): Specifies the authentication backend used (CachedTokenAuthentication).
     - permission_classes (list): Ensures that only authenticated users can access this endpoint.
     """
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
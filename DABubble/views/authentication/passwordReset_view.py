@@ -3,7 +3,7 @@ from rest_framework.permissions import AllowAny
 from DABubble.models import User
 from django.http import JsonResponse
 from django.contrib.auth.tokens import default_token_generator
-from django.core.mail import send_mail
+from DABubble.outbox import enqueue_email
 from django.utils.html import strip_tags
 from django.template.loader import render_to_string
 from rest_framework.response import Response
@@ -24,8 +24,9 @@ class PasswordRequestView(APIView):
     - Accepts an email address via the POST request.
     - Verifies if a user exists with the provided email.
     - If the user exists, generates a password reset token and constructs a reset link.
-    - Sends an email containing the reset link to the provided email address.
-    - Returns a success message upon sending the email or an error if the user does not exist.
+    - Queues an email containing the reset link to the provided email address in the outbox;
+      the `send_outbox` worker delivers it, so the request never waits for the mail server.
+    - Returns a success message once the email is queued or an error if the user does not exist.
     """
     permission_classes = [AllowAny]
     
@@ -48,14 +49,7 @@ class PasswordRequestView(APIView):
 
         text_content = strip_tags(html_content)
 
-        send_mail(
-            subject,
-            text_content,
-            settings.EMAIL_HOST_USER,
-            [email],
-            fail_silently=False,
-            html_message=html_content
-        )
+        enqueue_email(email, subject, text_content, html_content, from_email=settings.EMAIL_HOST_USER)
 
         return JsonResponse({"message": "Password reset link sent successfully"}, status=200)
 
@@ -0,0 +1,36 @@
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAdminUser
+from rest_framework.views import APIView
+
+from DABubble.authentication import CachedTokenAuthentication, token_cache
+from DABubble.profiles import profile_cache
+from DABubble.recent_messages import recent_messages
+
+
+class CacheStatsView(APIView):
+    """
+    CacheStatsView reports the size and hit/miss counters of the in-process caches.
+
+    HTTP Methods:
+    - GET: Returns `{"tokens": {...}, "recentMessages": {...}, "profiles": {...}}` with `size`,
+      `hits` and `misses` of the token, recent messages and profile caches.
+
+    Behavior:
+    - Only staff users may read the counters.
+    - The caches live in each worker process, so the counters describe the worker that
+      answered the request.
+
+    Attributes:
+    - authentication_classes: A list containing token-based authentication for the view.
+    - permission_classes: A list of permissions that restrict access to staff users only.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response({
+            'tokens': token_cache.stats(),
+            'recentMessages': recent_messages.stats(),
+            'profiles': profile_cache.stats(),
+        }, status=status.HTTP_200_OK)
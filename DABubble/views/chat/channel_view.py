@@ -1,19 +1,103 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, OuterRef, Prefetch, Q, Subquery, Value
+from django.db.models.functions import Lower
 from rest_framework.response import Response
-from DABubble.serializers import ChannelSerializer
+from DABubble.serializers import ChannelSerializer, ChannelSummarySerializer
 from rest_framework import status
+from DABubble.asynchronous import AsyncAPIView
+from DABubble.conditional import channel_list_etag, conditional
+from DABubble.reactions import reactions_prefetch
+from DABubble.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
 from DABubble.models import ChannelModel, MessageModel, ThreadChannelModel, ThreadMessageModel
-from DABubble.serializers import ChannelSerializer
-from rest_framework.authentication import TokenAuthentication
+from DABubble.authentication import CachedTokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 
-class ChannelView(APIView):
+CHANNEL_NAME_TAKEN = {"error": "A channel with this name already exists."}
+
+
+def channel_name_taken(name):
+    """
+    Returns True if a public channel with `name` exists, ignoring case, using the partial
+    index behind the `unique_channel_name_ci` constraint. Private channels (direct messages
+    are named after the partner) may share names.
+
+    The name is lowered by the database, like the indexed names, since SQLite's `LOWER`
+    only folds ASCII letters.
+    """
+    return ChannelModel.objects.alias(name_lower=Lower('channelName')).filter(
+        privateChannel=False, name_lower=Lower(Value(name)),
+    ).exists()
+
+
+def save_channel(serializer, **kwargs):
+    """
+    Saves `serializer` and returns False instead if the name was taken concurrently.
+    """
+    try:
+        with transaction.atomic():
+            serializer.save(**kwargs)
+    except IntegrityError:
+        return False
+    return True
+
+
+def channel_memberships(user):
+    """
+    Returns the ids of the channels `user` is a member of as a subquery, read from the index
+    of the member table by user instead of joining the members of every channel.
+    """
+    return ChannelModel.channelMembers.through.objects.filter(user=user).values('channelmodel_id')
+
+def visible_channels(user):
+    """
+    Returns the channels `user` may list: every public channel and the private channels the
+    user is a member of.
+    """
+    return ChannelModel.objects.filter(Q(privateChannel=False) | Q(id__in=channel_memberships(user)))
+
+def channel_summaries(channels):
+    """
+    Returns `channels` annotated with the fields of `ChannelSummarySerializer`.
+
+    Member count and last activity are computed in the same query (a grouped join on the
+    members and a correlated subquery on the newest message), so listing the channels costs
+    one query no matter how many channels, members or messages exist.
+    """
+    last_message = MessageModel.objects.filter(channel=OuterRef('pk')).order_by('-timestamp', '-id')
+    return (
+        channels
+        .select_related('createdFrom')
+        .annotate(
+            memberCount=Count('channelMembers', distinct=True),
+            lastActivity=Subquery(last_message.values('timestamp')[:1]),
+            lastMessageId=Subquery(last_message.values('id')[:1]),
+        )
+        .order_by('id')
+    )
+
+def channels_with_messages(channels=None):
+    """
+    Returns `channels` (all channels by default) prepared for the nested `ChannelSerializer` form.
+
+    Creator, members, messages with their attachment metadata and the emoji reactions of the
+    messages are loaded up front,
+    so serializing any number of channels takes a fixed number of queries.
+    """
+    if channels is None:
+        channels = ChannelModel.objects.all()
+    return channels.select_related('createdFrom').prefetch_related(
+        'channelMembers',
+        Prefetch('messages', queryset=MessageModel.objects.select_related('blob').prefetch_related(reactions_prefetch())),
+    )
+
+class ChannelView(AsyncAPIView):
     """
     ChannelView handles operations related to channels.
 
     HTTP Methods:
     - POST: Allows authenticated users to create a new channel.
-    - GET: Retrieves a list of all existing channels.
+    - GET: Retrieves the channels the user can see.
 
     Behavior:
     - Requires the user to be authenticated via token authentication.
@@ -21,35 +105,85 @@ class ChannelView(APIView):
         - Validates the incoming data using `ChannelSerializer`.
         - Saves the new channel with the authenticated user as the creator.
         - Returns the created channel's data on success.
-        - Returns validation errors if the data is invalid.
+        - Returns validation errors if the data is invalid or a public channel with the same
+          name, ignoring case, already exists. Private channels may share names.
     - On GET:
-        - Fetches all channels from the database.
-        - Serializes the data and returns the list of channels.
+        - Fetches the public channels and the private channels the user is a member of
+          (`visible_channels`). Public channels the user has not joined can also be browsed
+          page by page with `ChannelDiscoveryView`.
+        - Returns the channel summaries (`ChannelSummarySerializer`): id, name, description,
+          privacy flag, member count, creator and last activity, without any messages.
+        - With `?expand=messages` returns the full nested `ChannelSerializer` form instead.
+        - Sends an `ETag`; a matching `If-None-Match` gets a 304 without running the serializers.
+        - Runs on the event loop under ASGI (see `DABubble.asynchronous.AsyncAPIView`).
     """
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
         data = request.data.copy()
-        
-        channel_name = data.get("channelName")
-        if ChannelModel.objects.filter(channelName__iexact=channel_name).exists():
-            return Response(
-                {"error": "A channel with this name already exists."},
-                status=status.HTTP_400_BAD_REQUEST
-            ) 
 
         serializer = ChannelSerializer(data=data) 
         if serializer.is_valid():
-            serializer.save(createdFrom=request.user)
+            if not serializer.validated_data.get('privateChannel') and channel_name_taken(serializer.validated_data['channelName']):
+                return Response(CHANNEL_NAME_TAKEN, status=status.HTTP_400_BAD_REQUEST)
+            if not save_channel(serializer, createdFrom=request.user):
+                return Response(CHANNEL_NAME_TAKEN, status=status.HTTP_400_BAD_REQUEST)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    def get(self, request, *args, **kwargs):
-        channels = ChannelModel.objects.all()
-        serializer = ChannelSerializer(channels, many=True)
+    @conditional(channel_list_etag)
+    async def get(self, request, *args, **kwargs):
+        if request.query_params.get('expand') == 'messages':
+            channels = [channel async for channel in channels_with_messages(visible_channels(request.user))]
+            serializer = ChannelSerializer(channels, many=True)
+            return Response(serializer.data, status=status.HTTP_200_OK)
+
+        channels = [channel async for channel in channel_summaries(visible_channels(request.user))]
+        serializer = ChannelSummarySerializer(channels, many=True)
         return Response(serializer.data, status=status.HTTP_200_OK)
 
+class ChannelDiscoveryView(APIView):
+    """
+    ChannelDiscoveryView lists the public channels the user has not joined yet.
+
+    HTTP Methods:
+    - GET: Returns one page of channel summaries (`ChannelSummarySerializer`), oldest channel first.
+
+    Behavior:
+    - Requires the user to be authenticated via token authentication.
+    - Pages are read with keyset pagination on the channel id: `after=<id>` continues after the
+      last channel of the previous page, `limit` sets the page size (default 50, at most 200).
+    - Returns `{"results": [...], "hasMore": bool, "after": id}`; pass `after` back while
+      `hasMore` is true.
+    - Returns an error if `after` or `limit` is not a positive integer.
+
+    Attributes:
+    - authentication_classes: A list containing token-based authentication for the view.
+    - permission_classes: A list of permissions that restrict access to authenticated users only.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            after = int(request.query_params.get('after', 0))
+            limit = min(int(request.query_params.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+        except ValueError:
+            return Response({'detail': '`after` and `limit` must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        if after < 0 or limit < 1:
+            return Response({'detail': '`after` and `limit` must be positive integers.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        channels = ChannelModel.objects.filter(privateChannel=False, id__gt=after).exclude(id__in=channel_memberships(request.user))
+        rows = list(channel_summaries(channels)[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+        return Response({
+            'results': ChannelSummarySerializer(rows, many=True).data,
+            'hasMore': has_more,
+            'after': rows[-1].id if rows else None,
+        }, status=status.HTTP_200_OK)
+
 class SingleChannelView(APIView):
     """
     SingleChannelView handles operations on a single channel.
@@ -68,16 +202,17 @@ class SingleChannelView(APIView):
         - Retrieves the channel with the given `channel_id` to update.
         - Allows partial updates using the `ChannelSerializer`.
         - Returns the updated channel data on success.
-        - Returns validation errors if the update data is invalid.
+        - Returns validation errors if the update data is invalid or the new name is already
+          used by another public channel (public names are unique ignoring case).
         - Returns an error if the channel is not found.
     """
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def get(self, request, *args, **kwargs):
         channel_id = kwargs.get('channel_id')
         try:
-            channel = ChannelModel.objects.get(id=channel_id)
+            channel = channels_with_messages().get(id=channel_id)
             serializer = ChannelSerializer(channel)
             return Response(serializer.data, status=status.HTTP_200_OK)
         except ChannelModel.DoesNotExist:
@@ -89,7 +224,8 @@ class SingleChannelView(APIView):
             channel = ChannelModel.objects.get(id=channel_id)
             serializer = ChannelSerializer(channel, data=request.data, partial=True)
             if serializer.is_valid():
-                serializer.save()
+                if not save_channel(serializer):
+                    return Response(CHANNEL_NAME_TAKEN, status=status.HTTP_400_BAD_REQUEST)
                 return Response(serializer.data, status=status.HTTP_202_ACCEPTED)
             return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
         except ChannelModel.DoesNotExist:
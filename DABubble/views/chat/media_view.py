@@ -0,0 +1,85 @@
+from django.http import Http404
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+from rest_framework.exceptions import NotAuthenticated
+from rest_framework.permissions import AllowAny
+from rest_framework.views import APIView
+
+from DABubble.authentication import CachedTokenAuthentication, QueryTokenAuthentication
+from DABubble.media import ATTACHMENT_DIR, AVATAR_DIR, media_etag, media_name, media_path, serve_media
+from DABubble.models import BlobModel, MessageModel, ThreadMessageModel
+from DABubble.previews import PREVIEW_DIR
+from DABubble.views.chat.channel_view import visible_channels
+
+
+def can_read_attachment(user, name):
+    """
+    Returns True if `name` is attached to a message or thread message in a channel `user`
+    can see (see `visible_channels`). Uses the `messageData` indexes of both tables.
+
+    An attachment preview (`PREVIEW_DIR`) is readable wherever its blob is attached.
+    """
+    channels = visible_channels(user)
+    if name.startswith(f'{PREVIEW_DIR}/'):
+        attached = {'blob__in': BlobModel.objects.filter(preview=name).values('id')}
+    else:
+        attached = {'messageData': name}
+    return (
+        MessageModel.objects.filter(**attached, channel__in=channels).exists()
+        or ThreadMessageModel.objects.filter(**attached, thread_channel__mainChannel__in=channels).exists()
+    )
+
+
+class MediaView(APIView):
+    """
+    MediaView serves the uploaded media files under `MEDIA_URL`.
+
+    HTTP Methods:
+    - GET/HEAD: Returns the file at `path`.
+
+    Behavior:
+    - Avatars and their thumbnails (`images/`) are public.
+    - Message attachments (`ulpoads/`) require token authentication and are only served if the
+      message is in a public channel or a private channel the user is a member of; otherwise
+      the response is a 404, so the existence of the file is not revealed. The same applies
+      to their previews (`ulpoads/previews/`).
+    - Browsers load `<img src>`, `<video src>` and download links without an `Authorization`
+      header, so the token may also be passed as `?token=<key>`, as for websockets. Such URLs
+      should only be built in the client for the current user, never shared or logged.
+    - Responses carry an `ETag`, `Last-Modified` and a one year `immutable` cache lifetime
+      (`private` for attachments); `If-None-Match` / `If-Modified-Since` get a 304.
+    - A single byte `Range` is answered with 206 (resuming downloads, seeking in media).
+    - With `MEDIA_DELIVERY['BACKEND']` set to `x-accel-redirect` or `x-sendfile` the front server
+      transfers the file (and handles ranges); the worker only checks access and sends headers.
+
+    Attributes:
+    - authentication_classes: Token authentication from the `Authorization` header or the
+      `token` query parameter.
+    - permission_classes: Allows anyone; attachments check authentication themselves.
+    """
+    authentication_classes = [CachedTokenAuthentication, QueryTokenAuthentication]
+    permission_classes = [AllowAny]
+
+    def get(self, request, *args, **kwargs):
+        name = media_name(kwargs.get('path', ''))
+        if name is None:
+            raise Http404()
+        directory = name.split('/', 1)[0]
+        if directory == ATTACHMENT_DIR:
+            if not request.user.is_authenticated:
+                raise NotAuthenticated()
+            if not can_read_attachment(request.user, name):
+                raise Http404()
+        elif directory != AVATAR_DIR:
+            raise Http404()
+
+        found = media_path(name)
+        if found is None:
+            raise Http404()
+        path, stat = found
+        response = get_conditional_response(request, etag=media_etag(stat), last_modified=int(stat.st_mtime))
+        if response is not None:
+            response['ETag'] = media_etag(stat)
+            response['Last-Modified'] = http_date(stat.st_mtime)
+            return response
+        return serve_media(request, name, path, stat, public=directory == AVATAR_DIR)
@@ -1,13 +1,75 @@
+from asgiref.sync import sync_to_async
 from rest_framework.response import Response
-from DABubble.serializers import MessageSerializer
+from DABubble.serializers import CompactMessageSerializer, MessageSerializer
 from rest_framework import status
 from django.contrib.auth.models import User
-from DABubble.models import ChannelModel, MessageModel, ThreadChannelModel, ThreadMessageModel
-from rest_framework.authentication import TokenAuthentication
+from django.db import IntegrityError, transaction
+from DABubble import events
+from DABubble.asynchronous import AsyncAPIView
+from DABubble.conditional import channel_messages_etag, conditional
+from DABubble.models import ChangeModel, ChannelModel, MessageModel, ReactionModel, ThreadChannelModel, ThreadMessageModel
+from DABubble.pagination import InvalidCursor, cursor_page, wants_cursor_page
+from DABubble.recent_messages import arecent_page, cache_message, recent_limit
+from DABubble.unread import mark_read
+from DABubble.blobs import atomic_attachment, attach_file
+from DABubble.uploads import UPLOAD_NOT_AVAILABLE, claim_upload, upload_attachment
+from DABubble.reactions import is_valid_emoji_code, reactions_prefetch, replace_legacy_reactions, set_reaction, summarize_reactions, wants_reaction_summary
+from DABubble.authentication import CachedTokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 
-class MessageView(APIView):
+def serialize_messages(request, messages, reactions):
+    """
+    Serializes `messages` with the reaction format requested by the client.
+
+    `reactions` is the `ReactionModel` queryset covering these messages; it is only evaluated
+    for `?reactions=summary`, where the compact summaries replace the reacting user lists.
+    """
+    if not wants_reaction_summary(request.query_params):
+        return MessageSerializer(messages, many=True).data
+    summaries = summarize_reactions(reactions, 'message', request.user)
+    return CompactMessageSerializer(messages, many=True, context={'reaction_summaries': summaries}).data
+
+async def aserialize_messages(request, messages, reactions):
+    """
+    Async variant of `serialize_messages` for an evaluated list of `messages`; only the reaction
+    summaries need queries, which run in a worker thread.
+    """
+    if not wants_reaction_summary(request.query_params):
+        return MessageSerializer(messages, many=True).data
+    return await sync_to_async(serialize_messages)(request, messages, reactions)
+
+def open_thread(message, user):
+    """
+    Returns `(thread_channel, created)` for the thread of `message`, creating it with `user` as
+    its first member and a copy of the message as its first thread message. A new thread and
+    its first message are recorded for the sync endpoint; `thread.opened` is published once
+    the transaction commits.
+
+    The thread is inserted right away; the unique constraint on `original_message` turns a
+    concurrent opening of the same thread into an `IntegrityError`, after which the thread of
+    the other request is returned. Call it inside a transaction, so that a failure leaves no
+    thread without its member or first message.
+    """
+    try:
+        with transaction.atomic():
+            thread_channel = ThreadChannelModel.objects.create(
+                threadName=f'Thread for message {message.id}',
+                threadDescription=f'Thread started from message {message.id} in channel {message.channel_id}',
+                mainChannel_id=message.channel_id,
+                createdFrom=user,
+                original_message=message,
+            )
+    except IntegrityError:
+        return ThreadChannelModel.objects.get(original_message=message), False
+    ThreadChannelModel.threadMember.through.objects.create(threadchannelmodel=thread_channel, user=user)
+    seed = ThreadMessageModel.objects.create(sender_id=message.sender_id, content=message.content, thread_channel=thread_channel)
+    # The thread first, then its first message, so that syncing clients get both in this order.
+    events.thread_opened(thread_channel, {'thread': thread_channel.id, 'message': message.id})
+    events.record_change(message.channel_id, ChangeModel.THREAD_MESSAGE, seed.id)
+    return thread_channel, True
+
+class MessageView(AsyncAPIView):
     """
     MessageView handles operations related to messages within a specific channel.
 
@@ -21,19 +83,40 @@ class MessageView(APIView):
     - On POST:
         - Creates a new message within the specified channel.
         - Associates the message with the user sending it and the channel provided.
-        - Returns the created message data on success.
+        - `uploadId` attaches a completed upload session (`UploadView`) as `messageData`
+          instead of a file in the request body.
+        - Attachments are stored once per content (`DABubble.blobs`): a file that is already
+          stored is referenced instead of written again. `messageDataName` keeps the file name.
+        - Returns the created message data on success and publishes a `message.created` event.
+        - Appends the message to the cached recent messages of the channel.
+        - Moves the sender's read marker of the channel to the new message.
         - Returns an error if the channel is not found.
     - On GET:
         - Retrieves all messages from a specific channel.
-        - Returns a list of messages for the channel.
-        - Returns an error if the channel does not exist.
+        - Returns a list of messages for the channel, oldest first.
+        - If `before`, `after` or `limit` is given, returns a single page instead
+          (see `DABubble.pagination.cursor_page`) as
+          `{"results": [...], "hasMore": bool, "before": id, "after": id}`.
+        - The newest page (`limit` only, full reaction format) is served from the in-process
+          cache of recent messages (see `DABubble.recent_messages`), validated against the
+          channel's newest message change.
+        - With `?reactions=summary` every message carries a compact `reactions` summary
+          (count, own reaction and a few names per emoji) instead of the `emoji_*` user lists.
+        - Sends an `ETag` derived from the channel's newest change; a matching `If-None-Match`
+          gets a 304 without loading or serializing any message.
+        - Runs on the event loop under ASGI (see `DABubble.asynchronous.AsyncAPIView`).
+        - Returns an error if the channel does not exist or the cursor is invalid.
     - On PATCH:
         - Updates an existing message in a specific channel.
-        - Allows the creation of a thread for the message.
-        - Returns the updated message data on success.
+        - Allows the creation of a thread for the message (publishes a `thread.opened` event).
+          Opening the thread and saving the message form one transaction (see `open_thread`);
+          when two users open the same thread at once, both get the same thread. The response
+          carries its id in `thread_channel`.
+        - Returns the updated message data on success and publishes a `message.edited` event.
+        - Replaces the message in the cached recent messages of the channel.
         - Returns an error if the message or channel is not found.
     """
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
@@ -45,20 +128,55 @@ class MessageView(APIView):
 
         serializer = MessageSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(sender=request.user, channel=channel)
+            # Claiming the upload, counting the blob reference and storing a new file are
+            # undone if the save fails.
+            with atomic_attachment():
+                attachment = {}
+                if request.data.get('uploadId') is not None:
+                    upload = claim_upload(request.user, request.data['uploadId'])
+                    if upload is None:
+                        return Response(UPLOAD_NOT_AVAILABLE, status=status.HTTP_400_BAD_REQUEST)
+                    attachment = upload_attachment(upload)
+                elif serializer.validated_data.get('messageData'):
+                    attachment = attach_file(serializer.validated_data['messageData'])
+                message = serializer.save(sender=request.user, channel=channel, **attachment)
+            change = events.message_created(message, serializer.data)
+            cache_message(change, serializer.data, created=True)
+            mark_read(request.user, message.id, channel=channel)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    def get(self, request, *args, **kwargs):
+    @conditional(channel_messages_etag)
+    async def get(self, request, *args, **kwargs):
         channel_id = kwargs.get('channel_id')
+        limit = recent_limit(request.query_params)
+        if limit is not None:
+            page = await arecent_page(channel_id, limit)
+            if page is None:
+                return Response({'detail': 'Channel not found'}, status=status.HTTP_404_NOT_FOUND)
+            return Response(page, status=status.HTTP_200_OK)
+
         try:
-            channel = ChannelModel.objects.get(id=channel_id)
-            messages = MessageModel.objects.filter(channel=channel)
-            serializer = MessageSerializer(messages, many=True)
-            return Response(serializer.data, status=status.HTTP_200_OK)
+            channel = await ChannelModel.objects.aget(id=channel_id)
         except ChannelModel.DoesNotExist:
             return Response({'detail': 'Channel not found'}, status=status.HTTP_404_NOT_FOUND)
 
+        messages = MessageModel.objects.filter(channel=channel).select_related('blob')
+        if not wants_reaction_summary(request.query_params):
+            messages = messages.prefetch_related(reactions_prefetch())
+        if not wants_cursor_page(request.query_params):
+            messages = [message async for message in messages.order_by('timestamp', 'id')]
+            reactions = ReactionModel.objects.filter(message__channel=channel)
+            return Response(await aserialize_messages(request, messages, reactions), status=status.HTTP_200_OK)
+
+        try:
+            page = await sync_to_async(cursor_page)(messages, request.query_params)
+        except InvalidCursor as error:
+            return Response({'detail': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        reactions = ReactionModel.objects.filter(message__in=[message.id for message in page['results']])
+        page['results'] = await aserialize_messages(request, page['results'], reactions)
+        return Response(page, status=status.HTTP_200_OK)
+
     def patch(self, request, *args, **kwargs):
         channel_id = kwargs.get('channel_id')
         message_id = kwargs.get('message_id')
@@ -73,30 +191,15 @@ class MessageView(APIView):
             message.content = content
 
         thread_open = request.data.get('threadOpen', message.threadOpen)
-        if thread_open and not message.thread_channel:
-            thread_channel = ThreadChannelModel.objects.create(
-                threadName=f'Thread for message {message.id}',
-                threadDescription=f'Thread started from message {message.id} in channel {channel_id}',
-                mainChannel=message.channel,
-                createdFrom=request.user,
-                original_message=message
-            )
-            thread_channel.threadMember.add(request.user)
-
-            message.thread_channel = thread_channel
-            message.threadOpen = True
+        with transaction.atomic():
+            if thread_open and not message.thread_channel_id:
+                message.thread_channel, _ = open_thread(message, request.user)
+            message.threadOpen = thread_open
             message.save()
 
-            ThreadMessageModel.objects.create(
-                sender=message.sender,
-                content=message.content,
-                thread_channel=thread_channel
-            )
-
-        message.threadOpen = thread_open
-        message.save()
-
         serializer = MessageSerializer(message)
+        change = events.message_edited(message, serializer.data)
+        cache_message(change, serializer.data)
         return Response(serializer.data, status=status.HTTP_200_OK)
         
         
@@ -111,14 +214,16 @@ class MessageEmojiView(APIView):
     - Requires the user to be authenticated via token authentication.
     - The request should contain the updated lists of users for each emoji reaction (hands-up, check, nerd, and rocket).
     - Each emoji type is associated with a list of user IDs indicating which users reacted with that emoji.
-    - The method updates the corresponding `ManyToMany` relationships in the `MessageModel`.
-    - Returns the updated message data upon successful update.
+    - The method replaces the corresponding rows of the message in `ReactionModel`, touching only
+      the reactions that changed.
+    - Returns the updated message data upon successful update and writes it through to the
+      cached recent messages of the channel.
 
     Attributes:
     - authentication_classes: A list containing token-based authentication for the view.
     - permission_classes: A list of permissions that restrict access to authenticated users only.
     """
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
     
     def patch(self, request, *args, **kwargs):
@@ -130,23 +235,53 @@ class MessageEmojiView(APIView):
         except MessageModel.DoesNotExist:
             return Response({'detail': 'Message or Channel not found.'}, status=status.HTTP_404_NOT_FOUND)
         
-        # Listen von Diktaten, die die Benutzerdaten enthalten
-        emoji_handsup_users = request.data.get('emoji_handsup', [])
-        emoji_check_users = request.data.get('emoji_check', [])
-        emoji_nerd_users = request.data.get('emoji_nerd', [])
-        emoji_rocket_users = request.data.get('emoji_rocket', [])
-        # Konvertiere die Diktate in User-Objekte
-        handsup_users = [User.objects.get(id=user_dict['id']) for user_dict in emoji_handsup_users]
-        check_users = [User.objects.get(id=user_dict['id']) for user_dict in emoji_check_users]
-        nerd_users = [User.objects.get(id=user_dict['id']) for user_dict in emoji_nerd_users]
-        rocket_users = [User.objects.get(id=user_dict['id']) for user_dict in emoji_rocket_users]
-        # Aktualisiere die ManyToMany-Felder mit den User-Objekten
-        message.emoji_handsup.set(handsup_users)
-        message.emoji_check.set(check_users)
-        message.emoji_nerd.set(nerd_users)
-        message.emoji_rocket.set(rocket_users)
-        
-        message.save()
+        replace_legacy_reactions(message, request.data)
 
         serializer = MessageSerializer(message)
-        return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+        change = events.reaction_changed(message.channel_id, None, events.legacy_reactions(serializer.data))
+        cache_message(change, serializer.data)
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class MessageReactionView(APIView):
+    """
+    MessageReactionView adds or removes a single emoji reaction of the authenticated user on a message.
+
+    HTTP Methods:
+    - PUT: Adds the reaction `emoji` of the user to the message.
+    - DELETE: Removes the reaction `emoji` of the user from the message.
+
+    Behavior:
+    - Requires the user to be authenticated via token authentication.
+    - Touches exactly one `ReactionModel` row, so concurrent clicks of different users never overwrite each other.
+    - Both methods are idempotent: repeating a request leaves the reaction in the same state.
+    - Returns `{"emoji": code, "reacted": bool, "count": int}` with the new state of that emoji
+      and publishes it as a `reaction.updated` event.
+    - Returns an error if the emoji code is invalid or the message or channel is not found.
+
+    Attributes:
+    - authentication_classes: A list containing token-based authentication for the view.
+    - permission_classes: A list of permissions that restrict access to authenticated users only.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def put(self, request, *args, **kwargs):
+        return self.set_reaction(request, kwargs, reacted=True)
+
+    def delete(self, request, *args, **kwargs):
+        return self.set_reaction(request, kwargs, reacted=False)
+
+    def set_reaction(self, request, kwargs, reacted):
+        emoji = kwargs.get('emoji')
+        if not is_valid_emoji_code(emoji):
+            return Response({'detail': 'Invalid emoji code.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            message = MessageModel.objects.only('id', 'channel').get(id=kwargs.get('message_id'), channel__id=kwargs.get('channel_id'))
+        except MessageModel.DoesNotExist:
+            return Response({'detail': 'Message or Channel not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        state = set_reaction(message, request.user, emoji, reacted)
+        events.reaction_changed(message.channel_id, None, {'message': message.id, 'user': request.user.id, **state})
+        return Response(state, status=status.HTTP_200_OK)
@@ -0,0 +1,116 @@
+from django.db.models import Max
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+from DABubble.authentication import CachedTokenAuthentication
+from DABubble.models import ChannelModel, MessageModel, ThreadChannelModel, ThreadMessageModel
+from DABubble.unread import UNREAD_LIMIT, mark_read, unread_counts
+
+
+def requested_position(request, messages):
+    """
+    Returns the message id to mark as read: `messageId` from the request body, which must be
+    one of `messages`, or the newest of `messages`. Returns None if `messageId` is invalid.
+    """
+    message_id = request.data.get('messageId')
+    if message_id is None:
+        return messages.aggregate(newest=Max('id'))['newest'] or 0
+    try:
+        message_id = int(message_id)
+    except (TypeError, ValueError):
+        return None
+    return message_id if messages.filter(id=message_id).exists() else None
+
+
+class ChannelReadView(APIView):
+    """
+    ChannelReadView advances the user's read marker in a channel.
+
+    HTTP Methods:
+    - POST: Marks the messages of the channel up to `messageId` as read, or all of them if
+      `messageId` is omitted. Returns `{"channel": id, "lastReadId": id}`.
+
+    Behavior:
+    - Requires the user to be authenticated via token authentication.
+    - The marker only moves forward; an older `messageId` leaves it where it is.
+    - Returns an error if the channel does not exist or `messageId` is not a message of it.
+
+    Attributes:
+    - authentication_classes: A list containing token-based authentication for the view.
+    - permission_classes: A list of permissions that restrict access to authenticated users only.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        try:
+            channel = ChannelModel.objects.get(id=kwargs.get('channel_id'))
+        except ChannelModel.DoesNotExist:
+            return Response({'detail': 'Channel not found'}, status=status.HTTP_404_NOT_FOUND)
+        message_id = requested_position(request, MessageModel.objects.filter(channel=channel))
+        if message_id is None:
+            return Response({'detail': 'Message not found in this channel.'}, status=status.HTTP_400_BAD_REQUEST)
+        last_read_id = mark_read(request.user, message_id, channel=channel)
+        return Response({'channel': channel.id, 'lastReadId': last_read_id}, status=status.HTTP_200_OK)
+
+
+class ThreadReadView(APIView):
+    """
+    ThreadReadView advances the user's read marker in a thread.
+
+    HTTP Methods:
+    - POST: Marks the messages of the thread up to `messageId` as read, or all of them if
+      `messageId` is omitted. Returns `{"thread": id, "lastReadId": id}`.
+
+    Behavior:
+    - Requires the user to be authenticated via token authentication.
+    - The marker only moves forward; an older `messageId` leaves it where it is.
+    - Returns an error if the thread does not exist or `messageId` is not a message of it.
+
+    Attributes:
+    - authentication_classes: A list containing token-based authentication for the view.
+    - permission_classes: A list of permissions that restrict access to authenticated users only.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        try:
+            thread_channel = ThreadChannelModel.objects.get(id=kwargs.get('thread_channel_id'))
+        except ThreadChannelModel.DoesNotExist:
+            return Response({'detail': 'Thread Channel not found'}, status=status.HTTP_404_NOT_FOUND)
+        message_id = requested_position(request, ThreadMessageModel.objects.filter(thread_channel=thread_channel))
+        if message_id is None:
+            return Response({'detail': 'Message not found in this thread.'}, status=status.HTTP_400_BAD_REQUEST)
+        last_read_id = mark_read(request.user, message_id, thread_channel=thread_channel)
+        return Response({'thread': thread_channel.id, 'lastReadId': last_read_id}, status=status.HTTP_200_OK)
+
+
+class UnreadView(APIView):
+    """
+    UnreadView returns the unread counts for the sidebar badges.
+
+    HTTP Methods:
+    - GET: Returns `{"channels": {id: unread}, "threads": {id: unread}, "limit": 100}` for every
+      channel the user is a member of and every thread the user follows.
+
+    Behavior:
+    - Requires the user to be authenticated via token authentication.
+    - Messages above the user's read marker (see `ChannelReadView` / `ThreadReadView`) that
+      were sent by someone else are unread.
+    - Counts stop at `limit`, so a badge showing `limit` means "at least that many".
+    - Everything is read in one indexed query (see `DABubble.unread.unread_counts`), without
+      loading any message.
+
+    Attributes:
+    - authentication_classes: A list containing token-based authentication for the view.
+    - permission_classes: A list of permissions that restrict access to authenticated users only.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        channels, threads = unread_counts(request.user)
+        return Response({'channels': channels, 'threads': threads, 'limit': UNREAD_LIMIT}, status=status.HTTP_200_OK)
@@ -0,0 +1,52 @@
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+from DABubble.authentication import CachedTokenAuthentication
+from DABubble.search import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, search_available, search_messages
+
+
+class SearchView(APIView):
+    """
+    SearchView searches the content of the messages and thread messages the user can see.
+
+    HTTP Methods:
+    - GET: Returns the messages matching `q` in the channels the user is a member of.
+
+    Behavior:
+    - Requires the user to be authenticated via token authentication.
+    - Every word of `q` must occur in a message; the last word also matches as a prefix.
+    - The newest 2000 matches are ranked by relevance and paginated with `offset` and `limit`
+      (default 20, at most 100):
+      `{"results": [{"type", "id", "channel", "thread", "sender", "timestamp", "snippet"}, ...], "hasMore": bool}`.
+    - `snippet` is an HTML-escaped excerpt of the content with the matched words in `<mark>` tags.
+    - Backed by the SQLite FTS5 index `message_search` (see `DABubble.search`), which triggers
+      keep in sync with every insert, edit and delete.
+    - Returns an error if `q` is missing, `offset` or `limit` is invalid, or the database does
+      not support the search index.
+
+    Attributes:
+    - authentication_classes: A list containing token-based authentication for the view.
+    - permission_classes: A list of permissions that restrict access to authenticated users only.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        if not search_available():
+            return Response({'detail': 'Search is not available on this database.'}, status=status.HTTP_501_NOT_IMPLEMENTED)
+
+        text = request.query_params.get('q', '').strip()
+        if not text:
+            return Response({'detail': '`q` is required.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            offset = int(request.query_params.get('offset', 0))
+            limit = min(int(request.query_params.get('limit', DEFAULT_SEARCH_LIMIT)), MAX_SEARCH_LIMIT)
+        except ValueError:
+            return Response({'detail': '`offset` and `limit` must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        if offset < 0 or limit < 1:
+            return Response({'detail': '`offset` must not be negative and `limit` must be positive.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        results, has_more = search_messages(request.user, text, limit, offset)
+        return Response({'results': results, 'hasMore': has_more}, status=status.HTTP_200_OK)
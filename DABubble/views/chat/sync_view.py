@@ -0,0 +1,79 @@
+from django.db.models import Max
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+from DABubble.authentication import CachedTokenAuthentication
+from DABubble.models import ChangeModel, ChannelModel, MessageModel, ThreadChannelModel, ThreadMessageModel
+from DABubble.reactions import reactions_prefetch
+from DABubble.serializers import MessageSerializer, ThreadMessageSerializer
+
+DEFAULT_SYNC_LIMIT = 500
+MAX_SYNC_LIMIT = 2000
+
+
+class SyncView(APIView):
+    """
+    SyncView returns everything that changed in the user's channels since a checkpoint.
+
+    HTTP Methods:
+    - GET: Returns the changes after `since` across all channels the user is a member of.
+
+    Behavior:
+    - Requires the user to be authenticated via token authentication.
+    - Every new message, edit, reaction and opened thread is recorded in `ChangeModel`
+      (see `DABubble.events`); its id is a monotonic checkpoint.
+    - Without `since`, only the current checkpoint is returned so a client that just loaded
+      its channels can start syncing from there.
+    - With `since=<checkpoint>`, reads at most `limit` changes (default 500, at most 2000) and
+      returns the current state of the affected objects, each object once:
+      `{"checkpoint": id, "hasMore": bool, "messages": [...], "threadMessages": [...], "threads": [...]}`.
+    - The client stores `checkpoint` and calls again while `hasMore` is true.
+    - Returns an error if `since` or `limit` is not an integer or `limit` is not positive.
+
+    Attributes:
+    - authentication_classes: A list containing token-based authentication for the view.
+    - permission_classes: A list of permissions that restrict access to authenticated users only.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            since = int(request.query_params.get('since', -1))
+            limit = min(int(request.query_params.get('limit', DEFAULT_SYNC_LIMIT)), MAX_SYNC_LIMIT)
+        except ValueError:
+            return Response({'detail': '`since` and `limit` must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        if limit < 1:
+            return Response({'detail': '`limit` must be a positive integer.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        channel_ids = ChannelModel.objects.filter(channelMembers=request.user).values('id')
+        changes = ChangeModel.objects.filter(channel_id__in=channel_ids)
+
+        if since < 0:
+            checkpoint = changes.aggregate(checkpoint=Max('id'))['checkpoint'] or 0
+            return Response({'checkpoint': checkpoint, 'hasMore': False, 'messages': [], 'threadMessages': [], 'threads': []},
+                            status=status.HTTP_200_OK)
+
+        rows = list(changes.filter(id__gt=since).order_by('id').values_list('id', 'kind', 'object_id')[:limit + 1])
+        has_more = len(rows) > limit
+        rows = rows[:limit]
+
+        changed = {ChangeModel.MESSAGE: set(), ChangeModel.THREAD_MESSAGE: set(), ChangeModel.THREAD: set()}
+        for _, kind, object_id in rows:
+            changed[kind].add(object_id)
+
+        messages = MessageModel.objects.filter(id__in=changed[ChangeModel.MESSAGE]).select_related('blob').prefetch_related(reactions_prefetch()).order_by('id')
+        thread_messages = ThreadMessageModel.objects.filter(id__in=changed[ChangeModel.THREAD_MESSAGE]).select_related('blob').prefetch_related(reactions_prefetch()).order_by('id')
+        threads = ThreadChannelModel.objects.filter(id__in=changed[ChangeModel.THREAD]).order_by('id').values(
+            'id', 'threadName', 'threadDescription', 'mainChannel', 'createdFrom', 'original_message'
+        )
+
+        return Response({
+            'checkpoint': rows[-1][0] if rows else since,
+            'hasMore': has_more,
+            'messages': MessageSerializer(messages, many=True).data if changed[ChangeModel.MESSAGE] else [],
+            'threadMessages': ThreadMessageSerializer(thread_messages, many=True).data if changed[ChangeModel.THREAD_MESSAGE] else [],
+            'threads': list(threads) if changed[ChangeModel.THREAD] else [],
+        }, status=status.HTTP_200_OK)
@@ -1,16 +1,23 @@
 
+from asgiref.sync import sync_to_async
 from django.conf import settings
 from rest_framework.response import Response
 from rest_framework import status
 from django.contrib.auth.models import User
-from rest_framework.authentication import TokenAuthentication
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.views import APIView
 
-from DABubble.models import ThreadChannelModel, ThreadMessageModel, MessageModel
-from DABubble.serializers import ThreadMessageSerializer
+from DABubble import events
+from DABubble.asynchronous import AsyncAPIView
+from DABubble.authentication import CachedTokenAuthentication
+from DABubble.models import ThreadChannelModel, ThreadMessageModel, MessageModel, ReactionModel
+from DABubble.unread import mark_read
+from DABubble.blobs import atomic_attachment, attach_file
+from DABubble.uploads import UPLOAD_NOT_AVAILABLE, claim_upload, upload_attachment
+from DABubble.serializers import CompactThreadMessageSerializer, ThreadMessageSerializer
+from DABubble.reactions import is_valid_emoji_code, reactions_prefetch, replace_legacy_reactions, set_reaction, summarize_reactions, wants_reaction_summary
 
-class ThreadMessageView(APIView):
+class ThreadMessageView(AsyncAPIView):
     """
     ThreadMessageView handles the creation, retrieval, and updating of messages within a specific thread channel.
 
@@ -22,14 +29,20 @@ class ThreadMessageView(APIView):
     Behavior:
     - Requires the user to be authenticated via token authentication.
     - The request for POST and PATCH methods should include the message content.
-    - POST and PATCH methods associate the message with the specified `thread_channel_id`.
-    - GET method retrieves all messages associated with the specified `thread_channel_id`.
+    - POST and PATCH methods associate the message with the specified `thread_channel_id` and publish
+      a `message.created` / `message.edited` event to the subscribers of the thread.
+      POST also moves the sender's read marker of the thread to the new message, and attaches a
+      completed upload session (`UploadView`) given as `uploadId` as `messageData`. Attachments
+      are stored once per content (`DABubble.blobs`); `messageDataName` keeps the file name.
+    - GET method retrieves all messages associated with the specified `thread_channel_id`, oldest first.
+      With `?reactions=summary` the `emoji_*` user lists are replaced by a compact `reactions` summary.
+      GET runs on the event loop under ASGI (see `DABubble.asynchronous.AsyncAPIView`).
 
     Attributes:
     - authentication_classes: A list containing token-based authentication for the view.
     - permission_classes: A list of permissions that restrict access to authenticated users only.
     """
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
 
     def post(self, request, *args, **kwargs):
@@ -41,16 +54,36 @@ class ThreadMessageView(APIView):
 
         serializer = ThreadMessageSerializer(data=request.data)
         if serializer.is_valid():
-            serializer.save(sender=request.user, thread_channel=thread_channel)
+            # Claiming the upload, counting the blob reference and storing a new file are
+            # undone if the save fails.
+            with atomic_attachment():
+                attachment = {}
+                if request.data.get('uploadId') is not None:
+                    upload = claim_upload(request.user, request.data['uploadId'])
+                    if upload is None:
+                        return Response(UPLOAD_NOT_AVAILABLE, status=status.HTTP_400_BAD_REQUEST)
+                    attachment = upload_attachment(upload)
+                elif serializer.validated_data.get('messageData'):
+                    attachment = attach_file(serializer.validated_data['messageData'])
+                threadMessage = serializer.save(sender=request.user, thread_channel=thread_channel, **attachment)
+            events.thread_message_created(threadMessage, thread_channel.mainChannel_id, serializer.data)
+            mark_read(request.user, threadMessage.id, thread_channel=thread_channel)
             return Response(serializer.data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         thread_channel_id = kwargs.get('thread_channel_id')
         try:
-            thread_channel = ThreadChannelModel.objects.get(id=thread_channel_id)
-            messages = ThreadMessageModel.objects.filter(thread_channel=thread_channel)
-            serializer = ThreadMessageSerializer(messages, many=True)
+            thread_channel = await ThreadChannelModel.objects.aget(id=thread_channel_id)
+            messages = ThreadMessageModel.objects.filter(thread_channel=thread_channel).select_related('blob').order_by('timestamp', 'id')
+            if wants_reaction_summary(request.query_params):
+                reactions = ReactionModel.objects.filter(thread_message__thread_channel=thread_channel)
+                summaries = await sync_to_async(summarize_reactions)(reactions, 'thread_message', request.user)
+                messages = [message async for message in messages]
+                serializer = CompactThreadMessageSerializer(messages, many=True, context={'reaction_summaries': summaries})
+            else:
+                messages = [message async for message in messages.prefetch_related(reactions_prefetch())]
+                serializer = ThreadMessageSerializer(messages, many=True)
             return Response(serializer.data, status=status.HTTP_200_OK)
         except ThreadChannelModel.DoesNotExist:
             return Response({'detail': 'Thread Channel not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -60,8 +93,8 @@ class ThreadMessageView(APIView):
         thread_message_id = kwargs.get('message_id')
         
         try:
-            threadMessage = ThreadMessageModel.objects.get(id=thread_message_id, thread_channel=thread_channel_id)
-        except MessageModel.DoesNotExist:
+            threadMessage = ThreadMessageModel.objects.select_related('thread_channel').get(id=thread_message_id, thread_channel=thread_channel_id)
+        except ThreadMessageModel.DoesNotExist:
             return Response({'detail': 'Message or Channel not found.'}, status=status.HTTP_404_NOT_FOUND)
         
         content = request.data.get('content')
@@ -73,6 +106,7 @@ class ThreadMessageView(APIView):
         threadMessage.save()
 
         serializer = ThreadMessageSerializer(threadMessage)
+        events.thread_message_edited(threadMessage, threadMessage.thread_channel.mainChannel_id, serializer.data)
         return Response(serializer.data, status=status.HTTP_200_OK)
     
     
@@ -87,13 +121,13 @@ class ThreadEmojiView(APIView):
     - Requires the user to be authenticated via token authentication.
     - The request should include lists of users for each emoji type.
     - The emoji reactions are updated for the specified message in the thread channel.
-    - The Many-to-Many relationship fields for each emoji type (handsup, check, nerd, rocket) are updated with the provided user data.
+    - The reactions of each emoji type (handsup, check, nerd, rocket) are replaced in `ReactionModel` with the provided user data.
 
     Attributes:
     - authentication_classes: A list containing token-based authentication for the view.
     - permission_classes: A list of permissions that restrict access to authenticated users only.
     """
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
     
     def patch(self, request, *args, **kwargs):
@@ -101,27 +135,58 @@ class ThreadEmojiView(APIView):
         thread_message_id = kwargs.get('message_id')
     
         try:
-            threadMessage = ThreadMessageModel.objects.get(id=thread_message_id, thread_channel_id=thread_channel_id)
-        except MessageModel.DoesNotExist:
+            threadMessage = ThreadMessageModel.objects.select_related('thread_channel').get(id=thread_message_id, thread_channel_id=thread_channel_id)
+        except ThreadMessageModel.DoesNotExist:
             return Response({'detail': 'Message or Channel not found.'}, status=status.HTTP_404_NOT_FOUND)
         
-        # List of dicts containing user data for each emoji type
-        emoji_handsup_users = request.data.get('emoji_handsup', [])
-        emoji_check_users = request.data.get('emoji_check', [])
-        emoji_nerd_users = request.data.get('emoji_nerd', [])
-        emoji_rocket_users = request.data.get('emoji_rocket', [])
-        # Convert the user data dictionaries into User model instances
-        handsup_users = [User.objects.get(id=user_dict['id']) for user_dict in emoji_handsup_users]
-        check_users = [User.objects.get(id=user_dict['id']) for user_dict in emoji_check_users]
-        nerd_users = [User.objects.get(id=user_dict['id']) for user_dict in emoji_nerd_users]
-        rocket_users = [User.objects.get(id=user_dict['id']) for user_dict in emoji_rocket_users]
-        # Update the ManyToMany fields with the user instances
-        threadMessage.emoji_handsup.set(handsup_users)
-        threadMessage.emoji_check.set(check_users)
-        threadMessage.emoji_nerd.set(nerd_users)
-        threadMessage.emoji_rocket.set(rocket_users)
-        
-        threadMessage.save()
+        replace_legacy_reactions(threadMessage, request.data)
 
         serializer = ThreadMessageSerializer(threadMessage)
-        return Response(serializer.data, status=status.HTTP_200_OK)
\ No newline at end of file
+        events.reaction_changed(threadMessage.thread_channel.mainChannel_id, threadMessage.thread_channel_id, events.legacy_reactions(serializer.data))
+        return Response(serializer.data, status=status.HTTP_200_OK)
+
+
+class ThreadReactionView(APIView):
+    """
+    ThreadReactionView adds or removes a single emoji reaction of the authenticated user on a thread message.
+
+    HTTP Methods:
+    - PUT: Adds the reaction `emoji` of the user to the thread message.
+    - DELETE: Removes the reaction `emoji` of the user from the thread message.
+
+    Behavior:
+    - Requires the user to be authenticated via token authentication.
+    - Touches exactly one `ReactionModel` row and is idempotent (see `MessageReactionView`).
+    - Returns `{"emoji": code, "reacted": bool, "count": int}` with the new state of that emoji
+      and publishes it as a `reaction.updated` event.
+    - Returns an error if the emoji code is invalid or the message or thread channel is not found.
+
+    Attributes:
+    - authentication_classes: A list containing token-based authentication for the view.
+    - permission_classes: A list of permissions that restrict access to authenticated users only.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def put(self, request, *args, **kwargs):
+        return self.set_reaction(request, kwargs, reacted=True)
+
+    def delete(self, request, *args, **kwargs):
+        return self.set_reaction(request, kwargs, reacted=False)
+
+    def set_reaction(self, request, kwargs, reacted):
+        emoji = kwargs.get('emoji')
+        if not is_valid_emoji_code(emoji):
+            return Response({'detail': 'Invalid emoji code.'}, status=status.HTTP_400_BAD_REQUEST)
+
+        try:
+            threadMessage = ThreadMessageModel.objects.select_related('thread_channel').get(id=kwargs.get('message_id'), thread_channel_id=kwargs.get('thread_channel_id'))
+        except ThreadMessageModel.DoesNotExist:
+            return Response({'detail': 'Message or Channel not found.'}, status=status.HTTP_404_NOT_FOUND)
+
+        state = set_reaction(threadMessage, request.user, emoji, reacted)
+        events.reaction_changed(
+            threadMessage.thread_channel.mainChannel_id, threadMessage.thread_channel_id,
+            {'message': threadMessage.id, 'user': request.user.id, **state},
+        )
+        return Response(state, status=status.HTTP_200_OK)
@@ -0,0 +1,142 @@
+from rest_framework.response import Response
+from rest_framework import status
+from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+from DABubble.authentication import CachedTokenAuthentication
+from DABubble.models import UploadModel
+from DABubble.serializers import UploadSerializer
+from DABubble.uploads import (OffsetMismatch, UploadError, complete_upload, create_upload, discard_upload,
+                              parse_content_range, write_chunk)
+
+
+def get_upload(request, upload_id):
+    return UploadModel.objects.filter(id=upload_id, owner=request.user).first()
+
+
+class UploadView(APIView):
+    """
+    UploadView opens a resumable upload session for a message attachment.
+
+    HTTP Methods:
+    - POST: Creates a session for `{"filename": str, "size": bytes}` and returns it
+      (`UploadSerializer`) with status 201.
+
+    Behavior:
+    - Requires the user to be authenticated via token authentication.
+    - The file is then sent in chunks to `UploadSessionView`, completed with
+      `UploadCompleteView` and attached to a message by passing `uploadId` when posting the
+      message (`MessageView`, `ThreadMessageView`).
+    - Returns an error if the filename is missing or the size is not between 1 byte and
+      `UPLOAD_SESSIONS['MAX_SIZE']`.
+
+    Attributes:
+    - authentication_classes: A list containing token-based authentication for the view.
+    - permission_classes: A list of permissions that restrict access to authenticated users only.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        try:
+            size = int(request.data.get('size', 0))
+        except (TypeError, ValueError):
+            return Response({'detail': '`size` must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            upload = create_upload(request.user, request.data.get('filename'), size)
+        except UploadError as error:
+            return Response({'detail': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(UploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+
+
+class UploadSessionView(APIView):
+    """
+    UploadSessionView receives the chunks of an upload session.
+
+    HTTP Methods:
+    - GET: Returns the session (`UploadSerializer`); `received` is where to resume.
+    - PUT: Stores one chunk. The raw request body is the chunk, `Content-Range:
+      bytes <start>-<end>/<size>` says where it belongs. Returns the session.
+    - DELETE: Aborts the session and deletes what was received.
+
+    Behavior:
+    - Requires the user to be authenticated via token authentication; only the owner can
+      access a session.
+    - Chunks are written in order: `start` must equal `received`, otherwise the response is a
+      409 with the current `received`, from which the client resumes. A late retry of a chunk
+      that already landed gets the 409 without changing the file. A chunk cut off by a
+      dropped connection keeps the bytes that arrived.
+    - The body is streamed to a temporary file in small pieces, so the memory per request
+      stays bounded, and appended to the partial file under a lock; a chunk may be at most
+      `UPLOAD_SESSIONS['MAX_CHUNK']` bytes.
+    - Returns an error if the session does not exist, is complete, or `Content-Range` is
+      missing or does not match the session.
+
+    Attributes:
+    - authentication_classes: A list containing token-based authentication for the view.
+    - permission_classes: A list of permissions that restrict access to authenticated users only.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        upload = get_upload(request, kwargs.get('upload_id'))
+        if upload is None:
+            return Response({'detail': 'Upload not found.'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(UploadSerializer(upload).data, status=status.HTTP_200_OK)
+
+    def put(self, request, *args, **kwargs):
+        upload = get_upload(request, kwargs.get('upload_id'))
+        if upload is None:
+            return Response({'detail': 'Upload not found.'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            start, length = parse_content_range(request.headers.get('Content-Range'), upload)
+            write_chunk(upload, start, length, request)
+        except OffsetMismatch as error:
+            return Response({'detail': str(error), 'received': error.received}, status=status.HTTP_409_CONFLICT)
+        except UploadError as error:
+            return Response({'detail': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(UploadSerializer(upload).data, status=status.HTTP_200_OK)
+
+    def delete(self, request, *args, **kwargs):
+        upload = get_upload(request, kwargs.get('upload_id'))
+        if upload is None:
+            return Response({'detail': 'Upload not found.'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            discard_upload(upload)
+        except UploadError as error:
+            return Response({'detail': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class UploadCompleteView(APIView):
+    """
+    UploadCompleteView finalizes an upload session.
+
+    HTTP Methods:
+    - POST: Moves the received file into the attachment storage and returns the session
+      (`UploadSerializer`) with `status` "complete" and the file URL.
+
+    Behavior:
+    - Requires the user to be authenticated via token authentication; only the owner can
+      complete a session.
+    - The upload can then be attached to one message by passing its id as `uploadId`.
+    - Returns an error if the session does not exist, is complete already, or not all bytes
+      were received.
+
+    Attributes:
+    - authentication_classes: A list containing token-based authentication for the view.
+    - permission_classes: A list of permissions that restrict access to authenticated users only.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        upload = get_upload(request, kwargs.get('upload_id'))
+        if upload is None:
+            return Response({'detail': 'Upload not found.'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            complete_upload(upload)
+        except UploadError as error:
+            return Response({'detail': str(error)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(UploadSerializer(upload).data, status=status.HTTP_200_OK)
@@ -1,33 +1,73 @@
 import logging
+from asgiref.sync import sync_to_async
 from rest_framework.response import Response
 from DABubble.serializers import UserSerializer
+from DABubble.conditional import conditional, users_etag
 from rest_framework import status
 from django.contrib.auth.models import User
-from rest_framework.authentication import TokenAuthentication
-from rest_framework.permissions import IsAuthenticated
+from DABubble.authentication import CachedTokenAuthentication
+from DABubble.asynchronous import AsyncAPIView
+from DABubble.directory import DEFAULT_SEARCH_LIMIT, MAX_SEARCH_LIMIT, USER_FIELDS, search_users, user_page
+from DABubble.pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE
+from DABubble.profiles import MAX_RESOLVE_IDS, resolve_profiles
 from rest_framework.views import APIView
+from rest_framework.permissions import IsAuthenticated
 
 
 logger = logging.getLogger(__name__)
 
-class UsersView(APIView):
+class UsersView(AsyncAPIView):
     """
     UsersView handles retrieving and updating user information.
 
     HTTP Methods:
-    - GET: Retrieves a list of all users' basic information (id, first name, last name, email, username).
+    - GET: Retrieves users' basic information (id, first name, last name, email, username).
+        - `?q=<text>` returns the users whose username, first name, last name or email starts with
+          `text` (ignoring case), at most `limit` (default 10, at most 50):
+          `{"results": [...], "hasMore": bool}`. Meant for autocomplete; see
+          `DABubble.directory.search_users`.
+        - `?after=<id>` and/or `?limit=<n>` page through all users in id order (default 50, at
+          most 200): `{"results": [...], "hasMore": bool, "after": id}`.
+        - Without parameters returns the list of all users.
+      Sends an `ETag`; a matching `If-None-Match` gets a 304 without querying the users.
+      Runs on the event loop under ASGI (see `DABubble.asynchronous.AsyncAPIView`).
     - PUT: Updates the authenticated user's information (partial updates allowed).
 
     Attributes:
     - authentication_classes: Specifies that this view requires token-based authentication.
     - permission_classes: Restricts access to authenticated users only.
     """
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
     
-    def get(self, request, *args, **kwargs):
-        users = User.objects.all().values('id', 'first_name', 'last_name', 'email', 'username')
-        return Response(list(users), status=status.HTTP_200_OK)
+    @conditional(users_etag)
+    async def get(self, request, *args, **kwargs):
+        params = request.query_params
+        if 'q' in params:
+            try:
+                limit = min(int(params.get('limit', DEFAULT_SEARCH_LIMIT)), MAX_SEARCH_LIMIT)
+            except ValueError:
+                return Response({'detail': '`limit` must be an integer.'}, status=status.HTTP_400_BAD_REQUEST)
+            text = params['q'].strip()
+            if limit < 1 or not text:
+                return Response({'detail': '`q` must not be empty and `limit` must be positive.'}, status=status.HTTP_400_BAD_REQUEST)
+            users, has_more = await sync_to_async(search_users)(text, limit)
+            return Response({'results': users, 'hasMore': has_more}, status=status.HTTP_200_OK)
+
+        if 'after' in params or 'limit' in params:
+            try:
+                after = int(params.get('after', 0))
+                limit = min(int(params.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE)
+            except ValueError:
+                return Response({'detail': '`after` and `limit` must be integers.'}, status=status.HTTP_400_BAD_REQUEST)
+            if after < 0 or limit < 1:
+                return Response({'detail': '`after` and `limit` must be positive integers.'}, status=status.HTTP_400_BAD_REQUEST)
+            users, has_more = await sync_to_async(user_page)(after, limit)
+            return Response({'results': users, 'hasMore': has_more, 'after': users[-1]['id'] if users else None},
+                            status=status.HTTP_200_OK)
+
+        users = User.objects.all().values(*USER_FIELDS)
+        return Response([user async for user in users], status=status.HTTP_200_OK)
     
     def put(self, request, *args, **kwargs):
         user = request.user
@@ -37,22 +77,56 @@ class UsersView(APIView):
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
     
-class ActiveUserView(APIView):
+class ActiveUserView(AsyncAPIView):
     """
     ActiveUserView handles retrieving information about the currently authenticated user.
 
     HTTP Methods:
-    - GET: Retrieves the authenticated user's data.
+    - GET: Retrieves the authenticated user's data. Runs on the event loop under ASGI; with a
+      cached token it needs no query at all.
 
     Attributes:
     - authentication_classes: Specifies that this view requires token-based authentication.
     - permission_classes: Restricts access to authenticated users only.
     """
-    authentication_classes = [TokenAuthentication]
+    authentication_classes = [CachedTokenAuthentication]
     permission_classes = [IsAuthenticated]
     
-    def get(self, request, *args, **kwargs):
+    async def get(self, request, *args, **kwargs):
         user = request.user
         serializer = UserSerializer(user)
         return Response(serializer.data, status=status.HTTP_200_OK)
-    
\ No newline at end of file
+    
+
+class UserResolveView(APIView):
+    """
+    UserResolveView resolves user ids to what a client needs to render them.
+
+    HTTP Methods:
+    - GET: `?ids=1,2,3` returns `{"users": [{"id", "name", "avatar"}, ...]}` for the existing
+      users among the ids, in the requested order. `name` is the display name, `avatar` the
+      URL of the user's avatar.
+
+    Behavior:
+    - Requires the user to be authenticated via token authentication.
+    - Profiles are served from the in-process profile cache (`DABubble.profiles`), which
+      user and avatar changes invalidate; resolving cached users costs a single query.
+    - Returns an error if `ids` is missing, not a comma-separated list of integers, or lists
+      more than 200 ids.
+
+    Attributes:
+    - authentication_classes: Specifies that this view requires token-based authentication.
+    - permission_classes: Restricts access to authenticated users only.
+    """
+    authentication_classes = [CachedTokenAuthentication]
+    permission_classes = [IsAuthenticated]
+
+    def get(self, request, *args, **kwargs):
+        try:
+            ids = list(dict.fromkeys(int(id) for id in request.query_params.get('ids', '').split(',') if id))
+        except ValueError:
+            return Response({'detail': '`ids` must be a comma-separated list of integers.'}, status=status.HTTP_400_BAD_REQUEST)
+        if not ids or len(ids) > MAX_RESOLVE_IDS:
+            return Response({'detail': f'`ids` must list between 1 and {MAX_RESOLVE_IDS} user ids.'}, status=status.HTTP_400_BAD_REQUEST)
+        profiles = resolve_profiles(ids)
+        return Response({'users': [profiles[id].as_dict() for id in ids if id in profiles]}, status=status.HTTP_200_OK)
@@ -40,6 +40,7 @@ CORS_ALLOWED_ORIGINS = [
 # Application definition
 
 INSTALLED_APPS = [
+    'daphne',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -51,6 +52,7 @@ INSTALLED_APPS = [
     'rest_framework.authtoken',
     'corsheaders',
     'debug_toolbar',
+    'channels',
 ]
 
 MIDDLEWARE = [
@@ -72,6 +74,7 @@ CORS_ORIGIN_WHITELIST = [
     'http://localhost:4200',  # Angular-Frontend
 ]
 CORS_ALLOW_CREDENTIALS = True
+CORS_EXPOSE_HEADERS = ['ETag']
 CSRF_COOKIE_HTTPONLY = False
 CSRF_COOKIE_SECURE = False  # Auf `True` setzen, wenn du HTTPS verwendest
 
@@ -94,6 +97,15 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = 'DABubble_Backend.wsgi.application'
+ASGI_APPLICATION = 'DABubble_Backend.asgi.application'
+
+# Channel layer for the websocket events (DABubble/events.py).
+# The in-memory layer only works within one process; use channels_redis for several workers.
+CHANNEL_LAYERS = {
+    'default': {
+        'BACKEND': 'channels.layers.InMemoryChannelLayer',
+    },
+}
 
 
 # Database
@@ -156,13 +168,75 @@ INTERNAL_IPS = [
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Delivery of the media files (DABubble/media.py): 'django' streams them from the worker,
+# 'x-accel-redirect' hands them to nginx through the internal location ACCEL_PREFIX (an alias
+# of MEDIA_ROOT), 'x-sendfile' to servers supporting that header. MAX_AGE is the browser
+# cache lifetime in seconds.
+MEDIA_DELIVERY = {
+    'BACKEND': 'django',
+    'ACCEL_PREFIX': '/protected-media/',
+    'MAX_AGE': 365 * 24 * 60 * 60,
+}
+
+# Uploads are hashed while they stream in, so attachments are stored once per content (DABubble.blobs)
+FILE_UPLOAD_HANDLERS = [
+    'DABubble.blobs.HashingMemoryFileUploadHandler',
+    'DABubble.blobs.HashingTemporaryFileUploadHandler',
+]
+
+# Metadata recorded when an attachment is stored (DABubble/previews.py): bounding box in pixels
+# and encoder quality of the image previews shown in the message list
+ATTACHMENT_PREVIEWS = {
+    'SIZE': 320,
+    'QUALITY': 75,
+}
+
+# Resumable chunked uploads of attachments: size limits in bytes, seconds until an unfinished
+# session is removed by `clean_uploads`, directory of the partial files (MEDIA_ROOT/partial if empty)
+UPLOAD_SESSIONS = {
+    'MAX_SIZE': 500 * 1024 * 1024,
+    'MAX_CHUNK': 8 * 1024 * 1024,
+    'EXPIRY': 24 * 60 * 60,
+    'TEMP_DIR': '',
+}
+
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'DABubble.authentication.CachedTokenAuthentication',
         'rest_framework.authentication.SessionAuthentication',
     ],
 }
 
+# In-process cache of token lookups (DABubble/authentication.py): entry limit and lifetime in seconds.
+TOKEN_AUTH_CACHE = {
+    'MAX_SIZE': 10000,
+    'TTL': 60,
+}
+
+# In-process cache of the newest messages per channel (DABubble/recent_messages.py):
+# number of channels, messages per channel and lifetime in seconds.
+RECENT_MESSAGES_CACHE = {
+    'MAX_CHANNELS': 1000,
+    'WINDOW': 50,
+    'TTL': 300,
+}
+
+# Square avatar thumbnails rendered after an upload (DABubble/thumbnails.py): sizes in pixels,
+# encoder quality and whether to render them in a background thread.
+AVATAR_THUMBNAILS = {
+    'SIZES': [32, 64, 128],
+    'QUALITY': 80,
+    'BACKGROUND': True,
+}
+
+# In-process cache of user profiles, display name and avatar URL (DABubble/profiles.py):
+# number of users, lifetime in seconds and the thumbnail size used as avatar URL.
+PROFILE_CACHE = {
+    'MAX_SIZE': 50000,
+    'TTL': 600,
+    'AVATAR_SIZE': 64,
+}
+
 # environ initialisieren
 env = environ.Env()
 
@@ -177,4 +251,13 @@ EMAIL_USE_TLS = env.bool('EMAIL_USE_TLS')
 EMAIL_USE_SSL = env.bool('EMAIL_USE_SSL')  
 EMAIL_HOST_USER = env('EMAIL_HOST_USER')
 EMAIL_HOST_PASSWORD = env('EMAIL_HOST_PASSWORD')
-DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL')
\ No newline at end of file
+DEFAULT_FROM_EMAIL = env('DEFAULT_FROM_EMAIL')
+
+# Email outbox delivered by `manage.py send_outbox --loop` (DABubble/outbox.py):
+# emails per batch and connection, attempts before giving up, backoff in seconds.
+EMAIL_OUTBOX = {
+    'BATCH_SIZE': 50,
+    'MAX_ATTEMPTS': 5,
+    'RETRY_DELAY': 30,
+    'MAX_RETRY_DELAY': 3600,
+}
\ No newline at end of file
@@ -24,11 +24,13 @@ from django.urls import path, include, re_path
 from DABubble.views import (LoginView, LogoutView, AvatarModelViewSet, AvatarUserModelView, 
                             PasswordRequestView, PasswordResetConfirm, RegistrationView, ChannelView, 
                             SingleChannelView, MessageEmojiView, MessageView, ThreadMessageView, ThreadEmojiView, 
-                            UsersView, ActiveUserView)
+                            UsersView, ActiveUserView, MessageReactionView, ThreadReactionView, SyncView,
+                            CacheStatsView, SearchView, ChannelReadView, ThreadReadView, UnreadView,
+                            ChannelDiscoveryView, UserResolveView, MediaView,
+                            UploadView, UploadSessionView, UploadCompleteView)
 from django.conf import settings
 from django.conf.urls import include
 from rest_framework.routers import DefaultRouter
-from django.conf.urls.static import static
 from django.contrib.auth import views as auth_views
 from django.views.generic import TemplateView
 from django.views.static import serve
@@ -46,22 +48,45 @@ urlpatterns = [
     path('logout/', LogoutView.as_view(), name='logout'),
     path('users/', UsersView.as_view(), name='users'),
     path('users/<int:id>/', UsersView.as_view(), name='user-detail'),
+    path('users/resolve/', UserResolveView.as_view(), name='user-resolve'),
     path('user/', ActiveUserView.as_view(), name='user'),
     path('activeUserImage/', AvatarUserModelView.as_view(), name='activeUserImage'),
     
     # Channel URLs
     path('channel/', ChannelView.as_view(), name='channel-list'),
+    path('channel/discover/', ChannelDiscoveryView.as_view(), name='channel-discover'),
     path('channel/<int:channel_id>/', SingleChannelView.as_view(), name='channel-detail'),
 
     # Message URLs
     path('channel/<int:channel_id>/messages/', MessageView.as_view(), name='message-list'),
     path('channel/<int:channel_id>/messages/<int:message_id>/', MessageView.as_view(), name='message-detail'),
     path('channel/<int:channel_id>/messages/<int:message_id>/emoji/', MessageEmojiView.as_view(), name='messageEmoji'),
+    path('channel/<int:channel_id>/messages/<int:message_id>/reactions/<str:emoji>/', MessageReactionView.as_view(), name='messageReaction'),
+    path('channel/<int:channel_id>/read/', ChannelReadView.as_view(), name='channel-read'),
     
     # Thread Message URLs
     path('channelThread/<int:thread_channel_id>/messages/', ThreadMessageView.as_view(), name='messageThread-list'),
     path('channelThread/<int:thread_channel_id>/messages/<int:message_id>/', ThreadMessageView.as_view(), name='messageThread-detail'),
     path('channelThread/<int:thread_channel_id>/messages/<int:message_id>/emoji/', ThreadEmojiView.as_view(), name='messageThreadEmoji'),
+    path('channelThread/<int:thread_channel_id>/messages/<int:message_id>/reactions/<str:emoji>/', ThreadReactionView.as_view(), name='messageThreadReaction'),
+    path('channelThread/<int:thread_channel_id>/read/', ThreadReadView.as_view(), name='thread-read'),
+
+    # Resumable attachment uploads
+    path('uploads/', UploadView.as_view(), name='upload-list'),
+    path('uploads/<int:upload_id>/', UploadSessionView.as_view(), name='upload-detail'),
+    path('uploads/<int:upload_id>/complete/', UploadCompleteView.as_view(), name='upload-complete'),
+
+    # Unread counts
+    path('unread/', UnreadView.as_view(), name='unread'),
+
+    # Incremental sync
+    path('sync/', SyncView.as_view(), name='sync'),
+
+    # Message search
+    path('search/', SearchView.as_view(), name='search'),
+
+    # Cache counters
+    path('cache/stats/', CacheStatsView.as_view(), name='cache-stats'),
 
     # password reset
     path('password_reset/', PasswordRequestView.as_view(), name='password_reset'),  
@@ -76,7 +101,10 @@ urlpatterns = [
     }),
 ]
 
-urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
+# Uploaded media: avatars, thumbnails and attachments (access checks, ranges, offloading)
+urlpatterns += [
+    path(f'{settings.MEDIA_URL.strip("/")}/<path:path>', MediaView.as_view(), name='media'),
+]
 
 if settings.DEBUG:
     import debug_toolbar